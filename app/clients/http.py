@@ -0,0 +1,30 @@
+from importlib.util import find_spec
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.logging import logger
+
+
+def http_client_options() -> dict:
+    """
+    Connection pool options shared by every outbound SDK client.
+
+    The SDKs accept these as keyword arguments to their default httpx clients,
+    so each provider keeps its own timeouts and socket options while the pool
+    sizing and keep-alive behaviour stay tunable from one place.
+    """
+    settings = get_settings()
+    http2 = settings.http2
+    if http2 and find_spec("h2") is None:
+        logger.warning("HTTP2 is enabled but 'h2' is not installed - using HTTP/1.1.")
+        http2 = False
+
+    return {
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        "http2": http2,
+    }
@@ -1,58 +1,406 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import AsyncIterator
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Optional
 
 import anthropic
+import openai
 
+from app.clients.http import http_client_options
+from app.core.admission import AdmissionController, AIMDLimit
 from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import token_counter
+from app.core.rate_limit import TokenBucket
+from app.services.chunking import estimate_tokens
+
+CACHE_CONTROL = {"type": "ephemeral"}
+STUB_REPLY = "This is a stub summary."
+
+
+@dataclass
+class TokenUsage:
+    """Input tokens split by how the provider billed them, plus output tokens."""
+
+    model: str = ""
+    calls: int = 0
+    input_tokens: int = 0  # uncached
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    output_tokens: int = 0
+
+    def add(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        cache_read_input_tokens: int = 0,
+        cache_creation_input_tokens: int = 0,
+    ) -> None:
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.cache_read_input_tokens += cache_read_input_tokens
+        self.cache_creation_input_tokens += cache_creation_input_tokens
+        self.output_tokens += output_tokens
+        for kind, tokens in (
+            ("input", input_tokens),
+            ("cache_read", cache_read_input_tokens),
+            ("cache_write", cache_creation_input_tokens),
+            ("output", output_tokens),
+        ):
+            if tokens:
+                token_counter(self.model, kind).inc(tokens)
+        logger.debug(
+            f"LLM usage: {input_tokens} uncached, {cache_read_input_tokens} cache read, "
+            f"{cache_creation_input_tokens} cache write, {output_tokens} output tokens."
+        )
 
 
 class LLMClient(ABC):
+    """
+    A chat model that takes a system prompt and one user message.
+
+    `cache_prefix` is the start of the user message, ahead of `user_prompt`.
+    Callers put content there that other calls will repeat verbatim (the
+    text being summarized), so providers with prompt caching can bill it at
+    the cached rate on later calls. Other clients just prepend it.
+    """
+
     @abstractmethod
     async def complete(
-        self, system_prompt: str, user_prompt: str, max_tokens: int
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
     ) -> str:
         pass
 
     @abstractmethod
     async def stream(
-        self, system_prompt: str, user_prompt: str, max_tokens: int
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
     ) -> AsyncIterator[str]:
         pass
 
+    def stats(self) -> dict:
+        """Token usage counters. Empty for clients that don't track them."""
+        return {}
+
+    def check_capacity(self) -> None:
+        """Raise AdmissionRejectedError if a call made now would be turned away. No-op by default."""
+
+    async def warm_up(self) -> None:
+        """Open connections ahead of the first request. No-op by default."""
+
+    async def aclose(self) -> None:
+        """Release pooled connections. No-op by default."""
+
 
 class AnthropicClient(LLMClient):
-    def __init__(self):
+    def __init__(self, max_retries: int = anthropic.DEFAULT_MAX_RETRIES):
         settings = get_settings()
         self.model = settings.model
-        self.client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+        self.prompt_caching = settings.prompt_caching
+        self.prompt_cache_min_chars = settings.prompt_cache_min_chars
+        self.usage = TokenUsage(model=self.model)
+        self.http_client = anthropic.DefaultAsyncHttpxClient(**http_client_options())
+        self.client = anthropic.AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            base_url=settings.anthropic_base_url,
+            http_client=self.http_client,
+            max_retries=max_retries,
+        )
 
     async def complete(
-        self, system_prompt: str, user_prompt: str, max_tokens: int
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
     ) -> str:
         response = await self.client.messages.create(
             model=self.model,
             max_tokens=max_tokens,
             system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
+            messages=self._messages(user_prompt, cache_prefix),
         )
+        self._record_usage(response.usage)
         return response.content[0].text
 
     async def stream(
-        self, system_prompt: str, user_prompt: str, max_tokens: int
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
     ) -> AsyncIterator[str]:
         async with self.client.messages.stream(
             model=self.model,
             max_tokens=max_tokens,
             system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}],
+            messages=self._messages(user_prompt, cache_prefix),
         ) as stream:
             async for text in stream.text_stream:
                 yield text
+            self._record_usage((await stream.get_final_message()).usage)
+
+    def _messages(self, user_prompt: str, cache_prefix: str) -> list[dict]:
+        """
+        Build the user message, marking `cache_prefix` as a cache breakpoint.
+
+        The system prompt comes before the breakpoint, so it is cached along
+        with the prefix. Prefixes shorter than the provider's minimum would
+        not be cached anyway, and are sent unmarked.
+        """
+        if not self.prompt_caching or len(cache_prefix) < self.prompt_cache_min_chars:
+            return [{"role": "user", "content": cache_prefix + user_prompt}]
+        content = [
+            {"type": "text", "text": cache_prefix, "cache_control": CACHE_CONTROL},
+            {"type": "text", "text": user_prompt},
+        ]
+        return [{"role": "user", "content": content}]
+
+    def _record_usage(self, usage: anthropic.types.Usage) -> None:
+        self.usage.add(
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cache_read_input_tokens=usage.cache_read_input_tokens or 0,
+            cache_creation_input_tokens=usage.cache_creation_input_tokens or 0,
+        )
+
+    def stats(self) -> dict:
+        return asdict(self.usage)
+
+    async def warm_up(self) -> None:
+        # Any response will do - the point is to leave a TLS connection in the pool.
+        await self.http_client.head(str(self.client.base_url))
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class OpenAIClient(LLMClient):
+    """
+    Chat completions from OpenAI, or any server with an OpenAI-compatible API.
+
+    OpenAI caches long prompt prefixes without being asked, so `cache_prefix`
+    is simply sent first; cached tokens are still reported in the usage.
+    """
+
+    def __init__(self, max_retries: int = openai.DEFAULT_MAX_RETRIES):
+        settings = get_settings()
+        self.model = settings.openai_model
+        self.usage = TokenUsage(model=self.model)
+        self.http_client = openai.DefaultAsyncHttpxClient(**http_client_options())
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_llm_base_url or settings.openai_base_url,
+            http_client=self.http_client,
+            max_retries=max_retries,
+        )
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=self._messages(system_prompt, cache_prefix + user_prompt),
+        )
+        if response.usage is not None:
+            self._record_usage(response.usage)
+        return response.choices[0].message.content or ""
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=self._messages(system_prompt, cache_prefix + user_prompt),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async with stream:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    self._record_usage(chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
 
+    @staticmethod
+    def _messages(system_prompt: str, user_prompt: str) -> list[dict]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
 
+    def _record_usage(self, usage: openai.types.CompletionUsage) -> None:
+        details = usage.prompt_tokens_details
+        cached = (details.cached_tokens or 0) if details is not None else 0
+        self.usage.add(
+            input_tokens=usage.prompt_tokens - cached,
+            output_tokens=usage.completion_tokens,
+            cache_read_input_tokens=cached,
+        )
+
+    def stats(self) -> dict:
+        return asdict(self.usage)
+
+    async def warm_up(self) -> None:
+        await self.http_client.head(str(self.client.base_url))
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+class StubLLMClient(LLMClient):
+    """Canned replies after a fixed delay, for running without provider keys."""
+
+    def __init__(self, latency: float = 0.0, reply: str = STUB_REPLY):
+        self.latency = latency
+        self.reply = reply
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        await asyncio.sleep(self.latency)
+        return self.reply
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        first, *rest = self.reply.split(" ")
+        yield first
+        for word in rest:
+            yield " " + word
+
+
+class AdmittedLLMClient(LLMClient):
+    """
+    Admit calls to another client through an AdmissionController.
+
+    Each call is charged its estimated prompt tokens plus `max_tokens`, and
+    holds a concurrency slot until it finishes (streams until they end).
+    """
+
+    def __init__(self, client: LLMClient, admission: AdmissionController):
+        self.client = client
+        self.admission = admission
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        tokens = estimate_tokens(system_prompt + cache_prefix + user_prompt)
+        async with self.admission.admit(tokens + max_tokens):
+            return await self.client.complete(
+                system_prompt, user_prompt, max_tokens, cache_prefix
+            )
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        tokens = estimate_tokens(system_prompt + cache_prefix + user_prompt)
+        async with self.admission.admit(tokens + max_tokens) as permit:
+            async with aclosing(
+                self.client.stream(system_prompt, user_prompt, max_tokens, cache_prefix)
+            ) as chunks:
+                async for chunk in chunks:
+                    permit.first_token()
+                    yield chunk
+
+    def stats(self) -> dict:
+        return {"admission": self.admission.stats(), **self.client.stats()}
+
+    def check_capacity(self) -> None:
+        self.admission.check_capacity()
+
+    async def warm_up(self) -> None:
+        await self.client.warm_up()
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def build_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    bucket = None
+    if settings.llm_tokens_per_minute > 0:
+        # Holds a minute's worth of tokens, refilled continuously
+        bucket = TokenBucket(
+            rate=settings.llm_tokens_per_minute / 60,
+            capacity=settings.llm_tokens_per_minute,
+        )
+    return AdmissionController(
+        limit=AIMDLimit(
+            initial=settings.llm_concurrency_initial,
+            minimum=settings.llm_concurrency_min,
+            maximum=settings.llm_concurrency_max,
+            latency_target=settings.llm_latency_target,
+        ),
+        bucket=bucket,
+        max_queued=settings.llm_max_queued,
+        max_queue_wait=settings.llm_max_queue_wait,
+    )
+
+
+def build_backend(provider: str, max_retries: Optional[int] = None) -> LLMClient:
+    """
+    Build the client for one provider name from LLM_PROVIDER or LLM_BACKENDS.
+
+    `max_retries` overrides the SDK's own retries, which the router turns off
+    because it retries (on another backend, if need be) itself.
+    """
+    retries = {} if max_retries is None else {"max_retries": max_retries}
+    if provider == "anthropic":
+        return AnthropicClient(**retries)
+    if provider == "openai":
+        return OpenAIClient(**retries)
+    if provider == "stub":
+        return StubLLMClient(latency=get_settings().stub_llm_latency)
+    raise ValueError(f"Unsupported LLM provider: {provider}")
+
+
+@lru_cache
 def get_llm_client() -> LLMClient:
     settings = get_settings()
-    if settings.llm_provider == "anthropic":
-        return AnthropicClient()
+    if settings.llm_provider == "router":
+        # Imported here because the router module builds on this one
+        from app.clients.router import RouterLLMClient
+
+        client = RouterLLMClient.from_settings()
     else:
-        raise ValueError(f"Unsupported LLM provider: {settings.llm_provider}")
+        client = build_backend(settings.llm_provider)
+    if not settings.llm_admission_enabled:
+        return client
+    return AdmittedLLMClient(client, build_admission_controller())
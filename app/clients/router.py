@@ -0,0 +1,314 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import (AsyncGenerator, AsyncIterator, Awaitable, Callable,
+                    Optional, TypeVar)
+
+import anthropic
+import openai
+
+from app.clients.llm import LLMClient, build_backend
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import get_settings
+from app.core.logging import logger
+
+T = TypeVar("T")
+
+# Latency samples kept per backend for its percentiles
+LATENCY_WINDOW = 100
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class NoBackendAvailableError(Exception):
+    """Raised when every backend's circuit breaker is open."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a call that failed with `error` may succeed if retried elsewhere."""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(
+        error,
+        (
+            anthropic.APIConnectionError,
+            openai.APIConnectionError,
+            ConnectionError,
+            TimeoutError,
+        ),
+    )
+
+
+class LatencyTracker:
+    """Recent call latencies of one backend."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        """The `pct` percentile of recent latencies, or 0 before any call."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+@dataclass
+class Backend:
+    name: str
+    client: LLMClient
+    breaker: CircuitBreaker
+    latency: LatencyTracker = field(default_factory=LatencyTracker)
+    calls: int = 0
+    failures: int = 0
+    hedges: int = 0  # calls that were hedged because this backend was slow
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "p50_ms": round(self.latency.percentile(50) * 1000, 1),
+            "p95_ms": round(self.latency.percentile(95) * 1000, 1),
+            **self.client.stats(),
+        }
+
+
+class RouterLLMClient(LLMClient):
+    """
+    Spread LLM calls over several backends, favouring the fastest healthy one.
+
+    Backends are tried in order of their median recent latency (in the
+    configured order until they have been used). When a call has not
+    finished after the `hedge_percentile` latency of its backend, the same
+    call is sent to the next backend as well and whichever answers first
+    wins; the other call is cancelled. Calls that fail with a 429, a 5xx or
+    a connection error move on to the next backend straight away, and once
+    every backend has failed the whole call is retried after a jittered
+    exponential backoff, up to `max_attempts` times. Each backend has a
+    circuit breaker, so one that keeps failing is skipped for a while.
+
+    Streams are hedged and retried the same way up to their first chunk.
+    After that they are committed to one backend.
+    """
+
+    def __init__(
+        self,
+        backends: dict[str, LLMClient],
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 1.0,
+        max_attempts: int = 3,
+        retry_base_delay: float = 0.5,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30.0,
+    ):
+        if not backends:
+            raise ValueError("The LLM router needs at least one backend.")
+        self.backends = [
+            Backend(name, client, CircuitBreaker(breaker_failures, breaker_reset))
+            for name, client in backends.items()
+        ]
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+
+    @classmethod
+    def from_settings(cls) -> "RouterLLMClient":
+        settings = get_settings()
+        names = [name.strip() for name in settings.llm_backends.split(",")]
+        return cls(
+            # SDK retries are off: the router retries, on another backend if need be
+            backends={
+                name: build_backend(name, max_retries=0) for name in names if name
+            },
+            hedge_percentile=settings.llm_hedge_percentile,
+            hedge_min_delay=settings.llm_hedge_min_delay,
+            max_attempts=settings.llm_max_attempts,
+            retry_base_delay=settings.llm_retry_base_delay,
+            breaker_failures=settings.llm_breaker_failures,
+            breaker_reset=settings.llm_breaker_reset,
+        )
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        async def call(backend: Backend) -> str:
+            return await backend.client.complete(
+                system_prompt, user_prompt, max_tokens, cache_prefix
+            )
+
+        return await self._with_retries(call)
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        async def open_stream(backend: Backend) -> tuple[Optional[str], AsyncGenerator]:
+            chunks = backend.client.stream(
+                system_prompt, user_prompt, max_tokens, cache_prefix
+            )
+            try:
+                return await anext(chunks, None), chunks
+            except BaseException:
+                await chunks.aclose()
+                raise
+
+        async def discard(opened: tuple[Optional[str], AsyncGenerator]) -> None:
+            await opened[1].aclose()
+
+        first, chunks = await self._with_retries(open_stream, discard)
+        async with aclosing(chunks):
+            if first is None:
+                return
+            yield first
+            async for chunk in chunks:
+                yield chunk
+
+    async def _with_retries(
+        self,
+        call: Callable[[Backend], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        attempt = 1
+        while True:
+            try:
+                return await self._hedged(call, discard)
+            except Exception as e:
+                if attempt >= self.max_attempts or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, self.retry_base_delay * 2 ** (attempt - 1))
+                logger.warning(
+                    f"LLM call failed on every backend ({e!r}), "
+                    f"retrying in {delay:.2f}s."
+                )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _ranked(self) -> list[Backend]:
+        return sorted(
+            self.backends,
+            key=lambda backend: (
+                backend.breaker.state != CircuitBreaker.CLOSED,
+                backend.latency.percentile(50),
+            ),
+        )
+
+    def _hedge_delay(self, backend: Backend) -> float:
+        return max(
+            self.hedge_min_delay, backend.latency.percentile(self.hedge_percentile)
+        )
+
+    async def _hedged(
+        self,
+        call: Callable[[Backend], Awaitable[T]],
+        discard: Optional[Callable[[T], Awaitable[None]]] = None,
+    ) -> T:
+        """
+        Run `call` on the best backend, adding the next one when it is slow or fails.
+
+        Returns the first successful result. Calls still running are
+        cancelled, and `discard` releases results that lost the race.
+        """
+        candidates = self._ranked()
+        running: dict[asyncio.Task, Backend] = {}
+        error: Optional[Exception] = None
+
+        def launch() -> Optional[Backend]:
+            while candidates:
+                backend = candidates.pop(0)
+                # Asked only when about to call, so a half-open breaker gets its probe
+                if backend.breaker.allow():
+                    running[asyncio.create_task(self._timed(backend, call))] = backend
+                    return backend
+            return None
+
+        slowest = launch()
+        if slowest is None:
+            raise NoBackendAvailableError("Every LLM backend is unavailable.")
+        try:
+            while running:
+                timeout = self._hedge_delay(slowest) if candidates else None
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge = launch()
+                    if hedge is not None:
+                        logger.info(
+                            f"Hedging slow {slowest.name} call to {hedge.name}."
+                        )
+                        slowest.hedges += 1
+                        slowest = hedge
+                    continue
+                for task in done:
+                    backend = running.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        if not is_retryable(e):
+                            raise
+                        logger.warning(f"LLM backend {backend.name} failed: {e!r}")
+                        error = e
+                if not running:
+                    slowest = launch()
+                    if slowest is None:
+                        break
+            raise error or NoBackendAvailableError("Every LLM backend is unavailable.")
+        finally:
+            for task in running:
+                task.cancel()
+            results = await asyncio.gather(*running, return_exceptions=True)
+            if discard is not None:
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        await discard(result)
+
+    async def _timed(
+        self, backend: Backend, call: Callable[[Backend], Awaitable[T]]
+    ) -> T:
+        backend.calls += 1
+        start = time.monotonic()
+        try:
+            result = await call(backend)
+        except asyncio.CancelledError:
+            # The call lost a hedge: it would have taken at least this long,
+            # and a breaker probe that lost is not evidence of recovery
+            backend.latency.record(time.monotonic() - start)
+            if backend.breaker.state == CircuitBreaker.HALF_OPEN:
+                backend.breaker.record_failure()
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                backend.failures += 1
+                backend.breaker.record_failure()
+            else:
+                backend.breaker.record_success()
+            raise
+        backend.latency.record(time.monotonic() - start)
+        backend.breaker.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {backend.name: backend.stats() for backend in self.backends}
+
+    async def warm_up(self) -> None:
+        await asyncio.gather(*(backend.client.warm_up() for backend in self.backends))
+
+    async def aclose(self) -> None:
+        for backend in self.backends:
+            await backend.client.aclose()
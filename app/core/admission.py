@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Optional
+
+from app.core.metrics import observe_stage
+from app.core.rate_limit import TokenBucket
+
+
+class Priority(IntEnum):
+    """Queue priority of an LLM call; lower values are admitted first."""
+
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+# Priority of the LLM calls made by the current request. Tasks inherit it,
+# so setting it at the top of a batch item covers every call the item makes.
+llm_priority: ContextVar[Priority] = ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+# When the current context's latest LLM call was admitted (time.perf_counter()),
+# so callers timing a call can leave out its wait in the queue
+llm_admitted_at: ContextVar[float] = ContextVar("llm_admitted_at", default=0.0)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when an LLM call is turned away because the worker is overloaded."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AIMDLimit:
+    """
+    Concurrency limit adjusted by additive increase, multiplicative decrease.
+
+    Each call that finishes within `latency_target` raises the limit by
+    1/limit, so it grows by about one per limit's worth of calls. Slower calls
+    shrink it by `latency_decrease`, and rate-limited (429) calls halve it.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target: float,
+        latency_decrease: float = 0.9,
+        rate_limited_decrease: float = 0.5,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.latency_decrease = latency_decrease
+        self.rate_limited_decrease = rate_limited_decrease
+        self.average_latency = 0.0
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def on_success(self, latency: float) -> None:
+        self.average_latency = (
+            latency
+            if not self.average_latency
+            else 0.9 * self.average_latency + 0.1 * latency
+        )
+        if latency > self.latency_target:
+            self.limit = max(self.minimum, self.limit * self.latency_decrease)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_rate_limited(self) -> None:
+        self.limit = max(self.minimum, self.limit * self.rate_limited_decrease)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: Priority
+    sequence: int
+    tokens: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    admitted: bool = field(default=False, compare=False)
+
+
+class Permit:
+    """An admitted call. Streams call `first_token()` so latency means time to first token."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.latency: Optional[float] = None
+
+    def first_token(self) -> None:
+        if self.latency is None:
+            self.latency = time.monotonic() - self.start
+
+
+class AdmissionController:
+    """
+    Admit LLM calls under a concurrency limit and a token rate limit.
+
+    A call is admitted when fewer than `limit.current` calls are running and
+    `bucket` holds its estimated tokens (prompt plus max_tokens). Otherwise it
+    waits in a priority queue, interactive calls ahead of batch ones, for at
+    most `max_queue_wait` seconds. Once `max_queued` calls are waiting, a new
+    call replaces the lowest-priority waiter if it outranks it, and is turned
+    away otherwise. Turned-away calls raise AdmissionRejectedError at once.
+    """
+
+    def __init__(
+        self,
+        limit: AIMDLimit,
+        bucket: Optional[TokenBucket],
+        max_queued: int,
+        max_queue_wait: float,
+    ):
+        self.limit = limit
+        self.bucket = bucket
+        self.max_queued = max_queued
+        self.max_queue_wait = max_queue_wait
+        self.in_flight = 0
+        self.rejected = 0
+        self._queue: list[_Waiter] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @asynccontextmanager
+    async def admit(self, tokens: float) -> AsyncIterator[Permit]:
+        """
+        Wait for capacity for a call of about `tokens` tokens, and hold it until exit.
+
+        The wait is recorded as the `llm_queue` stage, and the time the call
+        was admitted in `llm_admitted_at`.
+        """
+        if self.bucket is not None:
+            tokens = min(tokens, self.bucket.capacity)
+        queued_at = time.perf_counter()
+        await self._acquire(tokens, llm_priority.get())
+        admitted_at = time.perf_counter()
+        observe_stage("llm_queue", admitted_at - queued_at)
+        llm_admitted_at.set(admitted_at)
+        permit = Permit()
+        try:
+            yield permit
+        except Exception as e:
+            if getattr(e, "status_code", None) == 429:
+                self.limit.on_rate_limited()
+            raise
+        else:
+            permit.first_token()
+            self.limit.on_success(permit.latency)
+        finally:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def check_capacity(self, priority: Optional[Priority] = None) -> None:
+        """Raise AdmissionRejectedError now if a call of this priority would be turned away."""
+        priority = llm_priority.get() if priority is None else priority
+        self._prune()
+        if not self._queue and self.in_flight < self.limit.current:
+            return
+        if len(self._queue) >= self.max_queued and (
+            not self._queue or max(self._queue).priority <= priority
+        ):
+            self.rejected += 1
+            raise AdmissionRejectedError("LLM queue is full.", self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds a turned-away client should wait, from the queue length and call latency."""
+        waiting = len(self._queue) + 1
+        latency = self.limit.average_latency or 1.0
+        return max(1, math.ceil(latency * waiting / max(self.limit.current, 1)))
+
+    async def _acquire(self, tokens: float, priority: Priority) -> None:
+        if not self._queue and self._has_capacity(tokens):
+            self.in_flight += 1
+            return
+
+        self.check_capacity(priority)
+        if len(self._queue) >= self.max_queued:
+            evicted = max(self._queue)
+            self._queue.remove(evicted)
+            heapq.heapify(self._queue)
+            self.rejected += 1
+            evicted.future.set_exception(
+                AdmissionRejectedError(
+                    "Displaced by higher priority work.", self.retry_after()
+                )
+            )
+        waiter = _Waiter(
+            priority,
+            next(self._sequence),
+            tokens,
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter.future, self.max_queue_wait)
+        except TimeoutError:
+            if waiter.admitted:
+                # Admitted just as the wait timed out
+                self.in_flight -= 1
+                self._dispatch()
+            self.rejected += 1
+            raise AdmissionRejectedError(
+                "Timed out waiting for LLM capacity.", self.retry_after()
+            )
+        except asyncio.CancelledError:
+            if waiter.admitted:
+                # Admitted just as the caller went away
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+
+    def _prune(self) -> None:
+        """Drop waiters that timed out or were cancelled."""
+        if any(waiter.future.done() for waiter in self._queue):
+            self._queue = [w for w in self._queue if not w.future.done()]
+            heapq.heapify(self._queue)
+
+    def _has_capacity(self, tokens: float) -> bool:
+        if self.in_flight >= self.limit.current:
+            return False
+        return self.bucket is None or self.bucket.try_acquire(tokens)
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while there is capacity."""
+        while self._queue:
+            waiter = self._queue[0]
+            if waiter.future.done():  # timed out or cancelled
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= self.limit.current:
+                return
+            if self.bucket is not None and not self.bucket.try_acquire(waiter.tokens):
+                self._retry_dispatch(self.bucket.wait_time(waiter.tokens))
+                return
+            heapq.heappop(self._queue)
+            self.in_flight += 1
+            waiter.admitted = True
+            waiter.future.set_result(None)
+
+    def _retry_dispatch(self, delay: float) -> None:
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit.current,
+            "in_flight": self.in_flight,
+            "queued": sum(not w.future.done() for w in self._queue),
+            "rejected": self.rejected,
+            "average_latency_ms": round(self.limit.average_latency * 1000, 1),
+        }
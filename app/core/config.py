@@ -18,25 +18,141 @@ class Settings(BaseSettings):
     llm_provider: str = "anthropic"
     openai_api_key: str | None = None
     anthropic_api_key: str | None = None
+    anthropic_base_url: str | None = None
     model: str = "claude-sonnet-4-6"
     max_tokens: int = 1024
 
+    # LLM_PROVIDER=router spreads calls over LLM_BACKENDS (comma-separated:
+    # anthropic, openai, stub), picking the fastest healthy one and hedging
+    # to the next when a call runs past that backend's usual latency
+    llm_backends: str = "anthropic,openai"
+    llm_hedge_percentile: float = 95.0  # hedge after this percentile of latency
+    llm_hedge_min_delay: float = 1.0  # never hedge sooner than this many seconds
+    llm_max_attempts: int = 3  # tries per call on 429, 5xx and connection errors
+    llm_retry_base_delay: float = 0.5  # backoff ceiling doubles on each retry
+    llm_breaker_failures: int = 5  # consecutive failures before skipping a backend
+    llm_breaker_reset: float = 30.0  # seconds before a skipped backend is probed
+    openai_model: str = "gpt-4o-mini"
+    openai_llm_base_url: str | None = None  # OpenAI-compatible server for summaries
+    stub_llm_latency: float = 0.0
+
+    # Admission control in front of the LLM client. Calls wait in a priority
+    # queue (interactive ahead of batch) for a concurrency slot and for their
+    # estimated tokens; a full queue or a long wait gets a fast 503.
+    llm_admission_enabled: bool = True
+    llm_tokens_per_minute: int = 400_000  # prompt + max_tokens (0 disables)
+    llm_concurrency_initial: int = 16
+    llm_concurrency_min: int = 2
+    llm_concurrency_max: int = 64
+    llm_latency_target: float = 30.0  # slower calls shrink the concurrency limit
+    llm_max_queued: int = 100
+    llm_max_queue_wait: float = 10.0
+
+    # Anthropic prompt caching of the text shared by calls for different styles
+    prompt_caching: bool = True
+    prompt_cache_min_chars: int = 4096  # ~1024 tokens, the smallest prefix cached
+
+    # Seconds between checks for edited prompt templates (0 disables hot reload)
+    prompt_reload_interval: float = 0.0
+
+    # Texts longer than max_chars are summarized chunk by chunk first (map-reduce)
+    chunk_tokens: int = 4000  # estimated token budget per chunk
+    chunk_summary_words: int = 250
+    chunk_concurrency: int = 4
+
+    # Server-sent event streams: deltas are coalesced into events of up to
+    # sse_flush_chars characters or sse_flush_interval seconds of tokens
+    sse_flush_chars: int = 64
+    sse_flush_interval: float = 0.05
+    sse_heartbeat_interval: float = 15.0  # idle seconds before a keep-alive comment
+
+    # Batch summarization (POST /summarize/batch)
+    batch_concurrency: int = 8  # in-flight items per batch
+    batch_rate_limit: float = 5.0  # LLM calls per second, shared by all batches
+    batch_burst: int = 10
+
     # OpenAI (for audio features)
     openai_api_key: str | None = None
+    openai_base_url: str | None = None
     whisper_model: str = "whisper-1"
     tts_model: str = "tts-1"
     tts_voice: str = "alloy"
+    audio_concurrency: int = 4  # concurrent Whisper/TTS calls per worker
+    # Long audio is transcribed in segments of at most this many seconds (and
+    # 25 MB), cut in the quietest part of the `pause_search` seconds before
+    # each limit, overlapping by `overlap` seconds
+    transcribe_segment_seconds: float = 600.0
+    transcribe_segment_overlap: float = 1.0
+    transcribe_pause_search: float = 30.0
+    transcribe_segment_concurrency: int = 4  # segments in flight per recording
+    # In-process cache of spoken summaries, in front of Redis when enabled
+    tts_cache_max_entries: int = 64
+    tts_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # File parsing worker pool (0 workers parses inline on the event loop)
+    parser_workers: int = 2
+    parser_use_processes: bool = True  # falls back to threads if unavailable
+    parser_max_queued: int = 8  # jobs waiting beyond the running ones
+    parser_timeout: float = 30.0  # per job; large files are parsed in several jobs
+    parser_batch_sections: int = 8  # pages (or DOCX sections) extracted per job
+
+    # Uploads larger than this are spooled to a temp file instead of memory
+    upload_spool_threshold: int = 1024 * 1024
+
+    # Background jobs (POST /jobs/upload, /jobs/transcribe). Job records live
+    # in "sqlite" (one host) or "redis"; inputs are kept in jobs_dir until the
+    # job finishes, so it must be shared storage for workers on several hosts.
+    jobs_store: str = "sqlite"
+    jobs_sqlite_path: str = "data/jobs.sqlite3"
+    jobs_dir: str = "data/jobs"
+    jobs_workers: int = 2  # jobs run at once per worker process
+    jobs_lease: float = 60.0  # seconds before a silent worker's job is taken over
+    jobs_max_attempts: int = 3
+    jobs_ttl: int = 86400  # seconds finished jobs (and their results) are kept
+    jobs_poll_interval: float = 0.5  # how often job event streams check for changes
+    # The runner (and its store) is otherwise set up by the first job request,
+    # which is also when jobs left unfinished by the last run are resumed
+    jobs_resume_at_startup: bool = False
 
     # Redis
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
     redis_enabled: bool = True
+    redis_max_connections: int = 50
+    redis_timeout: float = 0.25  # per-operation timeout in seconds
+    redis_breaker_failures: int = 5  # consecutive failures before skipping Redis
+    redis_breaker_reset: float = 30.0  # seconds before Redis is probed again
     cache_ttl: int = 86400  # 24 hours in seconds
+    cache_namespace: str = "ai-summarizer"  # prefix of every cache key
+    cache_key_secret: str = (
+        ""  # keys the cache key hash; set it to make keys unguessable
+    )
+    cache_compress_min_bytes: int = 1024  # cached values this large are compressed
+
+    # In-process cache in front of Redis (0 entries disables it)
+    local_cache_max_entries: int = 1024
+    local_cache_max_bytes: int = 16 * 1024 * 1024
+    local_cache_ttl: int = 300
+    cache_invalidation_channel: str | None = "ai-summarizer:cache-invalidation"
+
+    # Request coalescing: identical concurrent requests share one LLM call.
+    # Distributed mode extends this across workers with a short Redis lock.
+    single_flight_distributed: bool = False
+    single_flight_lock_ttl: float = 30.0  # also the longest a follower waits
+    single_flight_poll_interval: float = 0.1
+
+    # HTTP connection pooling (shared by the LLM and audio clients)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0  # seconds an idle connection stays open
+    http2: bool = False  # requires the optional 'h2' package
+    warm_up_clients: bool = True
 
     # Server
     host: str = "0.0.0.0"
     port: int = 8000
+    event_loop_lag_interval: float = 0.25  # seconds between lag samples; 0 disables
 
     model_config = ConfigDict(
         env_file=".env",
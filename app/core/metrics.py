@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+# From 1 ms (cache lookups, prompt rendering) to 2 minutes (long LLM calls)
+STAGE_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+STAGE_SECONDS = Histogram(
+    "summarizer_stage_seconds",
+    "Time spent in each stage of handling a request.",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "summarizer_cache_lookups_total",
+    "Summary cache lookups by tier (l1 local, l2 Redis) and result.",
+    ["tier", "result"],
+)
+LLM_TOKENS = Counter(
+    "summarizer_llm_tokens_total",
+    "LLM tokens by model and kind (input, cache_read, cache_write, output).",
+    ["model", "kind"],
+)
+EVENT_LOOP_LAG = Histogram(
+    "summarizer_event_loop_lag_seconds",
+    "How much later than scheduled the event loop ran a periodic check.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "summarizer_requests_in_flight",
+    "HTTP requests being handled, including streams still sending.",
+    multiprocess_mode="livesum",
+)
+
+
+@lru_cache(maxsize=None)
+def stage_histogram(stage: str) -> Histogram:
+    """The histogram child for one stage, looked up once rather than on every observation."""
+    return STAGE_SECONDS.labels(stage)
+
+
+@lru_cache(maxsize=None)
+def cache_lookup_counter(tier: str, result: str) -> Counter:
+    return CACHE_LOOKUPS.labels(tier, result)
+
+
+@lru_cache(maxsize=None)
+def token_counter(model: str, kind: str) -> Counter:
+    return LLM_TOKENS.labels(model, kind)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    stage_histogram(stage).observe(seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Record how long the block takes (including when it raises) as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_histogram(stage).observe(time.perf_counter() - start)
+
+
+async def monitor_event_loop(interval: float) -> None:
+    """
+    Sample event loop lag every `interval` seconds, until cancelled.
+
+    Lag is how much longer than asked a sleep takes: time the loop spent
+    running other callbacks, such as CPU-bound work that should be offloaded.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    The metrics in the Prometheus text format, and its content type.
+
+    With several worker processes, set PROMETHEUS_MULTIPROC_DIR so each
+    worker writes its samples there and any worker can report them all.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
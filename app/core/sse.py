@@ -0,0 +1,170 @@
+import asyncio
+import contextvars
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable, Optional
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.types import Receive, Scope, Send
+
+from app.core.admission import AdmissionRejectedError
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.models.stream import StreamDelta, StreamDone, StreamError
+
+# Sent when nothing else has been for a while, so idle proxies keep the
+# connection open. Lines starting with a colon are comments to SSE clients.
+HEARTBEAT = ": ping\n\n"
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    A text/event-stream response that proxies should pass through unbuffered.
+
+    Unlike StreamingResponse, the background task also runs when the client
+    disconnects, so it can release what the stream would have used.
+    """
+
+    media_type = "text/event-stream"
+
+    def __init__(self, content, **kwargs):
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        headers.update(kwargs.pop("headers", None) or {})
+        super().__init__(content, headers=headers, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        background, self.background = self.background, None
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if background is not None:
+                await background()
+
+
+def sse_event(event: BaseModel) -> str:
+    return f"data: {event.model_dump_json()}\n\n"
+
+
+def describe_error(error: Exception) -> str:
+    """The message sent to clients in a StreamError for a failed stream."""
+    if isinstance(error, (ValueError, AdmissionRejectedError)):
+        return str(error)
+    logger.error(f"Stream failed: {error!r}")
+    return "Summarization failed."
+
+
+async def text_deltas(
+    chunks: AsyncGenerator[str, None], path: str = "summary"
+) -> AsyncGenerator[StreamDelta, None]:
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield StreamDelta(path=path, value=chunk)
+
+
+async def _next(events: AsyncGenerator[BaseModel, None]) -> BaseModel:
+    return await anext(events)
+
+
+async def event_stream(
+    events: AsyncGenerator[BaseModel, None],
+    flush_chars: int,
+    flush_interval: float,
+    heartbeat_interval: float,
+    on_error: Callable[[Exception], str] = describe_error,
+) -> AsyncGenerator[str, None]:
+    """
+    Encode stream events as Server-Sent Events, ending with StreamDone.
+
+    Consecutive deltas to the same path are coalesced into one event until
+    `flush_chars` characters have been buffered or the first of them is
+    `flush_interval` seconds old, which saves per-event overhead when the
+    model emits many small tokens. Other events are sent as they come.
+    A heartbeat comment goes out after `heartbeat_interval` idle seconds.
+
+    If `events` fails, a StreamError with the message from `on_error` is
+    sent instead of StreamDone. If the client goes away, closing this
+    generator closes `events` straight away, cancelling the upstream LLM call.
+    """
+    loop = asyncio.get_running_loop()
+    # Each step of `events` runs as its own task; sharing one context between
+    # them keeps what a step sets (like llm_admitted_at) for the next ones
+    context = contextvars.copy_context()
+    buffered: Optional[StreamDelta] = None
+    flush_at = 0.0
+    next_event: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = loop.create_task(_next(events), context=context)
+            if buffered is not None:
+                timeout = max(flush_at - loop.time(), 0)
+            else:
+                timeout = heartbeat_interval
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+            if not done:
+                if buffered is not None:
+                    yield sse_event(buffered)
+                    buffered = None
+                else:
+                    yield HEARTBEAT
+                continue
+
+            future, next_event = next_event, None
+            try:
+                event = future.result()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                if buffered is not None:
+                    yield sse_event(buffered)
+                yield sse_event(StreamError(message=on_error(e)))
+                return
+
+            same_path = (
+                buffered is not None
+                and isinstance(event, StreamDelta)
+                and event.path == buffered.path
+            )
+            if buffered is not None and not same_path:
+                yield sse_event(buffered)
+                buffered = None
+            if not isinstance(event, StreamDelta):
+                yield sse_event(event)
+                continue
+            if buffered is None:
+                buffered = event.model_copy()
+                flush_at = loop.time() + flush_interval
+            else:
+                buffered.value += event.value
+            if len(buffered.value) >= flush_chars:
+                yield sse_event(buffered)
+                buffered = None
+
+        if buffered is not None:
+            yield sse_event(buffered)
+        yield sse_event(StreamDone())
+    finally:
+        if next_event is not None:
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+        await events.aclose()
+
+
+def event_stream_response(
+    events: AsyncGenerator[BaseModel, None],
+    on_error: Callable[[Exception], str] = describe_error,
+    background: Optional[BackgroundTask] = None,
+) -> EventStreamResponse:
+    """Stream events with event_stream, using the configured flush and heartbeat intervals."""
+    settings = get_settings()
+    return EventStreamResponse(
+        event_stream(
+            events,
+            flush_chars=settings.sse_flush_chars,
+            flush_interval=settings.sse_flush_interval,
+            heartbeat_interval=settings.sse_heartbeat_interval,
+            on_error=on_error,
+        ),
+        background=background,
+    )
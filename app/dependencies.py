@@ -1,26 +1,181 @@
-from fastapi import Depends
+from functools import lru_cache
+
+from fastapi import Depends, FastAPI
 
 from app.clients.llm import LLMClient, get_llm_client
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.rate_limit import TokenBucket
 from app.services.audio import AudioService
-from app.services.cache import CacheService
-from app.services.file_parser import FileParser
+from app.services.cache import CacheService, LocalCache
+from app.services.documents import DocumentExtractor
+from app.services.job_store import JobStore, RedisJobStore, SQLiteJobStore
+from app.services.jobs import JobPipelines, JobRunner
+from app.services.parse_pool import ParserPool
+from app.services.single_flight import SingleFlight, StreamFanout
+from app.services.speech import SpeechService
 from app.services.summarizer import SummarizerService
 
 
+@lru_cache
 def get_cache_service() -> CacheService:
     return CacheService()
 
 
+@lru_cache
 def get_audio_service() -> AudioService:
-    return AudioService()
+    return AudioService(cache=get_cache_service())
+
+
+@lru_cache
+def get_parser_pool() -> ParserPool:
+    settings = get_settings()
+    return ParserPool(
+        workers=settings.parser_workers,
+        max_queued=settings.parser_max_queued,
+        timeout=settings.parser_timeout,
+        use_processes=settings.parser_use_processes,
+    )
+
+
+@lru_cache
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
+
+
+@lru_cache
+def get_batch_rate_limiter() -> TokenBucket:
+    settings = get_settings()
+    return TokenBucket(rate=settings.batch_rate_limit, capacity=settings.batch_burst)
 
 
-def get_file_parser() -> FileParser:
-    return FileParser()
+@lru_cache
+def get_stream_fanout() -> StreamFanout:
+    return StreamFanout()
+
+
+@lru_cache
+def get_speech_cache() -> LocalCache:
+    settings = get_settings()
+    return LocalCache(
+        max_entries=settings.tts_cache_max_entries,
+        max_bytes=settings.tts_cache_max_bytes,
+        ttl=settings.cache_ttl,
+    )
+
+
+def get_speech_service(
+    audio_service: AudioService = Depends(get_audio_service),
+    cache: CacheService = Depends(get_cache_service),
+    stream_fanout: StreamFanout = Depends(get_stream_fanout),
+    local: LocalCache = Depends(get_speech_cache),
+) -> SpeechService:
+    return SpeechService(
+        audio_service=audio_service,
+        cache=cache,
+        stream_fanout=stream_fanout,
+        local=local,
+    )
 
 
 def get_summarizer_service(
     client: LLMClient = Depends(get_llm_client),
     cache: CacheService = Depends(get_cache_service),
+    single_flight: SingleFlight = Depends(get_single_flight),
+    stream_fanout: StreamFanout = Depends(get_stream_fanout),
 ) -> SummarizerService:
-    return SummarizerService(llm=client, cache=cache)
+    return SummarizerService(
+        llm=client,
+        cache=cache,
+        single_flight=single_flight,
+        stream_fanout=stream_fanout,
+    )
+
+
+def get_document_extractor(
+    parser: ParserPool = Depends(get_parser_pool),
+    cache: CacheService = Depends(get_cache_service),
+) -> DocumentExtractor:
+    return DocumentExtractor(
+        parser=parser,
+        cache=cache,
+        batch_size=get_settings().parser_batch_sections,
+    )
+
+
+def get_job_store() -> JobStore:
+    settings = get_settings()
+    if settings.jobs_store == "redis":
+        redis_client = get_cache_service().redis_client
+        if redis_client is None:
+            raise ValueError("JOBS_STORE=redis needs REDIS_ENABLED=true.")
+        return RedisJobStore(redis_client, settings.cache_namespace, settings.jobs_ttl)
+    if settings.jobs_store == "sqlite":
+        return SQLiteJobStore(settings.jobs_sqlite_path, settings.jobs_ttl)
+    raise ValueError(f"Unsupported job store: {settings.jobs_store}")
+
+
+@lru_cache
+def get_job_runner() -> JobRunner:
+    # Built from the pooled clients directly: jobs outlive the request that
+    # submitted them, so they can't use request-scoped dependencies
+    settings = get_settings()
+    pipelines = JobPipelines(
+        summarizer=get_summarizer_service(
+            get_llm_client(),
+            get_cache_service(),
+            get_single_flight(),
+            get_stream_fanout(),
+        ),
+        extractor=get_document_extractor(get_parser_pool(), get_cache_service()),
+        audio_service=get_audio_service(),
+        speech=get_speech_service(
+            get_audio_service(),
+            get_cache_service(),
+            get_stream_fanout(),
+            get_speech_cache(),
+        ),
+    )
+    return JobRunner(
+        store=get_job_store(),
+        pipelines=pipelines.by_kind(),
+        input_dir=settings.jobs_dir,
+        workers=settings.jobs_workers,
+        lease=settings.jobs_lease,
+        max_attempts=settings.jobs_max_attempts,
+        poll_interval=settings.jobs_poll_interval,
+    )
+
+
+# Clients and worker pools that live for the lifetime of the app
+POOLED_CLIENTS = (
+    get_llm_client,
+    get_cache_service,
+    get_audio_service,
+    get_parser_pool,
+)
+
+
+async def warm_up_clients(app: FastAPI) -> None:
+    """Build the pooled clients and open their first connections before traffic arrives."""
+    if not get_settings().warm_up_clients:
+        return
+    for provider in POOLED_CLIENTS:
+        factory = app.dependency_overrides.get(provider, provider)
+        try:
+            await factory().warm_up()
+        except Exception as e:
+            logger.warning(f"Warm-up of {provider.__name__} failed: {e}")
+
+
+async def close_clients() -> None:
+    """Close every pooled client that was created and forget it."""
+    # The job runner, built on first use rather than warmed up, comes first so
+    # its jobs are stopped before the clients they use
+    for provider in (get_job_runner, *POOLED_CLIENTS):
+        if provider.cache_info().currsize:
+            try:
+                await provider().aclose()
+            except Exception as e:
+                logger.warning(f"Shutdown of {provider.__name__} failed: {e}")
+        provider.cache_clear()
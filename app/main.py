@@ -1,21 +1,56 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 
+from app.clients.llm import LLMClient, get_llm_client
+from app.core.admission import AdmissionRejectedError
 from app.core.config import get_settings
 from app.core.logging import logger
+from app.core.metrics import monitor_event_loop, render_metrics
+from app.core.middleware import (MULTIPART_OVERHEAD, BodySizeLimitMiddleware,
+                                 InFlightMiddleware)
+from app.dependencies import (close_clients, get_cache_service, get_job_runner,
+                              warm_up_clients)
+from app.prompts.registry import get_prompt_registry
+from app.routes.audio import router as audio_router
+from app.routes.jobs import router as jobs_router
 from app.routes.summarize import router as summarize_router
+from app.routes.transcribe import MAX_SIZE
 from app.routes.transcribe import router as transcribe_router
+from app.routes.upload import MAX_FILE_SIZE
 from app.routes.upload import router as upload_router
+from app.services.cache import CacheService
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("App is starting...")
+    # Load and compile every prompt template now, failing fast on a bad one
+    prompts = get_prompt_registry()
+    if settings.prompt_reload_interval > 0:
+        prompts.start_watching(settings.prompt_reload_interval)
+    await warm_up_clients(app)
+    get_cache_service().start_invalidation_listener()
+    if settings.jobs_resume_at_startup:
+        # Resume jobs left unfinished by the last run
+        get_job_runner().start()
+    lag_monitor = None
+    if settings.event_loop_lag_interval > 0:
+        lag_monitor = asyncio.create_task(
+            monitor_event_loop(settings.event_loop_lag_interval)
+        )
     yield
     logger.info("App is shutting down...")
+    if lag_monitor is not None:
+        lag_monitor.cancel()
+        with suppress(asyncio.CancelledError):
+            await lag_monitor
+    await prompts.stop_watching()
+    await close_clients()
 
 
 settings = get_settings()
@@ -27,6 +62,18 @@ app = FastAPI(
     debug=settings.debug,
 )
 
+# Reject oversized uploads while they stream in rather than after buffering
+# (added first so the CORS middleware still wraps its 413s)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        upload_router.prefix: MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        transcribe_router.prefix: MAX_SIZE + MULTIPART_OVERHEAD,
+        f"{jobs_router.prefix}/upload": MAX_FILE_SIZE + MULTIPART_OVERHEAD,
+        f"{jobs_router.prefix}/transcribe": MAX_SIZE + MULTIPART_OVERHEAD,
+    },
+)
+
 # CORS middleware - allows frontend to call API
 app.add_middleware(
     CORSMiddleware,
@@ -36,12 +83,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so requests rejected by the other middleware are counted too
+app.add_middleware(InFlightMiddleware)
+
+
+@app.exception_handler(AdmissionRejectedError)
+async def admission_rejected(request: Request, error: AdmissionRejectedError):
+    # Shed load with a fast, retryable answer instead of queueing indefinitely
+    return JSONResponse(
+        {"detail": str(error)},
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 app.include_router(summarize_router)
 app.include_router(upload_router)
 app.include_router(transcribe_router)
+app.include_router(jobs_router)
+app.include_router(audio_router)
 
 
 @app.get("/health")
@@ -51,3 +114,19 @@ def health_check():
         "app": settings.app_name,
         "version": settings.version,
     }
+
+
+@app.get("/cache/stats")
+def cache_stats(cache: CacheService = Depends(get_cache_service)):
+    return cache.stats()
+
+
+@app.get("/llm/stats")
+def llm_stats(llm: LLMClient = Depends(get_llm_client)):
+    return llm.stats()
+
+
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
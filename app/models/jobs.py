@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.models.requests import Style
+from app.models.responses import SummaryResponse
+
+JobKind = Literal["upload", "transcribe"]
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+JobStage = Literal["parsing", "transcribing", "summarizing", "speaking"]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class Job(BaseModel):
+    id: str = Field(
+        ...,
+        description="Hash of the input file and options; resubmitting it finds this job.",
+    )
+    kind: JobKind
+    status: JobStatus = "queued"
+    stage: JobStage | None = Field(
+        default=None, description="What a running job is doing."
+    )
+    sections_parsed: int = Field(
+        default=0, description="Sections of an uploaded file extracted so far."
+    )
+    filename: str
+    input_sha256: str = Field(..., description="SHA-256 of the uploaded file.")
+    style: Style = "paragraph"
+    max_length: int = 200
+    tts: bool = False
+    attempts: int = Field(default=0, description="Times a worker has started the job.")
+    result: SummaryResponse | None = None
+    error: str | None = None
+    created_at: datetime = Field(default_factory=_now)
+    updated_at: datetime = Field(default_factory=_now)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
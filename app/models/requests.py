@@ -1,7 +1,9 @@
-from typing import Literal
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
+Style = Literal["paragraph", "bullet", "tldr"]
+
 
 class SummarizeRequest(BaseModel):
     text: str = Field(..., min_length=50, description="The text to summarize.")
@@ -11,6 +13,10 @@ class SummarizeRequest(BaseModel):
         le=1000,
         description="The maximum length of the summary in characters.",
     )
-    style: Literal["paragraph", "bullet", "tldr"] = Field(
-        default="paragraph", description="The style of the summary."
+    style: Style = Field(default="paragraph", description="The style of the summary.")
+    styles: Optional[list[Style]] = Field(
+        default=None,
+        min_length=1,
+        description="Summarize in each of these styles with a single LLM call, "
+        "instead of in `style`.",
     )
@@ -14,7 +14,24 @@ class SummaryResponse(BaseModel):
         default_factory=lambda: datetime.now(timezone.utc),
         description="The timestamp when the summary was generated.",
     )
-    audio_base64: str | None = None
+    audio_url: str | None = Field(
+        default=None, description="Where to stream the summary's speech (mp3) from."
+    )
+
+
+class MultiSummaryResponse(BaseModel):
+    summaries: list[SummaryResponse] = Field(
+        ..., description="One summary per requested style, in the requested order."
+    )
+
+
+class BatchResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the batch input.")
+    id: str | int | None = Field(
+        default=None, description="The item's 'id' field, echoed back if given."
+    )
+    result: SummaryResponse | None = None
+    error: str | None = None
 
 
 class StreamChunk(BaseModel):
@@ -2,16 +2,30 @@ from typing import Literal, Union
 
 from pydantic import BaseModel, Field
 
+from app.models.jobs import Job
+
 
 class StreamDelta(BaseModel):
     type: Literal["delta"] = "delta"
     path: str = Field(
         ...,
-        description="The path of the field being updated, e.g. 'summary', 'bullets[0]', 'actions[1]'.",
+        description="The path of the field being updated, e.g. 'summary', or with several styles 'paragraph', 'bullet[0]'.",
     )
     value: str = Field(..., description="Text to append at that path.")
 
 
+class StreamProgress(BaseModel):
+    type: Literal["progress"] = "progress"
+    sections_parsed: int = Field(
+        ..., description="Sections of an uploaded file extracted so far."
+    )
+
+
+class StreamJob(BaseModel):
+    type: Literal["job"] = "job"
+    job: Job
+
+
 class StreamDone(BaseModel):
     type: Literal["done"] = "done"
 
@@ -21,4 +35,4 @@ class StreamError(BaseModel):
     message: str
 
 
-StreamEvent = Union[StreamDelta, StreamDone, StreamError]
+StreamEvent = Union[StreamDelta, StreamProgress, StreamJob, StreamDone, StreamError]
@@ -1,21 +1,19 @@
-from pathlib import Path
+from app.prompts.registry import get_prompt_registry
 
-PROMPTS_DIR = Path(__file__).parent
+STYLES = ("paragraph", "bullet", "tldr")
+
+# Bump when the way templates are assembled into prompts changes, since that
+# changes the summaries as much as editing a template does
+LAYOUT_VERSION = 2
 
 
 def load_system_prompt() -> str:
     """
-    Load a system prompt from the prompts directory.
+    Load the system prompt.
     Returns:
         str: The content of the prompt file.
     """
-    system_prompt_path = PROMPTS_DIR / "base.txt"
-
-    if not system_prompt_path.exists():
-        raise FileNotFoundError(
-            f"System prompt file 'base.txt' not found in {PROMPTS_DIR}"
-        )
-    return system_prompt_path.read_text(encoding="utf-8")
+    return get_prompt_registry().get("base").text
 
 
 def load_prompt(style: str) -> str:
@@ -27,28 +25,100 @@ def load_prompt(style: str) -> str:
     Returns:
         str: The content of the prompt template file.
     """
-    valid_styles = ["paragraph", "bullet", "tldr"]
-    if style not in valid_styles:
-        raise ValueError(f"Invalid style '{style}'. Valid styles are {valid_styles}.")
+    _check_style(style)
+    return get_prompt_registry().get(style).text
+
 
-    prompt_path = PROMPTS_DIR / f"{style}.txt"
-    if not prompt_path.exists():
-        raise FileNotFoundError(
-            f"Prompt template file '{style}.txt' not found in {PROMPTS_DIR}"
-        )
-    return prompt_path.read_text(encoding="utf-8")
+def load_chunk_prompt() -> str:
+    """
+    Load the prompt template used to summarize one section of a long document.
+    Returns:
+        str: The content of the prompt template file.
+    """
+    return get_prompt_registry().get("chunk").text
 
 
-def build_user_prompt(text: str, style: str, max_length: int) -> str:
+def prompt_version(style: str) -> str:
     """
-    Build the user prompt by filling in the template with the provided text and parameters.
+    Hash of every template a summary in this style can be generated from.
+
+    Args:
+        style (str): A summary style, or "chunk" for chunk summaries.
+    Returns:
+        str: A short hash that changes whenever one of those templates does.
+    """
+    if style == "chunk":
+        fingerprint = get_prompt_registry().fingerprint("base", "chunk")
+    else:
+        _check_style(style)
+        fingerprint = get_prompt_registry().fingerprint("base", style, "chunk")
+    return f"l{LAYOUT_VERSION}{fingerprint}"
+
+
+def _check_style(style: str) -> None:
+    if style not in STYLES:
+        raise ValueError(f"Invalid style '{style}'. Valid styles are {list(STYLES)}.")
+
+
+def build_text_prefix(text: str) -> str:
+    """
+    Build the start of the user prompt, which holds the text to summarize.
+
+    The text comes before the style instruction so that prompts for different
+    styles of the same text share a prefix the provider can cache.
 
     Args:
         text (str): The text to summarize.
+    Returns:
+        str: The text with its heading, to be followed by a style instruction.
+    """
+    return "Text to summarize:\n" + text + "\n\n"
+
+
+def build_style_prompt(style: str, max_length: int) -> str:
+    """
+    Build the style instruction that follows the text in the user prompt.
+
+    Args:
         style (str): The style of the summary (e.g., "paragraph", "bullet", "tldr").
-        max_length (int): The maximum length of the summary in characters.
+        max_length (int): The maximum length of the summary in words.
+    Returns:
+        str: The instruction for this style, filled in with `max_length`.
+    """
+    _check_style(style)
+    return get_prompt_registry().get(style).render(max_length=max_length)
+
+
+def build_multi_style_prompt(styles: list[str], max_length: int) -> str:
+    """
+    Build the instruction that asks for summaries in several styles at once.
+
+    Args:
+        styles (list[str]): The styles to summarize in, in reply order.
+        max_length (int): The maximum length of each summary in words.
+    Returns:
+        str: The instruction, asking for a JSON object with one key per style.
+    """
+    instructions = "\n\n".join(
+        f'"{style}": {build_style_prompt(style, max_length)}' for style in styles
+    )
+    keys = ", ".join(f'"{style}"' for style in styles)
+    return (
+        get_prompt_registry().get("multi").render(instructions=instructions, keys=keys)
+    )
+
+
+def build_chunk_prompt(text: str, max_length: int) -> str:
+    """
+    Build the user prompt for summarizing one chunk of a long document.
+
+    Args:
+        text (str): The chunk of text to summarize.
+        max_length (int): The approximate length of the chunk summary in words.
     Returns:
-        str: Combined instruction and user prompt ready to be sent to the LLM.
+        str: Combined instruction and chunk ready to be sent to the LLM.
     """
-    prompt_instruction = load_prompt(style).format(max_length=max_length)
+    prompt_instruction = (
+        get_prompt_registry().get("chunk").render(max_length=max_length)
+    )
     return prompt_instruction + "\n\nText to summarize:\n" + text
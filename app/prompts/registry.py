@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from string import Formatter
+from typing import Optional
+
+from app.core.logging import logger
+
+PROMPTS_DIR = Path(__file__).parent
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A prompt template parsed once, with a hash of its content."""
+
+    name: str
+    text: str
+    hash: str
+    segments: tuple[tuple[str, Optional[str]], ...]
+
+    @classmethod
+    def compile(cls, name: str, text: str) -> "PromptTemplate":
+        """Parse a template, rejecting anything but plain `{field}` placeholders."""
+        segments = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (spec or conversion or not field.isidentifier()):
+                raise ValueError(
+                    f"Prompt template '{name}' has an unsupported field '{{{field}}}'."
+                )
+            segments.append((literal, field))
+        content_hash = hashlib.sha256(text.encode()).hexdigest()[:16]
+        return cls(name=name, text=text, hash=content_hash, segments=tuple(segments))
+
+    def render(self, **values) -> str:
+        return "".join(
+            literal if field is None else literal + str(values[field])
+            for literal, field in self.segments
+        )
+
+
+class PromptRegistry:
+    """
+    Prompt templates read from disk once and served from memory.
+
+    Each template carries a content hash so cache keys change whenever a
+    prompt does. `reload()` re-reads templates whose files changed, and
+    `start_watching()` does so periodically to pick up edits without a restart.
+    """
+
+    def __init__(self, directory: Path = PROMPTS_DIR):
+        self.directory = directory
+        self._templates: dict[str, PromptTemplate] = {}
+        self._mtimes: dict[str, int] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        self.reload()
+
+    def reload(self) -> bool:
+        """
+        Re-read new, edited and deleted templates.
+
+        The new set replaces the old one only once every template has been
+        compiled, so a broken edit leaves the previous templates in place.
+        Returns True if anything changed.
+        """
+        mtimes = {
+            path.stem: path.stat().st_mtime_ns for path in self.directory.glob("*.txt")
+        }
+        if mtimes == self._mtimes:
+            return False
+        templates: dict[str, PromptTemplate] = {}
+        for name, mtime in mtimes.items():
+            if name in self._templates and self._mtimes.get(name) == mtime:
+                templates[name] = self._templates[name]
+                continue
+            path = self.directory / f"{name}.txt"
+            templates[name] = PromptTemplate.compile(
+                name, path.read_text(encoding="utf-8")
+            )
+        self._templates, self._mtimes = templates, mtimes
+        return True
+
+    def get(self, name: str) -> PromptTemplate:
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise FileNotFoundError(
+                f"Prompt template '{name}.txt' not found in {self.directory}"
+            )
+
+    def fingerprint(self, *names: str) -> str:
+        """A short hash over the content of the named templates."""
+        hasher = hashlib.sha256()
+        for name in names:
+            hasher.update(self.get(name).hash.encode())
+        return hasher.hexdigest()[:16]
+
+    def start_watching(self, interval: float) -> None:
+        """Check for edited templates every `interval` seconds."""
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(interval))
+
+    async def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.reload):
+                    logger.info("Prompt templates reloaded.")
+            except (OSError, ValueError) as e:
+                logger.error(f"Keeping previous prompt templates: {e}")
+
+
+@lru_cache
+def get_prompt_registry() -> PromptRegistry:
+    return PromptRegistry()
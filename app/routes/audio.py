@@ -0,0 +1,44 @@
+from contextlib import aclosing
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.config import get_settings
+from app.dependencies import get_speech_service
+from app.services.speech import SpeechService
+
+router = APIRouter(prefix="/audio", tags=["audio"])
+
+
+@router.get("/{speech_id}")
+async def stream_audio(
+    speech_id: str,
+    speech: SpeechService = Depends(get_speech_service),
+) -> StreamingResponse:
+    """
+    Stream the speech of a summary as mp3, from the `audio_url` returned with it.
+
+    Audio that isn't cached yet is passed on as the TTS API produces it, so
+    playback can start before synthesis finishes.
+    """
+    audio = await speech.open(speech_id)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired audio id.")
+    # Wait for the first chunk, so a failing TTS call is answered with an
+    # error status rather than a cut-off 200
+    first_chunk = await anext(audio, b"")
+
+    async def chunks():
+        async with aclosing(audio):
+            yield first_chunk
+            async for chunk in audio:
+                yield chunk
+
+    return StreamingResponse(
+        chunks(),
+        media_type="audio/mpeg",
+        # The audio behind an id never changes
+        headers={
+            "Cache-Control": f"private, max-age={get_settings().cache_ttl}, immutable"
+        },
+    )
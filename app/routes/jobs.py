@@ -0,0 +1,114 @@
+from pathlib import Path
+
+from fastapi import (APIRouter, Depends, File, Form, HTTPException, Response,
+                     UploadFile)
+
+from app.core.config import get_settings
+from app.core.sse import EventStreamResponse, event_stream_response
+from app.dependencies import get_job_runner
+from app.models.jobs import Job, JobKind
+from app.models.requests import Style
+from app.models.stream import StreamJob
+from app.routes.transcribe import MAX_SIZE, check_audio_format
+from app.routes.upload import MAX_FILE_SIZE
+from app.services.file_parser import FileParser
+from app.services.jobs import JobRunner
+from app.services.spool import UploadTooLargeError, spool_upload
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+async def _submit(
+    runner: JobRunner,
+    response: Response,
+    kind: JobKind,
+    file: UploadFile,
+    max_size: int,
+    style: Style,
+    max_length: int,
+    tts: bool,
+) -> Job:
+    try:
+        spool = await spool_upload(
+            file, max_size, get_settings().upload_spool_threshold
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    with spool:
+        job = await runner.submit(kind, spool, file.filename, style, max_length, tts)
+    response.headers["Location"] = f"{router.prefix}/{job.id}"
+    return job
+
+
+@router.post("/upload", status_code=202)
+async def submit_upload(
+    response: Response,
+    file: UploadFile = File(...),
+    style: Style = Form("paragraph"),
+    max_length: int = Form(200, ge=50, le=1000),
+    tts: bool = Form(False),
+    runner: JobRunner = Depends(get_job_runner),
+) -> Job:
+    """
+    Summarize an uploaded file in the background, as POST /upload/ would.
+
+    Returns the job at once. Submitting the same file with the same options
+    again returns the existing job (unless it failed, which runs it again).
+    """
+    extensions = FileParser().extensions
+    if Path(file.filename).suffix.lower() not in extensions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type. Supported types: {', '.join(extensions)}",
+        )
+    return await _submit(
+        runner, response, "upload", file, MAX_FILE_SIZE, style, max_length, tts
+    )
+
+
+@router.post("/transcribe", status_code=202)
+async def submit_transcribe(
+    response: Response,
+    file: UploadFile = File(...),
+    style: Style = Form("paragraph"),
+    max_length: int = Form(200, ge=50, le=1000),
+    tts: bool = Form(False),
+    runner: JobRunner = Depends(get_job_runner),
+) -> Job:
+    """Transcribe and summarize audio in the background, as POST /transcribe/ would."""
+    check_audio_format(file.filename)
+    return await _submit(
+        runner, response, "transcribe", file, MAX_SIZE, style, max_length, tts
+    )
+
+
+async def _get_job(job_id: str, runner: JobRunner) -> Job:
+    job = await runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, runner: JobRunner = Depends(get_job_runner)) -> Job:
+    """A job's status, progress, and its result or error once finished."""
+    return await _get_job(job_id, runner)
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str, runner: JobRunner = Depends(get_job_runner)
+) -> EventStreamResponse:
+    """
+    Follow a job as Server-Sent Events.
+
+    A StreamJob event carries the job each time it changes, the last one
+    with its result or error, followed by StreamDone.
+    """
+    await _get_job(job_id, runner)
+
+    async def events():
+        async for job in runner.watch(job_id):
+            yield StreamJob(job=job)
+
+    return event_stream_response(events())
@@ -1,30 +1,64 @@
-import base64
-import json
+import asyncio
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 
-from app.dependencies import get_audio_service, get_summarizer_service
+from app.core.config import get_settings
+from app.core.rate_limit import TokenBucket
+from app.core.sse import (EventStreamResponse, event_stream_response,
+                          text_deltas)
+from app.dependencies import (get_batch_rate_limiter, get_speech_service,
+                              get_summarizer_service)
 from app.models.requests import SummarizeRequest
-from app.models.responses import SummaryResponse
-from app.services.audio import AudioService
+from app.models.responses import MultiSummaryResponse, SummaryResponse
+from app.services.batch import BatchRunner, iter_json_array, iter_jsonl
+from app.services.multi_style import MultiStyleFormatError
+from app.services.speech import SpeechService, speech_url
 from app.services.summarizer import SummarizerService
 
 router = APIRouter(prefix="/summarize", tags=["summarize"])
 
 
+class BatchStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that can start sending while the request body is still
+    being read. Listening for disconnects would consume body messages, so it
+    only starts once the handler has finished reading the body.
+    """
+
+    def __init__(self, *args, body_read: asyncio.Event, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.body_read = body_read
+
+    async def listen_for_disconnect(self, receive) -> None:
+        await self.body_read.wait()
+        await super().listen_for_disconnect(receive)
+
+
 @router.post("/")
 async def summarize(
     request: SummarizeRequest,
     tts: bool = False,
     service: SummarizerService = Depends(get_summarizer_service),
-    audio_service: AudioService = Depends(get_audio_service),
-) -> SummaryResponse:
+    speech: SpeechService = Depends(get_speech_service),
+) -> SummaryResponse | MultiSummaryResponse:
+    if request.styles:
+        if tts:
+            raise HTTPException(
+                status_code=400, detail="tts is not supported with multiple styles."
+            )
+        try:
+            return MultiSummaryResponse(
+                summaries=await service.summarize_styles(request)
+            )
+        except MultiStyleFormatError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
     summary_response = await service.summarize(request)
 
     if tts:
-        audio_bytes = audio_service.text_to_speech(summary_response.summary)
-        summary_response.audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+        speech_id = await speech.register(summary_response.summary)
+        summary_response.audio_url = speech_url(speech_id)
 
     return summary_response
 
@@ -33,10 +67,67 @@ async def summarize(
 async def summarize_stream(
     request: SummarizeRequest,
     service: SummarizerService = Depends(get_summarizer_service),
+) -> EventStreamResponse:
+    """
+    Stream a summary as Server-Sent Events.
+
+    Events are StreamDelta objects appending text to the "summary" path (or,
+    with `styles`, to each style's path), then StreamDone, or StreamError if
+    summarization fails part way. An overloaded worker answers 503 up front.
+    """
+    service.llm.check_capacity()
+    if request.styles:
+        events = service.summarize_styles_stream(request)
+    else:
+        events = text_deltas(service.summarize_stream(request))
+    return event_stream_response(events)
+
+
+@router.post("/batch")
+async def summarize_batch(
+    request: Request,
+    service: SummarizerService = Depends(get_summarizer_service),
+    rate_limiter: TokenBucket = Depends(get_batch_rate_limiter),
 ) -> StreamingResponse:
-    async def event_generator():
-        async for chunk in service.summarize_stream(request):
-            yield f"data: {json.dumps({'chunk': chunk, 'done': False})}\n\n"
-        yield f"data: {json.dumps({'chunk': '', 'done': True})}\n\n"
+    """
+    Summarize many texts in one call.
+
+    The body is a JSON array of summarize requests, or JSONL with one request
+    per line (read incrementally, so prefer it for large batches). Each item
+    may carry an "id" that is echoed back. Results are streamed as NDJSON in
+    completion order.
+    """
+    body_read = asyncio.Event()
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON.")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array.")
+        body_read.set()
+        source = iter_json_array(items)
+    else:
+
+        async def body_chunks():
+            try:
+                async for chunk in request.stream():
+                    yield chunk
+            finally:
+                body_read.set()
+
+        source = iter_jsonl(body_chunks())
+
+    runner = BatchRunner(
+        summarizer=service,
+        concurrency=get_settings().batch_concurrency,
+        rate_limiter=rate_limiter,
+    )
+
+    async def result_lines():
+        async for result in runner.run(source):
+            yield result.model_dump_json(exclude_none=True) + "\n"
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return BatchStreamingResponse(
+        result_lines(), media_type="application/x-ndjson", body_read=body_read
+    )
@@ -1,19 +1,32 @@
-import base64
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 
-from app.dependencies import get_audio_service, get_summarizer_service
+from app.core.config import get_settings
+from app.dependencies import (get_audio_service, get_speech_service,
+                              get_summarizer_service)
 from app.models.requests import SummarizeRequest
 from app.models.responses import SummaryResponse
-from app.services.audio import AudioService
+from app.services.audio import AudioService, AudioTooLargeError
+from app.services.speech import SpeechService, speech_url
+from app.services.spool import UploadTooLargeError, spool_upload
 from app.services.summarizer import SummarizerService
 
-MAX_SIZE = 25 * 1024 * 1024  # 25 MB OpenAI transcription limit
+# Audio over the 25 MB Whisper limit is split into segments by AudioService
+MAX_SIZE = 500 * 1024 * 1024  # 500 MB
 SUPPORTED_AUDIO_FORMATS = {".mp3", ".mp4", ".mpeg", ".mpga", ".m4a", ".wav", ".webm"}
 router = APIRouter(prefix="/transcribe", tags=["transcribe"])
 
 
+def check_audio_format(filename: str) -> None:
+    file_ext = Path(filename).suffix.lower()
+    if file_ext not in SUPPORTED_AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported audio format '{file_ext}'. Supported: {', '.join(SUPPORTED_AUDIO_FORMATS)}",
+        )
+
+
 @router.post("/", response_model=SummaryResponse)
 async def transcribe_and_summarize(
     file: UploadFile = File(...),
@@ -22,20 +35,24 @@ async def transcribe_and_summarize(
     tts: bool = Form(False),
     audio_service: AudioService = Depends(get_audio_service),
     summarizer_service: SummarizerService = Depends(get_summarizer_service),
+    speech: SpeechService = Depends(get_speech_service),
 ) -> SummaryResponse:
-    audio_data = await file.read()
-    if len(audio_data) > MAX_SIZE:
-        raise HTTPException(status_code=413, detail="File too large (max 25 MB)")
+    check_audio_format(file.filename)
 
-    file_ext = Path(file.filename).suffix.lower()
-    if file_ext not in SUPPORTED_AUDIO_FORMATS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported audio format '{file_ext}'. Supported: {', '.join(SUPPORTED_AUDIO_FORMATS)}",
+    try:
+        spool = await spool_upload(
+            file, MAX_SIZE, get_settings().upload_spool_threshold
         )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
     try:
-        text = audio_service.transcribe(audio_data=audio_data, filename=file.filename)
+        with spool, spool.open() as audio_file:
+            text = await audio_service.transcribe(
+                audio_data=audio_file, filename=file.filename, sha256=spool.sha256
+            )
+    except AudioTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -47,7 +64,7 @@ async def transcribe_and_summarize(
     summary_response = await summarizer_service.summarize(request)
 
     if tts:
-        audio_bytes = audio_service.text_to_speech(summary_response.summary)
-        summary_response.audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+        speech_id = await speech.register(summary_response.summary)
+        summary_response.audio_url = speech_url(speech_id)
 
     return summary_response
@@ -1,43 +1,143 @@
-import base64
+import asyncio
+from contextlib import aclosing
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from starlette.background import BackgroundTask
 
-from app.dependencies import (get_audio_service, get_file_parser,
+from app.core.config import get_settings
+from app.core.sse import (EventStreamResponse, describe_error,
+                          event_stream_response, text_deltas)
+from app.dependencies import (get_document_extractor, get_speech_service,
                               get_summarizer_service)
 from app.models.requests import SummarizeRequest
 from app.models.responses import SummaryResponse
-from app.services.audio import AudioService
-from app.services.file_parser import FileParser
-from app.services.summarizer import SummarizerService
+from app.models.stream import StreamDelta, StreamProgress
+from app.services.documents import DocumentExtractor
+from app.services.parse_pool import ParserOverloadedError
+from app.services.speech import SpeechService, speech_url
+from app.services.spool import UploadSpool, UploadTooLargeError, spool_upload
+from app.services.summarizer import (SourceDocument, SummarizerService,
+                                     replay_chunks)
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 router = APIRouter(prefix="/upload", tags=["upload"])
 
 
+async def _spool(file: UploadFile) -> UploadSpool:
+    try:
+        return await spool_upload(
+            file, MAX_FILE_SIZE, get_settings().upload_spool_threshold
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
 @router.post("/", response_model=SummaryResponse)
 async def upload_and_summarize(
     file: UploadFile = File(...),
     style: str = Form("paragraph"),
     max_length: int = Form(200),
     tts: bool = Form(False),
-    parser: FileParser = Depends(get_file_parser),
+    extractor: DocumentExtractor = Depends(get_document_extractor),
     service: SummarizerService = Depends(get_summarizer_service),
-    audio_service: AudioService = Depends(get_audio_service),
+    speech: SpeechService = Depends(get_speech_service),
 ) -> SummaryResponse:
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large (max 10 MB)")
-
-    try:
-        text = parser.parse_file(content, file.filename)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-
-    request = SummarizeRequest(text=text, max_length=max_length, style=style)
-    summary_response = await service.summarize(request)
+    spool = await _spool(file)
+    with spool:
+        try:
+            document = SourceDocument(key=extractor.document_key(spool, file.filename))
+            summary_response = await service.summarize_document(
+                document,
+                extractor.iter_sections(spool, file.filename),
+                style,
+                max_length,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ParserOverloadedError as e:
+            raise HTTPException(
+                status_code=503, detail=str(e), headers={"Retry-After": "1"}
+            )
+        except TimeoutError:
+            raise HTTPException(
+                status_code=504, detail="Timed out extracting text from file"
+            )
 
     if tts:
-        audio_bytes = audio_service.text_to_speech(summary_response.summary)
-        summary_response.audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+        speech_id = await speech.register(summary_response.summary)
+        summary_response.audio_url = speech_url(speech_id)
 
     return summary_response
+
+
+@router.post("/stream")
+async def upload_and_summarize_stream(
+    file: UploadFile = File(...),
+    style: str = Form("paragraph"),
+    max_length: int = Form(200),
+    extractor: DocumentExtractor = Depends(get_document_extractor),
+    service: SummarizerService = Depends(get_summarizer_service),
+) -> EventStreamResponse:
+    """
+    Stream the summary of an uploaded file as Server-Sent Events.
+
+    While the file is extracted, StreamProgress events report how many
+    sections (PDF pages, or about a page of a DOCX) have been parsed; long
+    documents are already being summarized chunk by chunk at that point.
+    Summary deltas then follow as in /summarize/stream.
+    """
+    service.llm.check_capacity()
+    spool = await _spool(file)
+
+    async def events():
+        try:
+            document = SourceDocument(key=extractor.document_key(spool, file.filename))
+            cached_response = await service.get_cached_document(
+                document, style, max_length
+            )
+        except BaseException:
+            spool.close()
+            raise
+        if cached_response is not None:
+            spool.close()
+            for chunk in replay_chunks(cached_response.summary):
+                yield StreamDelta(path="summary", value=chunk)
+            return
+
+        progress: asyncio.Queue[int] = asyncio.Queue()
+
+        async def counted_sections():
+            sections_parsed = 0
+            async for section in extractor.iter_sections(spool, file.filename):
+                sections_parsed += 1
+                progress.put_nowait(sections_parsed)
+                yield section
+
+        condensing = asyncio.create_task(service.condense_sections(counted_sections()))
+        condensing.add_done_callback(lambda _: progress.put_nowait(0))
+        try:
+            with spool:
+                while (sections_parsed := await progress.get()) != 0:
+                    yield StreamProgress(sections_parsed=sections_parsed)
+                text, document.condensed = await condensing
+            request = SummarizeRequest(text=text, max_length=max_length, style=style)
+            async with aclosing(
+                text_deltas(service.summarize_stream(request, document))
+            ) as deltas:
+                async for delta in deltas:
+                    yield delta
+        finally:
+            condensing.cancel()
+
+    # Also closes the spool if the client leaves before events() is entered
+    return event_stream_response(
+        events(), on_error=_describe_error, background=BackgroundTask(spool.close)
+    )
+
+
+def _describe_error(error: Exception) -> str:
+    if isinstance(error, ParserOverloadedError):
+        return str(error)
+    if isinstance(error, TimeoutError):
+        return "Timed out extracting text from file"
+    return describe_error(error)
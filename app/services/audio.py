@@ -1,39 +1,228 @@
-import io
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+import wave
+from io import BytesIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import AsyncIterator, BinaryIO, Optional
 
-from openai import OpenAI
+import openai
+from openai import AsyncOpenAI
 
+from app.clients.http import http_client_options
 from app.core.config import get_settings
+from app.core.metrics import observe_stage, timed
+from app.services.cache import CacheService
+from app.services.segmentation import (WAV_HEADER_BYTES, WHISPER_MAX_BYTES,
+                                       decode_to_wav, decoder_available,
+                                       is_wav, plan_segments, read_segment,
+                                       stitch_transcripts)
+from app.services.spool import CHUNK_SIZE
+
+# Speech audio is passed on in chunks of about this size as it arrives
+SPEECH_CHUNK_BYTES = 16 * 1024
+
+
+class AudioTooLargeError(ValueError):
+    """Raised for audio over Whisper's size limit that can't be split up."""
+
+
+def hash_audio(audio_file: BinaryIO) -> str:
+    """SHA-256 of a file's contents, read in chunks. Leaves it at the start."""
+    audio_file.seek(0)
+    hasher = hashlib.sha256()
+    while chunk := audio_file.read(CHUNK_SIZE):
+        hasher.update(chunk)
+    audio_file.seek(0)
+    return hasher.hexdigest()
 
 
 class AudioService:
-    """Handle audio transcription and text-to-speech."""
+    """
+    Handle audio transcription and text-to-speech.
+
+    With a cache, transcripts are kept under a hash of the audio and the
+    Whisper model, so a recording submitted again (say, for another summary
+    style) is not transcribed twice.
+    """
 
-    def __init__(self):
-        # Initialize OpenAI client with API key
+    def __init__(self, cache: Optional[CacheService] = None):
+        # Initialize OpenAI client with API key and a shared connection pool
         # Store model settings
         settings = get_settings()
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.http_client = openai.DefaultAsyncHttpxClient(**http_client_options())
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=self.http_client,
+        )
+        self.cache = cache
         self.whisper_model = settings.whisper_model
         self.tts_model = settings.tts_model
         self.tts_voice = settings.tts_voice
+        # Caps concurrent Whisper and TTS calls from this worker
+        self.semaphore = asyncio.Semaphore(settings.audio_concurrency)
+        self.segment_seconds = settings.transcribe_segment_seconds
+        self.segment_overlap = settings.transcribe_segment_overlap
+        self.pause_search = settings.transcribe_pause_search
+        self.segment_concurrency = settings.transcribe_segment_concurrency
+
+    async def warm_up(self) -> None:
+        """Open a pooled connection to the API host ahead of the first request."""
+        await self.http_client.head(str(self.client.base_url))
+
+    async def aclose(self) -> None:
+        await self.client.close()
 
-    def transcribe(self, audio_data: bytes, filename: str) -> str:
-        """Transcribe audio to text using Whisper."""
-        audio_buffer = io.BytesIO(audio_data)
-        audio_buffer.name = filename
+    async def transcribe(
+        self,
+        audio_data: bytes | BinaryIO,
+        filename: str,
+        sha256: Optional[str] = None,
+    ) -> str:
+        """
+        Transcribe audio to text using Whisper, or get its cached transcript.
 
-        transcription = self.client.audio.transcriptions.create(
-            file=audio_buffer,
-            model=self.whisper_model,
+        `sha256` is the hex digest of the audio if the caller has it already
+        (as an UploadSpool does); otherwise the audio is hashed here.
+
+        A file object is streamed into the request body in chunks rather than
+        read into memory first. WAV audio longer than a segment, and audio in
+        other formats over Whisper's size limit (decoded with ffmpeg), is
+        split into segments that are transcribed concurrently; see
+        app.services.segmentation.
+        """
+        audio_file = (
+            BytesIO(audio_data) if isinstance(audio_data, bytes) else audio_data
         )
+        if self.cache is None:
+            return await self._transcribe(audio_file, filename)
+        if sha256 is None:
+            sha256 = await asyncio.to_thread(hash_audio, audio_file)
+        audio_key = f"{self.whisper_model}:{sha256}"
+        text = await self.cache.get_transcript(audio_key)
+        if text is None:
+            text = await self._transcribe(audio_file, filename)
+            await self.cache.set_transcript(audio_key, text)
+        return text
+
+    async def _transcribe(self, audio_file: BinaryIO, filename: str) -> str:
+        with timed("transcribe"):
+            if is_wav(audio_file):
+                text = await self._transcribe_wav(audio_file, filename)
+                if text is not None:
+                    return text
+            size = audio_file.seek(0, os.SEEK_END)
+            audio_file.seek(0)
+            if size <= WHISPER_MAX_BYTES:
+                return await self._transcribe_file(audio_file, filename)
+            return await self._transcribe_decoded(audio_file, filename)
+
+    async def _transcribe_file(
+        self, audio_data: bytes | BinaryIO, filename: str
+    ) -> str:
+        async with self.semaphore:
+            transcription = await self.client.audio.transcriptions.create(
+                file=(filename, audio_data),
+                model=self.whisper_model,
+            )
         return transcription.text
 
-    def text_to_speech(self, text: str) -> bytes:
+    async def _transcribe_wav(
+        self, audio_file: BinaryIO, filename: str
+    ) -> Optional[str]:
+        """Transcribe PCM WAV in segments, or return None for WAV we can't read."""
+        try:
+            wav = wave.open(audio_file)
+        except (wave.Error, EOFError):
+            audio_file.seek(0)
+            return None
+        with wav:
+            rate = wav.getframerate()
+            frame_size = wav.getsampwidth() * wav.getnchannels()
+            max_frames = min(
+                int(self.segment_seconds * rate),
+                (WHISPER_MAX_BYTES - WAV_HEADER_BYTES) // frame_size,
+            )
+            segments = await asyncio.to_thread(
+                plan_segments,
+                wav,
+                max_frames,
+                int(self.segment_overlap * rate),
+                int(self.pause_search * rate),
+            )
+            if len(segments) == 1:
+                audio_file.seek(0)
+                return await self._transcribe_file(audio_file, filename)
+
+            reading = asyncio.Lock()  # the segments are read from one file
+            limit = asyncio.Semaphore(self.segment_concurrency)
+            stem = Path(filename).stem
+
+            async def transcribe_segment(index: int, segment) -> str:
+                async with limit:
+                    async with reading:
+                        data = await asyncio.to_thread(read_segment, wav, segment)
+                    return await self._transcribe_file(data, f"{stem}-{index}.wav")
+
+            tasks = [
+                asyncio.create_task(transcribe_segment(index, segment))
+                for index, segment in enumerate(segments)
+            ]
+            try:
+                texts = await asyncio.gather(*tasks)
+            finally:
+                # Don't leave the other segments running when one fails
+                for task in tasks:
+                    task.cancel()
+        return stitch_transcripts(texts)
+
+    async def _transcribe_decoded(self, audio_file: BinaryIO, filename: str) -> str:
+        if not decoder_available():
+            raise AudioTooLargeError(
+                f"Audio over {WHISPER_MAX_BYTES // (1024 * 1024)} MB must be WAV "
+                "unless ffmpeg is installed to decode it."
+            )
+        with TemporaryDirectory(prefix="audio-") as directory:
+            source = Path(directory) / f"source{Path(filename).suffix}"
+            decoded = Path(directory) / "decoded.wav"
+            await asyncio.to_thread(_copy_file, audio_file, source)
+            await decode_to_wav(source, decoded)
+            with open(decoded, "rb") as wav_file:
+                text = await self._transcribe_wav(
+                    wav_file, f"{Path(filename).stem}.wav"
+                )
+        if text is None:
+            raise ValueError("Could not decode the audio file.")
+        return text
+
+    async def text_to_speech(self, text: str) -> bytes:
         """Convert text to speech audio"""
-        response = self.client.audio.speech.create(
-            model=self.tts_model,
-            voice=self.tts_voice,
-            input=text,
-            instructions="Speak in a cheerful and positive tone.",
-        )
-        return response.content
+        return b"".join([chunk async for chunk in self.stream_speech(text)])
+
+    async def stream_speech(self, text: str) -> AsyncIterator[bytes]:
+        """Yield speech audio (mp3) for text as the API sends it."""
+        start = time.perf_counter()
+        with timed("tts"):
+            async with self.semaphore:
+                async with self.client.audio.speech.with_streaming_response.create(
+                    model=self.tts_model,
+                    voice=self.tts_voice,
+                    input=text,
+                    instructions="Speak in a cheerful and positive tone.",
+                    response_format="mp3",
+                ) as response:
+                    first = True
+                    async for chunk in response.iter_bytes(SPEECH_CHUNK_BYTES):
+                        if first:
+                            observe_stage("tts_first_byte", time.perf_counter() - start)
+                            first = False
+                        yield chunk
+
+
+def _copy_file(audio_file: BinaryIO, path: Path) -> None:
+    with open(path, "wb") as target:
+        shutil.copyfileobj(audio_file, target)
@@ -0,0 +1,100 @@
+import asyncio
+import json
+from typing import Any, AsyncGenerator, AsyncIterable, AsyncIterator
+
+from app.core.admission import AdmissionRejectedError, Priority, llm_priority
+from app.core.logging import logger
+from app.core.rate_limit import TokenBucket
+from app.models.requests import SummarizeRequest
+from app.models.responses import BatchResult
+from app.services.summarizer import SummarizerService
+
+
+async def iter_jsonl(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Yield the non-blank lines of a JSONL body as it is received."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def iter_json_array(items: list) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+
+class BatchRunner:
+    """
+    Summarize a stream of batch items with bounded concurrency.
+
+    Items are pulled from the input only when a slot is free, so memory for
+    in-flight work stays O(concurrency) however long the batch is. Cache hits
+    are answered straight away; misses wait on the shared rate limiter before
+    calling the LLM, and queue for it behind interactive requests. Results
+    are yielded in completion order.
+    """
+
+    def __init__(
+        self, summarizer: SummarizerService, concurrency: int, rate_limiter: TokenBucket
+    ):
+        self.summarizer = summarizer
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+
+    async def run(self, items: AsyncIterable[Any]) -> AsyncGenerator[BatchResult, None]:
+        item_iterator = aiter(items)
+        pending: set[asyncio.Task] = set()
+        index = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < self.concurrency:
+                    try:
+                        item = await anext(item_iterator)
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.create_task(self._run_item(index, item)))
+                    index += 1
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _run_item(self, index: int, item: Any) -> BatchResult:
+        # Each item runs in its own task, so this only lowers this item's calls
+        llm_priority.set(Priority.BATCH)
+        item_id = None
+        try:
+            if isinstance(item, (str, bytes)):
+                item = json.loads(item)
+            if not isinstance(item, dict):
+                raise ValueError("Each batch item must be a JSON object.")
+            item_id = item.pop("id", None)
+            if item_id is not None and not isinstance(item_id, (str, int)):
+                item_id = str(item_id)
+            summarize_request = SummarizeRequest(**item)
+            if summarize_request.styles:
+                raise ValueError("Batch items take a single 'style', not 'styles'.")
+
+            summary_response = await self.summarizer.get_cached(summarize_request)
+            if summary_response is None:
+                await self.rate_limiter.acquire()
+                summary_response = await self.summarizer.summarize(summarize_request)
+            return BatchResult(index=index, id=item_id, result=summary_response)
+        except (ValueError, AdmissionRejectedError) as e:
+            return BatchResult(index=index, id=item_id, error=str(e))
+        except Exception as e:
+            logger.error(f"Batch item {index} failed: {e!r}")
+            return BatchResult(index=index, id=item_id, error="Summarization failed.")
@@ -1,56 +1,435 @@
-import hashlib
-import json
-from typing import Optional
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Optional
 
-import redis
+import redis.asyncio as redis
 
+from app.core.circuit_breaker import CircuitBreaker
 from app.core.config import get_settings
 from app.core.logging import logger
+from app.core.metrics import cache_lookup_counter, timed
+from app.prompts.loader import prompt_version
+from app.services.cache_format import (CacheFormatError, decode_value,
+                                       encode_value, hash_parts)
+
+# Delete the lock only if it still holds our token, so a lock that expired and
+# was taken by another worker is left alone.
+UNLOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    errors: int = 0
+
+
+class LocalCache:
+    """
+    In-process LRU cache with a per-entry TTL, bounded by entry count and bytes.
+
+    Values are kept decoded so a hit skips both the Redis round trip and
+    decoding. `size` is the encoded payload length, used for the byte budget.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: dict, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
 
 
 class CacheService:
-    """Redis cache for storing summaries."""
+    """
+    Two-level cache for storing summaries.
+
+    L1 is a small in-process LocalCache in front of L2, the shared Redis store.
+    Writes go to both; other workers drop their stale L1 copy when they see the
+    key on the invalidation channel. Summaries of uploaded documents are kept
+    the same way, keyed by the uploaded file rather than its text (see
+    generate_document_key). Text extracted from uploaded documents is cached
+    in Redis only, under a hash of the uploaded file, as are audio
+    transcripts and spoken summaries (see app.services.speech).
 
-    def __init__(self):
+    Values are stored in the binary format of app.services.cache_format. Keys
+    start with the namespace, what is cached and, for summaries, the model and
+    a hash of the prompt templates, so changing either never serves an older
+    summary.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
         settings = get_settings()
-        self.redis_client = redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_db,
-            decode_responses=True,
+        self.instance_id = uuid.uuid4().hex
+        self.namespace = settings.cache_namespace
+        self.model = settings.model
+        self.key_secret = settings.cache_key_secret.encode()
+        self.compress_min_bytes = settings.cache_compress_min_bytes
+        self.invalidation_channel = settings.cache_invalidation_channel
+        self.stats_l2 = CacheStats()
+        self._listener: Optional[asyncio.Task] = None
+        self.timeout = settings.redis_timeout
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.redis_breaker_failures,
+            reset_timeout=settings.redis_breaker_reset,
         )
+        self.redis_client = redis_client
+        if self.redis_client is None and settings.redis_enabled:
+            pool = redis.ConnectionPool(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                decode_responses=False,
+                max_connections=settings.redis_max_connections,
+                socket_keepalive=True,
+                socket_connect_timeout=settings.redis_timeout,
+            )
+            self.redis_client = redis.Redis(connection_pool=pool)
 
-    def _generate_cache_key(self, text: str, style: str, max_length: int) -> str:
-        """Generate a unique cache key by hashing inputs."""
-        combined = f"{text}:{style}:{max_length}"
-        hash_object = hashlib.sha256(combined.encode())
-        cache_key = hash_object.hexdigest()
-        return cache_key
+        self.local: Optional[LocalCache] = None
+        if self.redis_client is not None and settings.local_cache_max_entries > 0:
+            self.local = LocalCache(
+                max_entries=settings.local_cache_max_entries,
+                max_bytes=settings.local_cache_max_bytes,
+                ttl=min(settings.local_cache_ttl, settings.cache_ttl),
+            )
+
+    async def warm_up(self) -> None:
+        """Open the first pooled connection so the first request skips the handshake."""
+        if self.redis_client is not None:
+            await self._call(self.redis_client.ping)
+
+    async def aclose(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self.redis_client is not None:
+            await self.redis_client.aclose()
+            await self.redis_client.connection_pool.disconnect()
+
+    async def _call(
+        self, operation: Callable[..., Awaitable], *args, default: Any = None, **kwargs
+    ) -> Any:
+        """
+        Run a Redis operation under the per-operation timeout and circuit breaker.
 
-    def get(self, text: str, style: str, max_length: int) -> Optional[dict]:
-        """Get cached summary if it exists."""
+        Returns `default` when Redis is skipped or fails, so callers treat it as a miss.
+        """
+        if not self.breaker.allow():
+            return default
         try:
-            cache_key = self._generate_cache_key(
-                text=text, style=style, max_length=max_length
+            result = await asyncio.wait_for(
+                operation(*args, **kwargs), timeout=self.timeout
             )
-            summary_text = self.redis_client.get(cache_key)
-            if summary_text:
-                return json.loads(summary_text)
+        except (redis.RedisError, OSError, asyncio.TimeoutError) as e:
+            self.breaker.record_failure()
+            self.stats_l2.errors += 1
+            logger.error(f"Redis error: {e!r}")
+            return default
+        except BaseException:
+            # A cancelled or crashed probe is no evidence of recovery, and
+            # leaving the breaker half-open would skip Redis until a restart
+            if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def generate_cache_key(self, text: str, style: str, max_length: int) -> str:
+        """Generate a unique cache key by hashing inputs."""
+        digest = hash_parts((text, style, max_length), secret=self.key_secret)
+        prompt_hash = prompt_version(style)
+        return f"{self.namespace}:summary:{self.model}:{prompt_hash}:{digest}"
+
+    def generate_document_key(
+        self, document_key: str, style: str, max_length: int
+    ) -> str:
+        """Generate the cache key of an uploaded document's summary, by its content key."""
+        digest = hash_parts((document_key, style, max_length), secret=self.key_secret)
+        prompt_hash = prompt_version(style)
+        return f"{self.namespace}:docsummary:{self.model}:{prompt_hash}:{digest}"
+
+    def _decode(self, cache_key: str, payload: bytes) -> Any:
+        try:
+            return decode_value(payload)
+        except CacheFormatError as e:
+            logger.warning(f"Ignoring unreadable cache entry {cache_key}: {e}")
             return None
-        except redis.RedisError as e:
-            logger.error(f"Redis error: {e}")
+
+    async def get(self, text: str, style: str, max_length: int) -> Optional[dict]:
+        """Get cached summary if it exists, checking the local tier first."""
+        return await self._get(self.generate_cache_key(text, style, max_length))
+
+    async def get_document_summary(
+        self, document_key: str, style: str, max_length: int
+    ) -> Optional[dict]:
+        """Get the cached summary of an uploaded document, as in get."""
+        return await self._get(
+            self.generate_document_key(document_key, style, max_length)
+        )
+
+    async def _get(self, cache_key: str) -> Optional[dict]:
+        if self.redis_client is None:
             return None
+        with timed("cache_get"):
+            return await self._lookup(cache_key)
 
-    def set(self, text: str, style: str, max_length: int, summary_data: dict) -> None:
+    async def _lookup(self, cache_key: str) -> Optional[dict]:
+        if self.local is not None:
+            summary_data = self.local.get(cache_key)
+            if summary_data is not None:
+                cache_lookup_counter("l1", "hit").inc()
+                return summary_data
+            cache_lookup_counter("l1", "miss").inc()
+
+        payload = await self._call(self.redis_client.get, cache_key)
+        summary_data = self._decode(cache_key, payload) if payload else None
+        if summary_data is None:
+            self.stats_l2.misses += 1
+            cache_lookup_counter("l2", "miss").inc()
+            return None
+        self.stats_l2.hits += 1
+        cache_lookup_counter("l2", "hit").inc()
+        if self.local is not None:
+            self.local.set(cache_key, summary_data, len(payload))
+        return summary_data
+
+    async def set(
+        self, text: str, style: str, max_length: int, summary_data: dict
+    ) -> None:
         """Store summary in cache with TTL."""
-        try:
-            cache_key = self._generate_cache_key(
-                text=text, style=style, max_length=max_length
-            )
-            summary_text = json.dumps(summary_data)
+        await self._set(self.generate_cache_key(text, style, max_length), summary_data)
+
+    async def set_document_summary(
+        self, document_key: str, style: str, max_length: int, summary_data: dict
+    ) -> None:
+        """Store the summary of an uploaded document, as in set."""
+        await self._set(
+            self.generate_document_key(document_key, style, max_length), summary_data
+        )
+
+    async def _set(self, cache_key: str, summary_data: dict) -> None:
+        if self.redis_client is None:
+            return
+        with timed("cache_set"):
+            payload = encode_value(summary_data, self.compress_min_bytes)
+            if self.local is not None:
+                self.local.set(cache_key, summary_data, len(payload))
             settings = get_settings()
-            self.redis_client.set(
-                name=cache_key, value=summary_text, ex=settings.cache_ttl
+            await self._call(
+                self.redis_client.set,
+                name=cache_key,
+                value=payload,
+                ex=settings.cache_ttl,
             )
-        except redis.RedisError as e:
-            logger.error(f"Redis error: {e}")
+            await self._publish_invalidation(cache_key)
+
+    async def get_extraction(self, document_key: str) -> Optional[list[str]]:
+        """Get the sections extracted from an uploaded document, by its content key."""
+        if self.redis_client is None:
+            return None
+        cache_key = f"{self.namespace}:extract:{document_key}"
+        payload = await self._call(self.redis_client.get, cache_key)
+        if not payload:
+            return None
+        return self._decode(cache_key, payload)
+
+    async def set_extraction(self, document_key: str, sections: list[str]) -> None:
+        """Store the sections extracted from a document."""
+        if self.redis_client is None:
+            return
+        await self._call(
+            self.redis_client.set,
+            name=f"{self.namespace}:extract:{document_key}",
+            value=encode_value(sections, self.compress_min_bytes),
+            ex=get_settings().cache_ttl,
+        )
+
+    async def get_transcript(self, audio_key: str) -> Optional[str]:
+        """Get the transcript of an audio file, by its content key."""
+        if self.redis_client is None:
+            return None
+        cache_key = f"{self.namespace}:transcript:{audio_key}"
+        payload = await self._call(self.redis_client.get, cache_key)
+        if not payload:
+            return None
+        return self._decode(cache_key, payload)
+
+    async def set_transcript(self, audio_key: str, text: str) -> None:
+        """Store a transcript, compressed like other large values."""
+        if self.redis_client is None:
+            return
+        await self._call(
+            self.redis_client.set,
+            name=f"{self.namespace}:transcript:{audio_key}",
+            value=encode_value(text, self.compress_min_bytes),
+            ex=get_settings().cache_ttl,
+        )
+
+    async def get_speech_text(self, speech_id: str) -> Optional[str]:
+        """Get the text a speech id was registered for."""
+        if self.redis_client is None:
+            return None
+        cache_key = f"{self.namespace}:tts-text:{speech_id}"
+        payload = await self._call(self.redis_client.get, cache_key)
+        if not payload:
+            return None
+        return self._decode(cache_key, payload)
+
+    async def set_speech_text(self, speech_id: str, text: str) -> None:
+        if self.redis_client is None:
+            return
+        await self._call(
+            self.redis_client.set,
+            name=f"{self.namespace}:tts-text:{speech_id}",
+            value=encode_value(text, self.compress_min_bytes),
+            ex=get_settings().cache_ttl,
+        )
+
+    async def get_speech(self, speech_id: str) -> Optional[bytes]:
+        """Get synthesized speech audio, stored as is since mp3 doesn't compress."""
+        if self.redis_client is None:
+            return None
+        return await self._call(
+            self.redis_client.get, f"{self.namespace}:tts:{speech_id}"
+        )
+
+    async def set_speech(self, speech_id: str, audio: bytes) -> None:
+        if self.redis_client is None:
+            return
+        await self._call(
+            self.redis_client.set,
+            name=f"{self.namespace}:tts:{speech_id}",
+            value=audio,
+            ex=get_settings().cache_ttl,
+        )
+
+    async def try_lock(self, cache_key: str, token: str, ttl: float) -> bool:
+        """
+        Try to take the short-lived generation lock for a cache key.
+
+        Returns False only when another worker holds the lock. If Redis is
+        disabled or failing the caller proceeds as if it had the lock.
+        """
+        if self.redis_client is None:
+            return True
+        acquired = await self._call(
+            self.redis_client.set,
+            f"lock:{cache_key}",
+            token,
+            nx=True,
+            px=int(ttl * 1000),
+            default=True,
+        )
+        return bool(acquired)
+
+    async def is_locked(self, cache_key: str) -> bool:
+        if self.redis_client is None:
+            return False
+        return bool(await self._call(self.redis_client.exists, f"lock:{cache_key}"))
+
+    async def unlock(self, cache_key: str, token: str) -> None:
+        """Release the generation lock, but only if we still own it."""
+        if self.redis_client is None:
+            return
+        await self._call(
+            self.redis_client.eval, UNLOCK_SCRIPT, 1, f"lock:{cache_key}", token
+        )
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters per tier, for sizing the local cache."""
+        stats = {"l2": asdict(self.stats_l2)}
+        if self.local is not None:
+            stats["l1"] = {
+                **asdict(self.local.stats),
+                "entries": len(self.local),
+                "bytes": self.local.bytes,
+            }
+        return stats
+
+    async def _publish_invalidation(self, cache_key: str) -> None:
+        if self.local is None or self.invalidation_channel is None:
+            return
+        await self._call(
+            self.redis_client.publish,
+            self.invalidation_channel,
+            f"{self.instance_id}:{cache_key}",
+        )
+
+    def start_invalidation_listener(self) -> None:
+        """Drop local entries that other workers overwrite, via Redis pub/sub."""
+        if (
+            self.local is None
+            or self.invalidation_channel is None
+            or self._listener is not None
+        ):
+            return
+        self._listener = asyncio.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self) -> None:
+        while True:
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.invalidation_channel)
+                    # Anything published while we were disconnected was missed.
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        sender, _, cache_key = message["data"].decode().partition(":")
+                        if sender != self.instance_id:
+                            self.local.invalidate(cache_key)
+            except (redis.RedisError, OSError) as e:
+                logger.error(f"Cache invalidation listener error: {e!r}")
+                await asyncio.sleep(get_settings().redis_breaker_reset)
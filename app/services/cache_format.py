@@ -0,0 +1,69 @@
+"""
+Binary format of cached values and hashing of cache keys.
+
+Every stored value starts with a format version byte and a flags byte,
+followed by the msgpack-encoded value, zlib-compressed when it is large.
+Values written in any other format (including the JSON strings stored by
+earlier versions) fail to decode and are treated as cache misses.
+"""
+
+import hashlib
+import hmac
+import zlib
+from typing import Any, Iterable
+
+import msgpack
+
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+
+# Text is fed to the hasher in slices of this many characters, so a large
+# document is never encoded or copied in one piece just to hash it
+HASH_SLICE_CHARS = 64 * 1024
+
+
+class CacheFormatError(ValueError):
+    """Raised for stored values that are not in the current cache format."""
+
+
+def encode_value(value: Any, compress_min_bytes: int) -> bytes:
+    """Encode a value for storage, compressing it if it is at least `compress_min_bytes`."""
+    payload = msgpack.packb(value, use_bin_type=True)
+    flags = 0
+    if len(payload) >= compress_min_bytes:
+        payload = zlib.compress(payload)
+        flags |= FLAG_ZLIB
+    return bytes((FORMAT_VERSION, flags)) + payload
+
+
+def decode_value(data: bytes) -> Any:
+    if len(data) < 2 or data[0] != FORMAT_VERSION:
+        raise CacheFormatError("Unknown cache value format.")
+    payload = data[2:]
+    try:
+        if data[1] & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        return msgpack.unpackb(payload, raw=False)
+    except (zlib.error, ValueError, msgpack.UnpackException) as e:
+        raise CacheFormatError(f"Corrupt cache value: {e!r}") from e
+
+
+def hash_parts(parts: Iterable[str | int], secret: bytes = b"") -> str:
+    """
+    Hash key parts with HMAC-SHA256, without joining them into one string.
+
+    Each part is prefixed with its type and length, so no choice of part
+    values can make two different part lists hash the same way. SHA-256 is
+    hardware-accelerated on current CPUs, which makes it faster here than
+    BLAKE2b.
+    """
+    hasher = hmac.new(secret, digestmod=hashlib.sha256)
+    for part in parts:
+        if isinstance(part, int):
+            encoded = str(part).encode()
+            hasher.update(b"i" + len(encoded).to_bytes(8, "big") + encoded)
+            continue
+        hasher.update(b"s" + len(part).to_bytes(8, "big"))
+        for start in range(0, len(part), HASH_SLICE_CHARS):
+            hasher.update(part[start : start + HASH_SLICE_CHARS].encode())
+    return hasher.hexdigest()
@@ -0,0 +1,68 @@
+import zlib
+
+# Rough characters-per-token ratio for English text, used for budgeting only.
+CHARS_PER_TOKEN = 4
+
+# Boundaries from coarsest to finest: pages, paragraphs, lines, sentences, words.
+SEPARATORS = ("\f", "\n\n", "\n", ". ", " ")
+
+# A chunk that is at least a quarter full is also closed after any unit whose
+# checksum is divisible by this, which makes boundaries depend on local content.
+BOUNDARY_MODULUS = 8
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_text(text: str, max_tokens: int) -> list[str]:
+    """
+    Split text into chunks of at most `max_tokens` (estimated) on natural boundaries.
+
+    Chunk boundaries are content-defined rather than purely greedy, so an edit
+    in one part of a document only moves the boundaries near it and unchanged
+    chunks keep their cache entries.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): The estimated token budget for a single chunk.
+    Returns:
+        list[str]: Non-empty chunks that concatenate back to the original text.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+
+    for unit in _split_units(text, max_chars, SEPARATORS):
+        if current and size + len(unit) > max_chars:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += len(unit)
+        if size >= max_chars // 4 and zlib.crc32(unit.encode()) % BOUNDARY_MODULUS == 0:
+            chunks.append("".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("".join(current))
+
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _split_units(text: str, max_chars: int, separators: tuple[str, ...]) -> list[str]:
+    """Break text on the coarsest separator present into units of at most max_chars."""
+    if len(text) <= max_chars:
+        return [text]
+
+    for index, separator in enumerate(separators):
+        if separator not in text:
+            continue
+        pieces = text.split(separator)
+        units: list[str] = []
+        for position, piece in enumerate(pieces):
+            if position < len(pieces) - 1:
+                piece += separator
+            units.extend(_split_units(piece, max_chars, separators[index + 1 :]))
+        return units
+
+    return [text[start : start + max_chars] for start in range(0, len(text), max_chars)]
@@ -0,0 +1,59 @@
+from typing import AsyncIterator
+
+from app.core.logging import logger
+from app.services.cache import CacheService
+from app.services.file_parser import PARSER_VERSION, FileParser
+from app.services.parse_pool import ParserPool
+from app.services.spool import UploadSpool
+
+
+class DocumentExtractor:
+    """
+    Extract uploaded documents section by section, with a content-addressed cache.
+
+    Sections are cached under a hash of the raw uploaded bytes, the file type
+    and the parser version, so a file that is uploaded again is not parsed
+    again, whatever it is called. The same bytes uploaded as another type are
+    extracted (or rejected) afresh.
+    """
+
+    def __init__(self, parser: ParserPool, cache: CacheService, batch_size: int):
+        self.parser = parser
+        self.cache = cache
+        self.batch_size = batch_size
+
+    @staticmethod
+    def document_key(spool: UploadSpool, filename: str) -> str:
+        """
+        The content key of an uploaded document.
+
+        Raises ValueError for unsupported file types, so they are rejected
+        before anything is looked up under the key.
+        """
+        extension = FileParser().file_type(filename).lstrip(".")
+        return f"v{PARSER_VERSION}:{extension}:{spool.sha256}"
+
+    async def iter_sections(
+        self, spool: UploadSpool, filename: str
+    ) -> AsyncIterator[str]:
+        """
+        Yield a document's sections from the cache, or from the parser pool.
+
+        Freshly extracted sections are cached once the whole document has
+        been extracted without errors.
+        """
+        document_key = self.document_key(spool, filename)
+        cached_sections = await self.cache.get_extraction(document_key)
+        if cached_sections is not None:
+            logger.info("Extraction cache hit.")
+            for section in cached_sections:
+                yield section
+            return
+
+        sections: list[str] = []
+        async for section in self.parser.iter_parse(
+            spool.source, filename, self.batch_size
+        ):
+            sections.append(section)
+            yield section
+        await self.cache.set_extraction(document_key, sections)
@@ -1,50 +1,103 @@
 from io import BytesIO
+from itertools import islice
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterator
 
 import fitz  # PyMuPDF
 from docx import Document
 
+# Bump whenever extracted text changes for the same file, so documents
+# extracted by an older parser are not served from the extraction cache
+PARSER_VERSION = 1
+
+# DOCX files have no pages, so paragraphs are grouped into sections of about
+# a page of text
+DOCX_SECTION_CHARS = 3000
+
+# Formats whose sections can be read from any point without parsing the ones
+# before it; other files are extracted in one go
+RESUMABLE_EXTENSIONS = {".pdf"}
+
 
 class FileParser:
     """Extract text from uploaded files."""
 
     def __init__(self):
-        self.extensions: dict[str, Callable[[bytes], str]] = {
-            ".pdf": self._parse_pdf,
-            ".docx": self._parse_docx,
-            ".txt": self._parse_txt,
+        self.extensions: dict[str, Callable[[bytes | Path, int], Iterator[str]]] = {
+            ".pdf": self._iter_pdf,
+            ".docx": self._iter_docx,
+            ".txt": self._iter_txt,
         }
 
-    def parse_file(self, file_content: bytes, filename: str) -> str:
-        """Detect file type and extract text."""
-        file_path: Path = Path(filename)
-        extension: str = file_path.suffix.lower()
+    def parse_file(self, file_content: bytes | Path, filename: str) -> str:
+        """
+        Detect file type and extract text.
 
-        if not file_content:
-            raise ValueError(f"{filename} is empty - nothing to summarize.")
+        `file_content` is either the raw bytes or the path of a spooled upload,
+        which lets large files be opened in place rather than copied.
+        """
+        return "\n".join(self.iter_file(file_content, filename))
+
+    def iter_file(
+        self, file_content: bytes | Path, filename: str, start: int = 0
+    ) -> Iterator[str]:
+        """
+        Detect file type and yield its text section by section as it is extracted.
 
-        if extension in self.extensions:
-            return self.extensions[extension](file_content)
+        A section is a page of a PDF, about a page's worth of paragraphs of a
+        DOCX, or a whole text file. Sections before `start` are skipped, so
+        extraction can resume where an earlier call stopped. Joining all
+        sections with newlines gives the same text as parse_file. Resuming is
+        only cheap for RESUMABLE_EXTENSIONS: a DOCX is parsed in full again.
+        """
+        if isinstance(file_content, Path):
+            is_empty = file_content.stat().st_size == 0
         else:
+            is_empty = not file_content
+        if is_empty:
+            raise ValueError(f"{filename} is empty - nothing to summarize.")
+
+        return self.extensions[self.file_type(filename)](file_content, start)
+
+    def file_type(self, filename: str) -> str:
+        """Return the file's lower-cased extension, or raise ValueError if it is unsupported."""
+        extension: str = Path(filename).suffix.lower()
+        if extension not in self.extensions:
             supported: str = ", ".join(self.extensions.keys())
             raise ValueError(
                 f"Unsupported file type: '{extension}'. Supported types: {supported}"
             )
+        return extension
 
-    def _parse_pdf(self, content: bytes) -> str:
-        text: list[str] = []
-        with fitz.open(stream=content, filetype="pdf") as doc:
-            for page in doc:
-                text.append(page.get_text())
-        return "\n".join(text)
+    def _iter_pdf(self, content: bytes | Path, start: int) -> Iterator[str]:
+        if isinstance(content, Path):
+            doc = fitz.open(content, filetype="pdf")
+        else:
+            doc = fitz.open(stream=content, filetype="pdf")
+        with doc:
+            for number in range(start, doc.page_count):
+                yield doc.load_page(number).get_text()
+
+    def _iter_docx(self, content: bytes | Path, start: int) -> Iterator[str]:
+        source = str(content) if isinstance(content, Path) else BytesIO(content)
+        doc: Document = Document(source)
+        yield from islice(self._group_paragraphs(doc), start, None)
 
-    def _parse_docx(self, content: bytes) -> str:
+    def _group_paragraphs(self, doc: Document) -> Iterator[str]:
         text: list[str] = []
-        doc: Document = Document(BytesIO(content))
+        size = 0
         for paragraph in doc.paragraphs:
             text.append(paragraph.text)
-        return "\n".join(text)
+            size += len(paragraph.text) + 1
+            if size >= DOCX_SECTION_CHARS:
+                yield "\n".join(text)
+                text, size = [], 0
+        if text:
+            yield "\n".join(text)
 
-    def _parse_txt(self, content: bytes) -> str:
-        return content.decode("utf-8", errors="replace")
+    def _iter_txt(self, content: bytes | Path, start: int) -> Iterator[str]:
+        if start > 0:
+            return
+        if isinstance(content, Path):
+            content = content.read_bytes()
+        yield content.decode("utf-8", errors="replace")
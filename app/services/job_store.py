@@ -0,0 +1,228 @@
+import asyncio
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.models.jobs import Job
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobStore(ABC):
+    """
+    Durable job records, shared by every worker process.
+
+    A worker runs a job only while it holds the job's lease, which it takes
+    with `claim` and extends with `renew`. A lease that is not renewed
+    expires, so jobs of a worker that died are claimed again by another (or
+    by the same one after a restart).
+    """
+
+    @abstractmethod
+    async def create(self, job: Job) -> bool:
+        """Store a new job. Returns False, storing nothing, if the id exists."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    async def save(self, job: Job) -> None:
+        """Store a job's new state."""
+
+    @abstractmethod
+    async def claim(self, job_id: str, lease: float) -> Optional[Job]:
+        """
+        Take the lease on a queued job, or on a running one whose lease expired.
+
+        Returns the job marked as running with one more attempt, or None if
+        it is finished, missing or leased by another worker.
+        """
+
+    @abstractmethod
+    async def renew(self, job_id: str, lease: float) -> None:
+        pass
+
+    @abstractmethod
+    async def release(self, job_id: str) -> None:
+        """Give up the lease, so the job can be claimed straight away."""
+
+    @abstractmethod
+    async def active_ids(self) -> list[str]:
+        """Ids of queued and running jobs, which may need claiming."""
+
+    async def aclose(self) -> None:
+        """Release connections. No-op by default."""
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Jobs in a local SQLite file, for running without Redis.
+
+    Workers on one host may share the file; SQLite serializes their writes.
+    Queries run in a thread so they don't block the event loop.
+    """
+
+    def __init__(self, path: str | Path, ttl: float):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=10
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "lease_until REAL NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self.connection.execute(
+            "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated_at < ?",
+            (*ACTIVE_STATUSES, time.time() - ttl),
+        )
+        # One connection, one statement at a time
+        self._lock = asyncio.Lock()
+
+    def _run(self, sql: str, params: tuple) -> tuple[int, list[tuple]]:
+        cursor = self.connection.execute(sql, params)
+        return cursor.rowcount, cursor.fetchall()
+
+    async def _execute(self, sql: str, *params) -> tuple[int, list[tuple]]:
+        """Run a statement, returning the number of rows changed and the rows selected."""
+        async with self._lock:
+            return await asyncio.to_thread(self._run, sql, params)
+
+    async def create(self, job: Job) -> bool:
+        changed, _ = await self._execute(
+            "INSERT OR IGNORE INTO jobs (id, status, updated_at, data) "
+            "VALUES (?, ?, ?, ?)",
+            job.id,
+            job.status,
+            time.time(),
+            job.model_dump_json(),
+        )
+        return changed == 1
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        _, rows = await self._execute("SELECT data FROM jobs WHERE id = ?", job_id)
+        return Job.model_validate_json(rows[0][0]) if rows else None
+
+    async def save(self, job: Job) -> None:
+        await self._execute(
+            "UPDATE jobs SET status = ?, updated_at = ?, data = ? WHERE id = ?",
+            job.status,
+            time.time(),
+            job.model_dump_json(),
+            job.id,
+        )
+
+    async def claim(self, job_id: str, lease: float) -> Optional[Job]:
+        now = time.time()
+        changed, _ = await self._execute(
+            "UPDATE jobs SET lease_until = ? "
+            "WHERE id = ? AND status IN (?, ?) AND lease_until < ?",
+            now + lease,
+            job_id,
+            *ACTIVE_STATUSES,
+            now,
+        )
+        if changed != 1:
+            return None
+        job = await self.get(job_id)
+        job.status = "running"
+        job.attempts += 1
+        await self.save(job)
+        return job
+
+    async def renew(self, job_id: str, lease: float) -> None:
+        await self._execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ?", time.time() + lease, job_id
+        )
+
+    async def release(self, job_id: str) -> None:
+        await self._execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", job_id)
+
+    async def active_ids(self) -> list[str]:
+        _, rows = await self._execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY updated_at",
+            *ACTIVE_STATUSES,
+        )
+        return [row[0] for row in rows]
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            self.connection.close()
+
+
+class RedisJobStore(JobStore):
+    """
+    Jobs in Redis, shared by workers on any number of hosts.
+
+    Each job is a JSON record kept for `ttl` seconds after its last update.
+    Unfinished jobs are also listed in a set, and a lease is a key that
+    expires unless renewed.
+    """
+
+    def __init__(self, redis_client: redis.Redis, namespace: str, ttl: int):
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self.ttl = ttl
+        self.active_key = f"{namespace}:jobs:active"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.namespace}:job:{job_id}"
+
+    def _lease_key(self, job_id: str) -> str:
+        return f"{self.namespace}:job-lease:{job_id}"
+
+    async def create(self, job: Job) -> bool:
+        created = await self.redis_client.set(
+            self._job_key(job.id), job.model_dump_json(), ex=self.ttl, nx=True
+        )
+        if created:
+            await self.redis_client.sadd(self.active_key, job.id)
+        return bool(created)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        data = await self.redis_client.get(self._job_key(job_id))
+        return Job.model_validate_json(data) if data else None
+
+    async def save(self, job: Job) -> None:
+        await self.redis_client.set(
+            self._job_key(job.id), job.model_dump_json(), ex=self.ttl
+        )
+        if job.finished:
+            await self.redis_client.srem(self.active_key, job.id)
+        else:
+            await self.redis_client.sadd(self.active_key, job.id)
+
+    async def claim(self, job_id: str, lease: float) -> Optional[Job]:
+        leased = await self.redis_client.set(
+            self._lease_key(job_id), b"1", px=int(lease * 1000), nx=True
+        )
+        if not leased:
+            return None
+        job = await self.get(job_id)
+        if job is None or job.finished:
+            await self.redis_client.delete(self._lease_key(job_id))
+            await self.redis_client.srem(self.active_key, job_id)
+            return None
+        job.status = "running"
+        job.attempts += 1
+        await self.save(job)
+        return job
+
+    async def renew(self, job_id: str, lease: float) -> None:
+        await self.redis_client.pexpire(self._lease_key(job_id), int(lease * 1000))
+
+    async def release(self, job_id: str) -> None:
+        await self.redis_client.delete(self._lease_key(job_id))
+
+    async def active_ids(self) -> list[str]:
+        members = await self.redis_client.smembers(self.active_key)
+        return [m.decode() if isinstance(m, bytes) else m for m in members]
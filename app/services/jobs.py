@@ -0,0 +1,382 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import weakref
+from contextlib import suppress
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from app.core.admission import AdmissionRejectedError
+from app.core.logging import logger
+from app.core.sse import describe_error
+from app.models.jobs import Job, JobKind, JobStage
+from app.models.requests import Style, SummarizeRequest
+from app.models.responses import SummaryResponse
+from app.services.audio import AudioService
+from app.services.cache_format import hash_parts
+from app.services.documents import DocumentExtractor
+from app.services.job_store import JobStore
+from app.services.parse_pool import ParserOverloadedError
+from app.services.speech import SpeechService, speech_url
+from app.services.spool import UploadSpool
+from app.services.summarizer import SourceDocument, SummarizerService
+
+# Failures that say nothing about the job itself, so it is tried again later
+TRANSIENT_ERRORS = (ParserOverloadedError, AdmissionRejectedError)
+
+
+class JobProgress:
+    """
+    Report a running job's stage and parsing progress.
+
+    Stage changes are saved at once; section counts at most every
+    `interval` seconds, so a long document isn't saved once per page.
+    """
+
+    def __init__(
+        self, job: Job, save: Callable[[Job], Awaitable[None]], interval: float
+    ):
+        self.job = job
+        self.save = save
+        self.interval = interval
+        self._saved_at = 0.0
+
+    async def stage(self, stage: JobStage) -> None:
+        self.job.stage = stage
+        await self._save()
+
+    async def section_parsed(self) -> None:
+        self.job.sections_parsed += 1
+        if time.monotonic() - self._saved_at >= self.interval:
+            await self._save()
+
+    async def _save(self) -> None:
+        self._saved_at = time.monotonic()
+        await self.save(self.job)
+
+
+Pipeline = Callable[[Job, UploadSpool, JobProgress], Awaitable[SummaryResponse]]
+
+
+class JobPipelines:
+    """What a job of each kind does with its input file."""
+
+    def __init__(
+        self,
+        summarizer: SummarizerService,
+        extractor: DocumentExtractor,
+        audio_service: AudioService,
+        speech: SpeechService,
+    ):
+        self.summarizer = summarizer
+        self.extractor = extractor
+        self.audio_service = audio_service
+        self.speech = speech
+
+    def by_kind(self) -> dict[str, Pipeline]:
+        return {"upload": self.upload, "transcribe": self.transcribe}
+
+    async def upload(
+        self, job: Job, spool: UploadSpool, progress: JobProgress
+    ) -> SummaryResponse:
+        """Summarize a document, as POST /upload/ does."""
+
+        async def sections() -> AsyncIterator[str]:
+            await progress.stage("parsing")
+            async for section in self.extractor.iter_sections(spool, job.filename):
+                await progress.section_parsed()
+                yield section
+            await progress.stage("summarizing")
+
+        summary_response = await self.summarizer.summarize_document(
+            SourceDocument(key=self.extractor.document_key(spool, job.filename)),
+            sections(),
+            job.style,
+            job.max_length,
+        )
+        return await self._speak(job, summary_response, progress)
+
+    async def transcribe(
+        self, job: Job, spool: UploadSpool, progress: JobProgress
+    ) -> SummaryResponse:
+        """Transcribe and summarize audio, as POST /transcribe/ does."""
+        await progress.stage("transcribing")
+        with spool.open() as audio_file:
+            text = await self.audio_service.transcribe(
+                audio_data=audio_file, filename=job.filename, sha256=spool.sha256
+            )
+        await progress.stage("summarizing")
+        summary_response = await self.summarizer.summarize(
+            SummarizeRequest(text=text, max_length=job.max_length, style=job.style)
+        )
+        return await self._speak(job, summary_response, progress)
+
+    async def _speak(
+        self, job: Job, summary_response: SummaryResponse, progress: JobProgress
+    ) -> SummaryResponse:
+        if job.tts:
+            # Synthesized now rather than on first fetch, so it plays at once
+            await progress.stage("speaking")
+            speech_id = await self.speech.synthesize(summary_response.summary)
+            summary_response.audio_url = speech_url(speech_id)
+        return summary_response
+
+
+def make_job_id(
+    kind: JobKind,
+    input_sha256: str,
+    extension: str,
+    style: Style,
+    max_length: int,
+    tts: bool,
+) -> str:
+    """
+    Jobs are identified by what they compute, so resubmitting one finds it.
+
+    The file's type is part of that: the same bytes are read differently as
+    another type.
+    """
+    return hash_parts((kind, input_sha256, extension, style, max_length, int(tts)))
+
+
+class JobRunner:
+    """
+    Run upload and transcription jobs off the request path.
+
+    Submitted jobs are stored in `store` with their input file saved under
+    `input_dir`, and run by `workers` tasks in this process. Running jobs
+    hold a lease in the store that is renewed while they run. Every
+    `lease` seconds the runner looks for unfinished jobs nobody holds,
+    so jobs interrupted by a restart, or left behind by a worker process
+    that died, are picked up again. A job that keeps being interrupted fails
+    after `max_attempts`. The runner starts when it is first used, or when
+    `start` is called.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        pipelines: dict[str, Pipeline],
+        input_dir: str | Path,
+        workers: int,
+        lease: float,
+        max_attempts: int,
+        poll_interval: float,
+    ):
+        self.store = store
+        self.pipelines = pipelines
+        self.input_dir = Path(input_dir)
+        self.workers = workers
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        self._pending: set[str] = set()  # queued or running in this process
+        self._tasks: list[asyncio.Task] = []
+        # Woken when a job changes in this process; watchers of jobs that
+        # run elsewhere fall back to polling
+        self._changed: weakref.WeakValueDictionary[str, asyncio.Event] = (
+            weakref.WeakValueDictionary()
+        )
+
+    def start(self) -> None:
+        """Start the workers and the search for abandoned jobs, if not yet running."""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover()))
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.store.aclose()
+
+    async def submit(
+        self,
+        kind: JobKind,
+        spool: UploadSpool,
+        filename: str,
+        style: Style,
+        max_length: int,
+        tts: bool,
+    ) -> Job:
+        """
+        Queue a job for an uploaded file, or return the job already computing it.
+
+        A job that failed is run again when it is resubmitted.
+        """
+        job = Job(
+            id=make_job_id(
+                kind,
+                spool.sha256,
+                Path(filename).suffix.lower(),
+                style,
+                max_length,
+                tts,
+            ),
+            kind=kind,
+            input_sha256=spool.sha256,
+            filename=filename,
+            style=style,
+            max_length=max_length,
+            tts=tts,
+        )
+        existing = await self.store.get(job.id)
+        if existing is not None and existing.status != "failed":
+            return existing
+
+        # Saved before the job is stored, so whoever claims it finds its input
+        await asyncio.to_thread(self._save_input, job.id, spool.source)
+        if existing is not None:
+            await self._save(job)
+        elif not await self.store.create(job):
+            # Submitted by someone else in the meantime
+            existing = await self.store.get(job.id)
+            if existing is not None and existing.finished:
+                self._input_path(job.id).unlink(missing_ok=True)
+            return existing or job
+
+        self.start()
+        self._enqueue(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        self.start()
+        return await self.store.get(job_id)
+
+    async def watch(self, job_id: str) -> AsyncIterator[Job]:
+        """Yield a job whenever it changes, until it finishes."""
+        self.start()
+        updated_at: Optional[datetime] = None
+        while True:
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            job = await self.store.get(job_id)
+            if job is None:
+                return
+            if job.updated_at != updated_at:
+                updated_at = job.updated_at
+                yield job
+            if job.finished:
+                return
+            with suppress(TimeoutError):
+                await asyncio.wait_for(changed.wait(), self.poll_interval)
+
+    def _input_path(self, job_id: str) -> Path:
+        return self.input_dir / job_id
+
+    def _save_input(self, job_id: str, source: bytes | Path) -> None:
+        path = self._input_path(job_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # A temp file of its own, since the same job may be submitted twice at once
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix=f"{job_id}.", suffix=".part", delete=False
+        ) as partial:
+            try:
+                if isinstance(source, Path):
+                    with source.open("rb") as original:
+                        shutil.copyfileobj(original, partial)
+                else:
+                    partial.write(source)
+            except BaseException:
+                partial.close()
+                os.unlink(partial.name)
+                raise
+        os.replace(partial.name, path)
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._pending:
+            self._pending.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _save(self, job: Job) -> None:
+        job.updated_at = datetime.now(timezone.utc)
+        await self.store.save(job)
+        changed = self._changed.pop(job.id, None)
+        if changed is not None:
+            changed.set()
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.store.claim(job_id, self.lease)
+                if job is not None:
+                    await self._run(job)
+            except Exception as e:
+                logger.error(f"Job {job_id} could not be run: {e!r}")
+            finally:
+                self._pending.discard(job_id)
+
+    async def _recover(self) -> None:
+        while True:
+            try:
+                for job_id in await self.store.active_ids():
+                    self._enqueue(job_id)
+            except Exception as e:
+                logger.error(f"Looking for unfinished jobs failed: {e!r}")
+            await asyncio.sleep(self.lease)
+
+    async def _renew(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.store.renew(job_id, self.lease)
+            except Exception as e:
+                logger.warning(f"Renewing the lease on job {job_id} failed: {e!r}")
+
+    async def _run(self, job: Job) -> None:
+        if job.attempts > self.max_attempts:
+            job.status = "failed"
+            job.error = "The job was interrupted too many times."
+            await self._finish(job)
+            return
+
+        logger.info(f"Running {job.kind} job {job.id} (attempt {job.attempts}).")
+        await self._save(job)
+        renewing = asyncio.create_task(self._renew(job.id))
+        progress = JobProgress(job, self._save, self.poll_interval)
+        try:
+            spool = UploadSpool.from_file(self._input_path(job.id), job.input_sha256)
+            with spool:
+                job.result = await self.pipelines[job.kind](job, spool, progress)
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so it resumes straight after a
+            # restart, without counting this attempt against it
+            job.status = "queued"
+            job.stage = None
+            job.attempts -= 1
+            await self._save(job)
+            await self.store.release(job.id)
+            raise
+        except TRANSIENT_ERRORS as e:
+            if job.attempts < self.max_attempts:
+                logger.warning(f"Job {job.id} will be retried: {e!r}")
+                job.status = "queued"
+                job.stage = None
+                await self._save(job)
+                await self.store.release(job.id)
+                return
+            job.status = "failed"
+            job.error = describe_error(e)
+        except FileNotFoundError:
+            job.status = "failed"
+            job.error = "The job's input file is missing."
+        except Exception as e:
+            job.status = "failed"
+            job.error = describe_error(e)
+        finally:
+            renewing.cancel()
+        await self._finish(job)
+
+    async def _finish(self, job: Job) -> None:
+        job.stage = None
+        self._input_path(job.id).unlink(missing_ok=True)
+        await self._save(job)
+        await self.store.release(job.id)
+        logger.info(f"Job {job.id} {job.status}.")
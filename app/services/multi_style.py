@@ -0,0 +1,120 @@
+import json
+from typing import Any, Iterator
+
+import jiter
+
+from app.models.stream import StreamDelta
+
+# Leading symbols stripped from bullets when a bullet summary is split into items
+BULLET_SYMBOLS = "-*•–· \t"
+
+
+class MultiStyleFormatError(ValueError):
+    """Raised when a multi-style reply is not the JSON object the prompt asks for."""
+
+
+def bullet_items(summary: str) -> list[str]:
+    """Split a bullet summary into bullets, without their bullet symbols."""
+    return [
+        line.lstrip(BULLET_SYMBOLS) for line in summary.splitlines() if line.strip()
+    ]
+
+
+def bullet_text(items: list[str]) -> str:
+    """Join bullets into a summary in the format of a single-style bullet summary."""
+    return "\n".join(f"- {item}" for item in items)
+
+
+def style_deltas(style: str, summary: str) -> Iterator[StreamDelta]:
+    """Stream deltas that spell out a finished summary, e.g. a cached one."""
+    if style == "bullet":
+        for index, item in enumerate(bullet_items(summary)):
+            yield StreamDelta(path=f"bullet[{index}]", value=item)
+    else:
+        yield StreamDelta(path=style, value=summary)
+
+
+def _style_values(style: str, value: Any) -> list[tuple[str, str]]:
+    """(path, text) pairs for one style's value in a (possibly partial) reply."""
+    if style == "bullet":
+        items = [value] if isinstance(value, str) else value
+        if not isinstance(items, list):
+            return []
+        return [
+            (f"bullet[{index}]", item)
+            for index, item in enumerate(items)
+            if isinstance(item, str)
+        ]
+    return [(style, value)] if isinstance(value, str) else []
+
+
+def _reply_start(reply: str) -> int:
+    # Models sometimes wrap JSON in a code fence despite being asked not to
+    return max(reply.find("{"), 0)
+
+
+def parse_styles(reply: str, styles: list[str]) -> dict[str, str]:
+    """
+    Parse a complete multi-style reply into one summary per style.
+
+    Bullets are joined back into the dash-prefixed text a bullet-style
+    request produces, so either can be served from the same cache slot.
+    """
+    try:
+        data, _ = json.JSONDecoder().raw_decode(reply, _reply_start(reply))
+    except ValueError as e:
+        raise MultiStyleFormatError(f"Reply is not a JSON object: {e}") from e
+    if not isinstance(data, dict):
+        raise MultiStyleFormatError("Reply is not a JSON object.")
+
+    summaries = {}
+    for style in styles:
+        values = [text for _, text in _style_values(style, data.get(style))]
+        if not values:
+            raise MultiStyleFormatError(f"Reply has no '{style}' summary.")
+        summaries[style] = bullet_text(values) if style == "bullet" else values[0]
+    return summaries
+
+
+class MultiStyleStreamParser:
+    """
+    Turn a streamed multi-style reply into StreamDelta events as it arrives.
+
+    The reply so far is re-parsed as partial JSON after every chunk, and the
+    text added to each style since the last chunk is emitted under its path
+    ("paragraph", "bullet[0]", "tldr", ...). Replies are a few KB, so
+    re-parsing is cheaper than tracking JSON parser state across chunks.
+    """
+
+    def __init__(self, styles: list[str]):
+        self.styles = styles
+        self.reply = ""
+        self._sent: dict[str, str] = {}
+
+    def feed(self, text: str) -> list[StreamDelta]:
+        self.reply += text
+        start = self.reply.find("{")
+        if start < 0:
+            return []
+        try:
+            partial = jiter.from_json(
+                self.reply[start:].encode(), partial_mode="trailing-strings"
+            )
+        except ValueError:
+            # Trailing text after the object, or not JSON at all; finish() decides
+            return []
+        if not isinstance(partial, dict):
+            return []
+
+        deltas = []
+        for style in self.styles:
+            for path, value in _style_values(style, partial.get(style)):
+                sent = self._sent.get(path, "")
+                if len(value) > len(sent) and value.startswith(sent):
+                    deltas.append(StreamDelta(path=path, value=value[len(sent) :]))
+                    self._sent[path] = value
+        return deltas
+
+    def finish(self) -> dict[str, str]:
+        """Parse the complete reply, as parse_styles does."""
+        return parse_styles(self.reply, self.styles)
@@ -0,0 +1,180 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+from app.core.logging import logger
+from app.core.metrics import timed
+from app.services.file_parser import RESUMABLE_EXTENSIONS, FileParser
+
+
+class ParserOverloadedError(Exception):
+    """Raised when too many parse jobs are already running or queued."""
+
+
+def _parse_in_worker(file_content: bytes | Path, filename: str) -> str:
+    return FileParser().parse_file(file_content, filename)
+
+
+def _parse_sections_in_worker(
+    file_content: bytes | Path, filename: str, start: int, count: Optional[int]
+) -> list[str]:
+    return list(islice(FileParser().iter_file(file_content, filename, start), count))
+
+
+class ParserPool:
+    """
+    Run FileParser off the event loop.
+
+    PDF and DOCX extraction is CPU-bound and holds the GIL, so jobs go to a
+    process pool, falling back to a thread pool where processes are not
+    available. Jobs beyond `workers + max_queued` are rejected with
+    ParserOverloadedError, and callers stop waiting after `timeout` seconds.
+    A timed-out job still occupies its slot until the worker finishes it.
+    With `workers=0` files are parsed inline on the event loop.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_queued: int,
+        timeout: float,
+        use_processes: bool = True,
+    ):
+        self.workers = workers
+        self.max_pending = workers + max_queued
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self.pending = 0
+        self._pending_lock = threading.Lock()
+        self.executor: Executor | None = None
+        if workers > 0:
+            self.executor = self._create_executor()
+
+    def _create_executor(self) -> Executor:
+        if self.use_processes:
+            try:
+                return ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Process pool unavailable ({e!r}) - using threads.")
+                self.use_processes = False
+        return ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="file-parser"
+        )
+
+    async def warm_up(self) -> None:
+        """Start the workers now rather than on the first upload."""
+        if self.executor is not None:
+            await self.parse(b"warm-up", "warm-up.txt")
+
+    async def aclose(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def parse(self, file_content: bytes | Path, filename: str) -> str:
+        """
+        Extract text from a file without blocking the event loop.
+
+        Pass a Path for large files so workers open it rather than receive a
+        pickled copy of its contents.
+        """
+        return await self._run(_parse_in_worker, file_content, filename)
+
+    async def iter_parse(
+        self, file_content: bytes | Path, filename: str, batch_size: int
+    ) -> AsyncIterator[str]:
+        """
+        Yield a file's sections (see FileParser.iter_file) as they are extracted.
+
+        Each job extracts the next `batch_size` sections of a PDF, and the
+        following job is already running while the caller consumes a batch.
+        Every batch is a separate job, subject to the overload check and the
+        timeout. Formats that can't resume at a section (see
+        RESUMABLE_EXTENSIONS) are extracted by a single job, since every batch
+        would parse the whole file again.
+        """
+        count = batch_size
+        if Path(filename).suffix.lower() not in RESUMABLE_EXTENSIONS:
+            count = None
+        start = 0
+        job = asyncio.ensure_future(
+            self._run(_parse_sections_in_worker, file_content, filename, start, count)
+        )
+        try:
+            while job is not None:
+                sections = await job
+                start += len(sections)
+                job = None
+                if count is not None and len(sections) == count:
+                    job = asyncio.ensure_future(
+                        self._run(
+                            _parse_sections_in_worker,
+                            file_content,
+                            filename,
+                            start,
+                            count,
+                        )
+                    )
+                for section in sections:
+                    yield section
+        finally:
+            if job is not None:
+                job.cancel()
+
+    async def _run(
+        self, fn: Callable, file_content: bytes | Path, filename: str, *args
+    ):
+        """Run a parse function in the pool, or inline without workers."""
+        with timed("parse"):
+            return await self._execute(fn, file_content, filename, *args)
+
+    async def _execute(
+        self, fn: Callable, file_content: bytes | Path, filename: str, *args
+    ):
+        if self.executor is None:
+            return fn(file_content, filename, *args)
+        if self.pending >= self.max_pending:
+            raise ParserOverloadedError("Too many files are being parsed.")
+
+        executor = self.executor
+        try:
+            job = self._submit(executor, fn, file_content, filename, *args)
+        except BrokenProcessPool:
+            executor = self._replace_executor(executor)
+            job = self._submit(executor, fn, file_content, filename, *args)
+
+        try:
+            return await asyncio.wait_for(job, timeout=self.timeout)
+        except BrokenProcessPool:
+            # Most likely this document crashed the extractor, so don't retry it.
+            logger.error(
+                f"A parser worker crashed on {filename} - restarting the pool."
+            )
+            self._replace_executor(executor)
+            raise ValueError(f"{filename} could not be parsed.")
+
+    def _replace_executor(self, broken: Executor) -> Executor:
+        """Swap in a fresh executor unless a concurrent job already did."""
+        if self.executor is broken:
+            self.executor = self._create_executor()
+        return self.executor
+
+    def _submit(self, executor: Executor, fn: Callable, *args) -> asyncio.Future:
+        future = executor.submit(fn, *args)
+        with self._pending_lock:
+            self.pending += 1
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    def _release(self, _) -> None:
+        # Runs on the executor's thread once the job has really finished.
+        with self._pending_lock:
+            self.pending -= 1
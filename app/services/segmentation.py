@@ -0,0 +1,197 @@
+"""
+Splitting long audio for transcription, and joining the transcripts back up.
+
+Whisper takes at most 25 MB per call and works through a file serially, so
+long recordings are cut into segments, in pauses where possible, that are
+transcribed concurrently. Each segment starts a little before the cut, so a
+word the cut clips is still heard whole once; the words transcribed twice
+are dropped again when the transcripts are stitched together.
+
+WAV (PCM) is read with the standard library. Other formats are decoded to
+WAV first with ffmpeg, if it is installed.
+"""
+
+import asyncio
+import re
+import shutil
+import sys
+import wave
+from array import array
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+WAV_HEADER_BYTES = 44
+
+# Pauses are looked for in windows of this length; shorter gaps between
+# words don't count as one
+PAUSE_WINDOW_SECONDS = 0.25
+# Loudness is estimated from every this many samples
+LOUDNESS_STEP = 8
+SAMPLE_TYPECODES = {1: "B", 2: "h", 4: "i"}
+
+# Stitching: how many words at a segment's end are compared with the start of
+# the next, and how many words at its start may be a garbled clipped word
+MAX_OVERLAP_WORDS = 30
+MIN_OVERLAP_WORDS = 2
+MAX_LEADING_WORDS = 2
+
+DECODE_SAMPLE_RATE = 16000
+
+
+@dataclass(frozen=True)
+class Segment:
+    start: int  # first frame
+    end: int  # frame after the last
+
+
+def is_wav(audio_file: BinaryIO) -> bool:
+    """Whether the file starts with a WAV header. Leaves the position unchanged."""
+    position = audio_file.tell()
+    header = audio_file.read(12)
+    audio_file.seek(position)
+    return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+
+def loudness(frames: bytes, sample_width: int) -> Optional[float]:
+    """Mean absolute sample value, or None for sample widths we don't read."""
+    typecode = SAMPLE_TYPECODES.get(sample_width)
+    if typecode is None or not frames:
+        return None
+    samples = array(typecode, frames)
+    if sys.byteorder == "big":
+        samples.byteswap()  # WAV samples are little-endian
+    picked = samples[::LOUDNESS_STEP]
+    if sample_width == 1:  # 8-bit samples are unsigned
+        return sum(abs(sample - 128) for sample in picked) / len(picked)
+    return sum(map(abs, picked)) / len(picked)
+
+
+def find_pause(wav: wave.Wave_read, lo: int, hi: int) -> int:
+    """
+    The frame in the middle of the quietest stretch between `lo` and `hi`.
+
+    Ties go to the latest stretch, which keeps segments long. Falls back to
+    `hi` when the samples can't be read.
+    """
+    window = max(1, int(wav.getframerate() * PAUSE_WINDOW_SECONDS))
+    if hi - lo < window:
+        return hi
+    frame_size = wav.getsampwidth() * wav.getnchannels()
+    wav.setpos(lo)
+    frames = wav.readframes(hi - lo)
+    best, best_loudness = hi, None
+    for offset in range(0, hi - lo - window + 1, window // 2 or 1):
+        level = loudness(
+            frames[offset * frame_size : (offset + window) * frame_size],
+            wav.getsampwidth(),
+        )
+        if level is None:
+            return hi
+        if best_loudness is None or level <= best_loudness:
+            best, best_loudness = lo + offset + window // 2, level
+    return best
+
+
+def plan_segments(
+    wav: wave.Wave_read, max_frames: int, overlap_frames: int, search_frames: int
+) -> list[Segment]:
+    """
+    Cut the audio into segments of at most `max_frames`.
+
+    Each cut is made in the quietest part of the `search_frames` before the
+    furthest point the segment may reach, and the next segment starts
+    `overlap_frames` before it.
+    """
+    total = wav.getnframes()
+    overlap_frames = min(overlap_frames, max_frames // 4)
+    search_frames = min(search_frames, max_frames // 2)
+    segments = []
+    cut = 0
+    while True:
+        start = max(0, cut - overlap_frames)
+        if total - start <= max_frames:
+            segments.append(Segment(start, total))
+            return segments
+        furthest = start + max_frames
+        cut = find_pause(wav, max(cut + 1, furthest - search_frames), furthest)
+        segments.append(Segment(start, cut))
+
+
+def read_segment(wav: wave.Wave_read, segment: Segment) -> bytes:
+    """A segment as a WAV file of its own."""
+    wav.setpos(segment.start)
+    frames = wav.readframes(segment.end - segment.start)
+    out = BytesIO()
+    with wave.open(out, "wb") as segment_wav:
+        segment_wav.setnchannels(wav.getnchannels())
+        segment_wav.setsampwidth(wav.getsampwidth())
+        segment_wav.setframerate(wav.getframerate())
+        segment_wav.writeframes(frames)
+    return out.getvalue()
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"\W+", "", word.lower())
+
+
+def overlap_length(previous: list[str], following: list[str]) -> int:
+    """
+    How many words at the start of `following` repeat the end of `previous`.
+
+    The longest run of at least MIN_OVERLAP_WORDS matching words (ignoring
+    case and punctuation) wins, counting up to MAX_LEADING_WORDS words before
+    it that a clipped word may have garbled.
+    """
+    previous = [_normalize(word) for word in previous[-MAX_OVERLAP_WORDS:]]
+    following = [
+        _normalize(word) for word in following[: MAX_OVERLAP_WORDS + MAX_LEADING_WORDS]
+    ]
+    for length in range(min(len(previous), len(following)), MIN_OVERLAP_WORDS - 1, -1):
+        for lead in range(MAX_LEADING_WORDS + 1):
+            if following[lead : lead + length] == previous[-length:]:
+                return lead + length
+    return 0
+
+
+def stitch_transcripts(texts: list[str]) -> str:
+    """Join the transcripts of consecutive overlapping segments."""
+    words: list[str] = []
+    for text in texts:
+        following = text.split()
+        words.extend(following[overlap_length(words, following) :])
+    return " ".join(words)
+
+
+def decoder_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+async def decode_to_wav(source: Path, target: Path) -> None:
+    """Decode audio to 16 kHz mono 16-bit WAV, which is all Whisper needs."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-nostdin",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        str(source),
+        "-ac",
+        "1",
+        "-ar",
+        str(DECODE_SAMPLE_RATE),
+        "-c:a",
+        "pcm_s16le",
+        str(target),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        detail = stderr.decode(errors="replace").strip().splitlines()
+        raise ValueError(
+            f"Could not decode the audio file: {detail[-1] if detail else 'unknown error'}"
+        )
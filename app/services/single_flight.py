@@ -0,0 +1,132 @@
+import asyncio
+from contextlib import aclosing
+from typing import (AsyncGenerator, AsyncIterator, Awaitable, Callable,
+                    Optional, TypeVar)
+
+T = TypeVar("T")
+C = TypeVar("C", str, bytes)
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls that share a key into a single execution.
+
+    The first caller for a key (the leader) starts the work as its own task;
+    callers arriving while it runs (followers) await the same task. The work is
+    shielded, so a caller going away never cancels it for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone away
+
+
+class SharedStream:
+    """
+    One upstream stream of text (or bytes) replayed to any number of subscribers.
+
+    Chunks are buffered so late subscribers first catch up on everything sent
+    so far. `on_complete` receives the chunks put together with `join` once
+    the upstream finishes; it is never called if the upstream fails or every
+    subscriber leaves early, in which case the upstream is cancelled.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterator[C],
+        on_complete: Callable[[C], Awaitable[None]],
+        join: Callable[[list[C]], C] = "".join,
+    ):
+        self.chunks: list[C] = []
+        self.done = False
+        self.abandoned = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._source = source
+        self._on_complete = on_complete
+        self._join = join
+        self._updated = asyncio.Event()
+        self.task = asyncio.create_task(self._pump())
+
+    async def _pump(self) -> None:
+        try:
+            async for chunk in self._source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+        if self.error is None:
+            await self._on_complete(self._join(self.chunks))
+
+    def _notify(self) -> None:
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def subscribe(self) -> AsyncGenerator[C, None]:
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(self.chunks):
+                    position += 1
+                    yield self.chunks[position - 1]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._updated.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.abandoned = True
+                self.task.cancel()
+
+
+class StreamFanout:
+    """Share one upstream stream between concurrent subscribers with the same key."""
+
+    def __init__(self):
+        self._inflight: dict[str, SharedStream] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def stream(
+        self,
+        key: str,
+        make_source: Callable[[], AsyncIterator[C]],
+        on_complete: Callable[[C], Awaitable[None]],
+        join: Callable[[list[C]], C] = "".join,
+    ) -> AsyncGenerator[C, None]:
+        shared = self._inflight.get(key)
+        if shared is None or shared.abandoned:
+            shared = SharedStream(make_source(), on_complete, join)
+            self._inflight[key] = shared
+            shared.task.add_done_callback(lambda _: self._forget(key, shared))
+        async with aclosing(shared.subscribe()) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    def _forget(self, key: str, shared: SharedStream) -> None:
+        if self._inflight.get(key) is shared:
+            del self._inflight[key]
@@ -0,0 +1,100 @@
+from typing import AsyncIterator, Optional
+
+from app.services.audio import SPEECH_CHUNK_BYTES, AudioService
+from app.services.cache import CacheService, LocalCache
+from app.services.cache_format import hash_parts
+from app.services.single_flight import StreamFanout
+
+
+def speech_url(speech_id: str) -> str:
+    """Where the audio of a registered text is streamed from (app.routes.audio)."""
+    return f"/audio/{speech_id}"
+
+
+async def replay_audio(audio: bytes) -> AsyncIterator[bytes]:
+    for start in range(0, len(audio), SPEECH_CHUNK_BYTES):
+        yield audio[start : start + SPEECH_CHUNK_BYTES]
+
+
+class SpeechService:
+    """
+    Spoken summaries, synthesized once and then served from the cache.
+
+    Speech is identified by a hash of the text, the TTS model and the voice,
+    so a summary served from the cache reuses the audio made for it before.
+    `register` only records the text under its id. The audio is synthesized
+    when it is first fetched, passed on as the API sends it and stored once
+    complete; concurrent fetches while it is being made share one API call.
+
+    Texts and audio are kept in Redis when it is enabled, where every worker
+    finds them, and in a small in-process cache either way.
+    """
+
+    def __init__(
+        self,
+        audio_service: AudioService,
+        cache: CacheService,
+        stream_fanout: StreamFanout,
+        local: LocalCache,
+    ):
+        self.audio_service = audio_service
+        self.cache = cache
+        self.stream_fanout = stream_fanout
+        self.local = local
+
+    def speech_id(self, text: str) -> str:
+        return hash_parts(
+            (self.audio_service.tts_model, self.audio_service.tts_voice, text),
+            secret=self.cache.key_secret,
+        )
+
+    async def register(self, text: str) -> str:
+        """Remember a text so its audio can be fetched by the returned id."""
+        speech_id = self.speech_id(text)
+        if self.local.get(f"text:{speech_id}") is None:
+            self.local.set(f"text:{speech_id}", {"text": text}, len(text))
+            await self.cache.set_speech_text(speech_id, text)
+        return speech_id
+
+    async def synthesize(self, text: str) -> str:
+        """Register a text and synthesize its audio now, unless it is cached."""
+        speech_id = await self.register(text)
+        audio = await self.open(speech_id)
+        async for _ in audio:
+            pass
+        return speech_id
+
+    async def open(self, speech_id: str) -> Optional[AsyncIterator[bytes]]:
+        """The audio (mp3) for a registered text, or None for an unknown id."""
+        audio = await self._cached_audio(speech_id)
+        if audio is not None:
+            return replay_audio(audio)
+        text = await self._text(speech_id)
+        if text is None:
+            return None
+
+        async def store(audio: bytes) -> None:
+            self.local.set(f"audio:{speech_id}", {"audio": audio}, len(audio))
+            await self.cache.set_speech(speech_id, audio)
+
+        return self.stream_fanout.stream(
+            f"tts:{speech_id}",
+            lambda: self.audio_service.stream_speech(text),
+            on_complete=store,
+            join=b"".join,
+        )
+
+    async def _cached_audio(self, speech_id: str) -> Optional[bytes]:
+        entry = self.local.get(f"audio:{speech_id}")
+        if entry is not None:
+            return entry["audio"]
+        audio = await self.cache.get_speech(speech_id)
+        if audio:
+            self.local.set(f"audio:{speech_id}", {"audio": audio}, len(audio))
+        return audio or None
+
+    async def _text(self, speech_id: str) -> Optional[str]:
+        entry = self.local.get(f"text:{speech_id}")
+        if entry is not None:
+            return entry["text"]
+        return await self.cache.get_speech_text(speech_id)
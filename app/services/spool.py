@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+from io import BytesIO
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO
+
+from fastapi import UploadFile
+
+from app.core.metrics import timed
+
+CHUNK_SIZE = 256 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload grows past its size limit while being spooled."""
+
+
+class UploadSpool:
+    """
+    Hold an uploaded file in memory, or in a named temp file past `threshold`.
+
+    Consumers take `source` (bytes for small files, a Path for spooled ones)
+    so parser workers can open large files themselves instead of receiving a
+    pickled copy, or `open()` a file object that HTTP clients stream from.
+    `sha256` is the hex digest of the contents, hashed as they are written.
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+        self.size = 0
+        self._chunks: list[bytes] = []
+        self._file = None
+        self._hash = hashlib.sha256()
+        self._sha256: str | None = None
+
+    @classmethod
+    def from_file(cls, path: Path, sha256: str) -> "UploadSpool":
+        """A spool over a file that is already on disk. Closing it leaves the file in place."""
+        spool = cls(threshold=0)
+        spool.size = path.stat().st_size
+        spool._file = open(path, "rb")
+        spool._sha256 = sha256
+        return spool
+
+    @property
+    def path(self) -> Path | None:
+        return Path(self._file.name) if self._file is not None else None
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256 or self._hash.hexdigest()
+
+    async def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self._hash.update(chunk)
+        if self._file is None and self.size > self.threshold:
+            self._file = NamedTemporaryFile(prefix="upload-", delete=True)
+            self._chunks.append(chunk)
+            chunks, self._chunks = self._chunks, []
+            await asyncio.to_thread(self._file.writelines, chunks)
+        elif self._file is not None:
+            await asyncio.to_thread(self._file.write, chunk)
+        else:
+            self._chunks.append(chunk)
+
+    async def finish(self) -> None:
+        if self._file is not None:
+            await asyncio.to_thread(self._file.flush)
+        elif len(self._chunks) > 1:
+            self._chunks = [b"".join(self._chunks)]
+
+    @property
+    def source(self) -> bytes | Path:
+        if self._file is not None:
+            return self.path
+        return self._chunks[0] if self._chunks else b""
+
+    def open(self) -> BinaryIO:
+        """A fresh file object over the contents, positioned at the start."""
+        if self._file is not None:
+            return open(self._file.name, "rb")
+        # BytesIO shares the bytes object's buffer until it is written to
+        return BytesIO(self.source)
+
+    def close(self) -> None:
+        self._chunks = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "UploadSpool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def spool_upload(
+    upload: UploadFile, max_size: int, threshold: int
+) -> UploadSpool:
+    """Copy an upload into an UploadSpool chunk by chunk, enforcing `max_size`."""
+    spool = UploadSpool(threshold)
+    try:
+        with timed("upload_read"):
+            while chunk := await upload.read(CHUNK_SIZE):
+                if spool.size + len(chunk) > max_size:
+                    raise UploadTooLargeError(
+                        f"File too large (max {max_size // (1024 * 1024)} MB)"
+                    )
+                await spool.write(chunk)
+            await spool.finish()
+    except BaseException:
+        spool.close()
+        raise
+    return spool
@@ -1,48 +1,250 @@
+import asyncio
+import time
+import uuid
+from contextlib import aclosing
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, AsyncIterator, Iterator, Optional
 
 from app.clients.llm import LLMClient
+from app.core.admission import llm_admitted_at
 from app.core.config import get_settings
 from app.core.logging import logger
+from app.core.metrics import observe_stage, timed
 from app.models.requests import SummarizeRequest
 from app.models.responses import SummaryResponse
-from app.prompts.loader import build_user_prompt, load_system_prompt
+from app.models.stream import StreamDelta
+from app.prompts.loader import (build_chunk_prompt, build_multi_style_prompt,
+                                build_style_prompt, build_text_prefix,
+                                load_system_prompt)
 from app.services.cache import CacheService
+from app.services.chunking import CHARS_PER_TOKEN, split_text
+from app.services.multi_style import (MultiStyleStreamParser, parse_styles,
+                                      style_deltas)
+from app.services.single_flight import SingleFlight, StreamFanout
+
+# Cached summaries are replayed to streaming clients in chunks of about this size.
+REPLAY_CHUNK_CHARS = 64
+
+
+@dataclass
+class SourceDocument:
+    """
+    An uploaded document whose extracted text is being summarized.
+
+    `key` hashes the uploaded file (see DocumentExtractor.document_key) and
+    stands in for the text in the summary's cache key (see
+    CacheService.generate_document_key), so the summary of a re-uploaded file
+    is found without extracting or hashing its text. `condensed` is the
+    map-reduced text from condense_sections, if it was needed.
+    """
+
+    key: str
+    condensed: Optional[str] = None
+
+
+def _prompt_text(
+    summarize_request: SummarizeRequest, document: Optional[SourceDocument]
+) -> str:
+    if document is not None and document.condensed is not None:
+        return document.condensed
+    return summarize_request.text
+
+
+def _style_request(summarize_request: SummarizeRequest, style: str) -> SummarizeRequest:
+    """The single-style request whose cache slot holds one style of a multi-style request."""
+    return summarize_request.model_copy(update={"style": style, "styles": None})
+
+
+def _llm_seconds(start: float) -> float:
+    """Seconds since an LLM call made at `start`, less any wait for admission."""
+    return time.perf_counter() - max(start, llm_admitted_at.get())
+
+
+def replay_chunks(summary: str) -> Iterator[str]:
+    """Split a cached summary into chunks for streaming clients."""
+    for start in range(0, len(summary), REPLAY_CHUNK_CHARS):
+        yield summary[start : start + REPLAY_CHUNK_CHARS]
 
 
 class SummarizerService:
-    def __init__(self, llm: LLMClient, cache: CacheService):
+    def __init__(
+        self,
+        llm: LLMClient,
+        cache: CacheService,
+        single_flight: Optional[SingleFlight] = None,
+        stream_fanout: Optional[StreamFanout] = None,
+    ):
         self.llm = llm
         self.cache = cache
+        self.single_flight = single_flight or SingleFlight()
+        self.stream_fanout = stream_fanout or StreamFanout()
         settings = get_settings()
         self.max_tokens = settings.max_tokens
         self.model = settings.model
+        self.distributed = settings.single_flight_distributed
+        self.lock_ttl = settings.single_flight_lock_ttl
+        self.poll_interval = settings.single_flight_poll_interval
+        self.max_chars = settings.max_chars
+        self.chunk_tokens = settings.chunk_tokens
+        self.chunk_summary_words = settings.chunk_summary_words
+        self.chunk_concurrency = settings.chunk_concurrency
 
-    async def summarize(self, summarize_request: SummarizeRequest) -> SummaryResponse:
-        cached_summary: Optional[dict] = self.cache.get(
+    def _cache_key(
+        self,
+        summarize_request: SummarizeRequest,
+        document: Optional[SourceDocument] = None,
+    ) -> str:
+        if document is not None:
+            return self.cache.generate_document_key(
+                document.key, summarize_request.style, summarize_request.max_length
+            )
+        return self.cache.generate_cache_key(
             text=summarize_request.text,
             style=summarize_request.style,
             max_length=summarize_request.max_length,
         )
 
+    async def get_cached(
+        self,
+        summarize_request: SummarizeRequest,
+        document: Optional[SourceDocument] = None,
+    ) -> Optional[SummaryResponse]:
+        """Return the cached summary for a request, or None on a miss."""
+        if document is not None:
+            return await self.get_cached_document(
+                document, summarize_request.style, summarize_request.max_length
+            )
+        cached_summary: Optional[dict] = await self.cache.get(
+            text=summarize_request.text,
+            style=summarize_request.style,
+            max_length=summarize_request.max_length,
+        )
         if cached_summary:
-            logger.info("Cache hit - returning cached summary.")
             return SummaryResponse(**cached_summary)
+        return None
+
+    async def get_cached_document(
+        self, document: SourceDocument, style: str, max_length: int
+    ) -> Optional[SummaryResponse]:
+        """Return the cached summary of an uploaded document before its text is extracted."""
+        cached_summary: Optional[dict] = await self.cache.get_document_summary(
+            document_key=document.key, style=style, max_length=max_length
+        )
+        if cached_summary:
+            return SummaryResponse(**cached_summary)
+        return None
+
+    async def summarize(
+        self,
+        summarize_request: SummarizeRequest,
+        document: Optional[SourceDocument] = None,
+    ) -> SummaryResponse:
+        """
+        Summarize a request, from the cache when possible.
+
+        Pass `document` when the request text was extracted from an upload,
+        so the summary is cached under the document's key.
+        """
+        cached_response = await self.get_cached(summarize_request, document)
+        if cached_response:
+            logger.info("Cache hit - returning cached summary.")
+            return cached_response
 
         logger.info("Cache miss.")
-        system_prompt = load_system_prompt()
-        user_prompt = build_user_prompt(
-            text=summarize_request.text,
-            style=summarize_request.style,
-            max_length=summarize_request.max_length,
+        cache_key = self._cache_key(summarize_request, document)
+        return await self.single_flight.do(
+            cache_key,
+            lambda: self._summarize_once(summarize_request, cache_key, document),
         )
 
-        summary = await self.llm.complete(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            max_tokens=self.max_tokens,
+    async def summarize_document(
+        self,
+        document: SourceDocument,
+        sections: AsyncIterator[str],
+        style: str,
+        max_length: int,
+    ) -> SummaryResponse:
+        """
+        Summarize an uploaded document, reading its `sections` only on a cache miss.
+
+        Long documents are map-reduced as their sections arrive, as in
+        condense_sections.
+        """
+        cached_response = await self.get_cached_document(document, style, max_length)
+        if cached_response is not None:
+            return cached_response
+        text, document.condensed = await self.condense_sections(sections)
+        request = SummarizeRequest(text=text, max_length=max_length, style=style)
+        return await self.summarize(request, document)
+
+    async def _summarize_once(
+        self,
+        summarize_request: SummarizeRequest,
+        cache_key: str,
+        document: Optional[SourceDocument] = None,
+    ) -> SummaryResponse:
+        """Generate a summary, waiting on another worker's result in distributed mode."""
+        if not self.distributed:
+            return await self._generate(summarize_request, document)
+
+        token = uuid.uuid4().hex
+        if not await self.cache.try_lock(cache_key, token, self.lock_ttl):
+            cached_summary = await self._wait_for_leader(
+                summarize_request, cache_key, document
+            )
+            if cached_summary:
+                logger.info("Coalesced with another worker's summary.")
+                return cached_summary
+            logger.info("Leader worker gave up - generating summary locally.")
+        try:
+            return await self._generate(summarize_request, document)
+        finally:
+            await self.cache.unlock(cache_key, token)
+
+    async def _wait_for_leader(
+        self,
+        summarize_request: SummarizeRequest,
+        cache_key: str,
+        document: Optional[SourceDocument] = None,
+    ) -> Optional[SummaryResponse]:
+        """Poll the cache until the lock holder writes its summary or releases the lock."""
+        deadline = asyncio.get_running_loop().time() + self.lock_ttl
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            cached_summary = await self.get_cached(summarize_request, document)
+            if cached_summary:
+                return cached_summary
+            if not await self.cache.is_locked(cache_key):
+                return None
+        return None
+
+    async def _generate(
+        self,
+        summarize_request: SummarizeRequest,
+        document: Optional[SourceDocument] = None,
+    ) -> SummaryResponse:
+        text = await self._condense(_prompt_text(summarize_request, document))
+        with timed("prompt_build"):
+            system_prompt = load_system_prompt()
+            cache_prefix = build_text_prefix(text)
+            user_prompt = build_style_prompt(
+                style=summarize_request.style, max_length=summarize_request.max_length
+            )
+        summary = await self._complete(
+            system_prompt, user_prompt, self.max_tokens, cache_prefix
         )
 
+        response_data = await self._store(summarize_request, summary, document)
+        return SummaryResponse(**response_data, summary_ts=datetime.now(timezone.utc))
+
+    async def _store(
+        self,
+        summarize_request: SummarizeRequest,
+        summary: str,
+        document: Optional[SourceDocument] = None,
+    ) -> dict:
+        """Cache a finished summary and return its response fields."""
         response_data = {
             "summary": summary,
             "style": summarize_request.style,
@@ -51,27 +253,324 @@ class SummarizerService:
             "summary_length": len(summary.split()),
         }
 
-        self.cache.set(
-            text=summarize_request.text,
-            style=summarize_request.style,
-            max_length=summarize_request.max_length,
-            summary_data=response_data,
+        if document is not None:
+            await self.cache.set_document_summary(
+                document_key=document.key,
+                style=summarize_request.style,
+                max_length=summarize_request.max_length,
+                summary_data=response_data,
+            )
+        else:
+            await self.cache.set(
+                text=summarize_request.text,
+                style=summarize_request.style,
+                max_length=summarize_request.max_length,
+                summary_data=response_data,
+            )
+        return response_data
+
+    async def summarize_stream(
+        self,
+        summarize_request: SummarizeRequest,
+        document: Optional[SourceDocument] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream a summary, replaying it from the cache when possible.
+
+        On a miss, concurrent streams for the same request share one upstream
+        LLM stream, and the finished summary is cached only if it completed.
+        `document` is used as in summarize.
+        """
+        cached_response = await self.get_cached(summarize_request, document)
+        if cached_response:
+            logger.info("Cache hit - replaying cached summary.")
+            for chunk in replay_chunks(cached_response.summary):
+                yield chunk
+            return
+
+        logger.info("Cache miss.")
+        cache_key = self._cache_key(summarize_request, document)
+
+        async def on_complete(summary: str) -> None:
+            await self._store(summarize_request, summary, document)
+
+        async with aclosing(
+            self.stream_fanout.stream(
+                cache_key,
+                lambda: self._stream_llm(summarize_request, document),
+                on_complete,
+            )
+        ) as chunks:
+            async for text in chunks:
+                yield text
+
+    async def _stream_llm(
+        self,
+        summarize_request: SummarizeRequest,
+        document: Optional[SourceDocument] = None,
+    ) -> AsyncGenerator[str, None]:
+        text = await self._condense(_prompt_text(summarize_request, document))
+        with timed("prompt_build"):
+            system_prompt = load_system_prompt()
+            cache_prefix = build_text_prefix(text)
+            user_prompt = build_style_prompt(
+                style=summarize_request.style, max_length=summarize_request.max_length
+            )
+        async with aclosing(
+            self._stream(system_prompt, user_prompt, self.max_tokens, cache_prefix)
+        ) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def _complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        start = time.perf_counter()
+        reply = await self.llm.complete(
+            system_prompt, user_prompt, max_tokens, cache_prefix
         )
+        observe_stage("llm_total", _llm_seconds(start))
+        return reply
 
-        return SummaryResponse(**response_data, summary_ts=datetime.now(timezone.utc))
+    async def _stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream from the LLM, recording time to first token and, if it finishes, total time.
 
-    async def summarize_stream(
+        Like llm_total of complete calls, both leave out the wait for
+        admission (see AdmissionController.admit), recorded as llm_queue.
+        """
+        start = time.perf_counter()
+        first_token = True
+        async with aclosing(
+            self.llm.stream(system_prompt, user_prompt, max_tokens, cache_prefix)
+        ) as chunks:
+            async for chunk in chunks:
+                if first_token:
+                    observe_stage("llm_first_token", _llm_seconds(start))
+                    first_token = False
+                yield chunk
+        observe_stage("llm_total", _llm_seconds(start))
+
+    async def summarize_styles(
         self, summarize_request: SummarizeRequest
-    ) -> AsyncGenerator[str, None]:
-        system_prompt = load_system_prompt()
-        user_prompt = build_user_prompt(
-            text=summarize_request.text,
-            style=summarize_request.style,
-            max_length=summarize_request.max_length,
+    ) -> list[SummaryResponse]:
+        """
+        Summarize a text in each of `summarize_request.styles`.
+
+        Styles that are not cached are generated together by one LLM call
+        that returns them as a JSON object. Each summary is cached in the
+        slot of the single-style request for that style, so later requests
+        for any one of them hit the cache.
+        """
+        styles = list(dict.fromkeys(summarize_request.styles))
+        responses: dict[str, SummaryResponse] = {}
+        for style in styles:
+            cached_response = await self.get_cached(
+                _style_request(summarize_request, style)
+            )
+            if cached_response:
+                responses[style] = cached_response
+        missing = [style for style in styles if style not in responses]
+        logger.info(f"Cache hit for {len(responses)} of {len(styles)} styles.")
+
+        if len(missing) == 1:
+            responses[missing[0]] = await self.summarize(
+                _style_request(summarize_request, missing[0])
+            )
+        elif missing:
+            cache_key = "|".join(
+                self.cache.generate_cache_key(
+                    text=summarize_request.text,
+                    style=style,
+                    max_length=summarize_request.max_length,
+                )
+                for style in missing
+            )
+            responses.update(
+                await self.single_flight.do(
+                    cache_key,
+                    lambda: self._generate_styles(summarize_request, missing),
+                )
+            )
+        return [responses[style] for style in styles]
+
+    async def _generate_styles(
+        self, summarize_request: SummarizeRequest, styles: list[str]
+    ) -> dict[str, SummaryResponse]:
+        text = await self._condense(summarize_request.text)
+        with timed("prompt_build"):
+            system_prompt = load_system_prompt()
+            cache_prefix = build_text_prefix(text)
+            user_prompt = build_multi_style_prompt(styles, summarize_request.max_length)
+        reply = await self._complete(
+            system_prompt, user_prompt, self.max_tokens * len(styles), cache_prefix
+        )
+        return await self._store_styles(summarize_request, parse_styles(reply, styles))
+
+    async def _store_styles(
+        self, summarize_request: SummarizeRequest, summaries: dict[str, str]
+    ) -> dict[str, SummaryResponse]:
+        responses = {}
+        for style, summary in summaries.items():
+            response_data = await self._store(
+                _style_request(summarize_request, style), summary
+            )
+            responses[style] = SummaryResponse(
+                **response_data, summary_ts=datetime.now(timezone.utc)
+            )
+        return responses
+
+    async def summarize_styles_stream(
+        self, summarize_request: SummarizeRequest
+    ) -> AsyncGenerator[StreamDelta, None]:
+        """
+        Stream summaries in several styles as StreamDelta events.
+
+        Paths are the style names, with bullets addressed one by one
+        ("bullet[0]", "bullet[1]", ...). Cached styles are replayed first,
+        then the others are streamed from one LLM call and cached once the
+        reply is complete.
+        """
+        styles = list(dict.fromkeys(summarize_request.styles))
+        missing = []
+        for style in styles:
+            cached_response = await self.get_cached(
+                _style_request(summarize_request, style)
+            )
+            if cached_response:
+                for delta in style_deltas(style, cached_response.summary):
+                    yield delta
+            else:
+                missing.append(style)
+        if not missing:
+            return
+
+        text = await self._condense(summarize_request.text)
+        parser = MultiStyleStreamParser(missing)
+        with timed("prompt_build"):
+            system_prompt = load_system_prompt()
+            cache_prefix = build_text_prefix(text)
+            user_prompt = build_multi_style_prompt(
+                missing, summarize_request.max_length
+            )
+        async with aclosing(
+            self._stream(
+                system_prompt, user_prompt, self.max_tokens * len(missing), cache_prefix
+            )
+        ) as chunks:
+            async for chunk in chunks:
+                for delta in parser.feed(chunk):
+                    yield delta
+        await self._store_styles(summarize_request, parser.finish())
+
+    async def condense_sections(self, sections: AsyncIterator[str]) -> tuple[str, str]:
+        """
+        Collect a document's sections, map-reducing it while it is still arriving.
+
+        Once the text is known to be longer than `max_chars`, each completed
+        chunk is summarized in the background while later sections are still
+        being extracted.
+
+        Args:
+            sections (AsyncIterator[str]): Sections as yielded by FileParser.iter_file.
+        Returns:
+            tuple[str, str]: The full text (sections joined with newlines) and
+                the text to prompt with, which is the full text if it is short
+                enough and the joined chunk summaries otherwise.
+        """
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        chunk_chars = self.chunk_tokens * CHARS_PER_TOKEN
+        parts: list[str] = []
+        length = 0
+        pending = ""  # trailing text not yet assigned to a chunk
+        jobs: list[asyncio.Task] = []
+
+        def start_jobs(chunks: list[str]) -> None:
+            for chunk in chunks:
+                jobs.append(
+                    asyncio.create_task(self._summarize_chunk(chunk, semaphore))
+                )
+
+        try:
+            async for section in sections:
+                pending = f"{pending}\n{section}" if parts else section
+                length += len(section) + (1 if parts else 0)  # its joining newline
+                parts.append(section)
+                if length > self.max_chars and len(pending) > chunk_chars:
+                    complete = split_text(pending, self.chunk_tokens)
+                    pending = complete.pop() if complete else ""
+                    start_jobs(complete)
+
+            text = "\n".join(parts)
+            if length <= self.max_chars:
+                return text, text
+            start_jobs(split_text(pending, self.chunk_tokens))
+            logger.info(f"Summarizing {len(jobs)} chunks of a long document.")
+            partial_summaries = await asyncio.gather(*jobs)
+            return text, "\n\n".join(partial_summaries)
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+
+    async def _condense(self, text: str) -> str:
+        """
+        Map-reduce text that is too long for a single prompt.
+
+        The text is split into token-budgeted chunks that are summarized
+        concurrently, and the joined chunk summaries are split and summarized
+        again until they fit within `max_chars`. Short text is returned as is.
+        """
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+        while len(text) > self.max_chars:
+            chunks = split_text(text, self.chunk_tokens)
+            logger.info(f"Summarizing {len(chunks)} chunks of a long text.")
+            partial_summaries = await asyncio.gather(
+                *(self._summarize_chunk(chunk, semaphore) for chunk in chunks)
+            )
+            condensed = "\n\n".join(partial_summaries)
+            if len(condensed) >= len(text):
+                break
+            text = condensed
+        return text
+
+    async def _summarize_chunk(self, chunk: str, semaphore: asyncio.Semaphore) -> str:
+        """Summarize one chunk, reusing the cached result for unchanged chunks."""
+        cached_chunk = await self.cache.get(
+            text=chunk, style="chunk", max_length=self.chunk_summary_words
+        )
+        if cached_chunk:
+            return cached_chunk["summary"]
+
+        async def generate() -> str:
+            with timed("prompt_build"):
+                system_prompt = load_system_prompt()
+                user_prompt = build_chunk_prompt(
+                    text=chunk, max_length=self.chunk_summary_words
+                )
+            async with semaphore:
+                summary = await self._complete(
+                    system_prompt, user_prompt, self.max_tokens
+                )
+            await self.cache.set(
+                text=chunk,
+                style="chunk",
+                max_length=self.chunk_summary_words,
+                summary_data={"summary": summary},
+            )
+            return summary
+
+        cache_key = self.cache.generate_cache_key(
+            text=chunk, style="chunk", max_length=self.chunk_summary_words
         )
-        async for text in self.llm.stream(
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            max_tokens=self.max_tokens,
-        ):
-            yield text
+        return await self.single_flight.do(cache_key, generate)
@@ -0,0 +1,75 @@
+"""Run the real app under uvicorn in a subprocess for end-to-end benchmarks."""
+
+import asyncio
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+import httpx
+
+
+@dataclass
+class AppProcess:
+    base_url: str
+    pid: int
+
+    def _memory_status(self, field: str) -> int:
+        """Read a memory field in bytes from /proc (Linux only)."""
+        for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+        raise RuntimeError(f"{field} not reported for pid {self.pid}")
+
+    def rss(self) -> int:
+        return self._memory_status("VmRSS")
+
+    def peak_rss(self) -> int:
+        """High-water mark of resident memory since the process started."""
+        return self._memory_status("VmHWM")
+
+    def cpu_seconds(self) -> float:
+        """User plus system CPU time used so far (Linux only)."""
+        stat = Path(f"/proc/{self.pid}/stat").read_text()
+        # Fields after the parenthesized command name; utime and stime are 14th and 15th
+        fields = stat.rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+@asynccontextmanager
+async def running_app(
+    env: dict[str, str], port: int = 8765, startup_timeout: float = 30.0
+) -> AsyncIterator[AppProcess]:
+    """Start `uvicorn app.main:app` with extra env vars and yield its address."""
+    base_url = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        env={
+            **os.environ,
+            "ANTHROPIC_API_KEY": "stub",
+            "OPENAI_API_KEY": "stub",
+            "REDIS_ENABLED": "false",
+            **env,
+        },
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        async with httpx.AsyncClient() as client:
+            deadline = asyncio.get_running_loop().time() + startup_timeout
+            while True:
+                try:
+                    if (await client.get(f"{base_url}/health")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if asyncio.get_running_loop().time() > deadline:
+                    raise RuntimeError("App did not start in time.")
+                await asyncio.sleep(0.1)
+        yield AppProcess(base_url, process.pid)
+    finally:
+        process.terminate()
+        process.wait()
@@ -0,0 +1,104 @@
+"""
+Compare the cache value and key format with the previous JSON/SHA-256 format.
+
+Reports encode/decode time and stored size per entry for a summary and for
+an extracted document, and the time to build a cache key for a large text.
+With --redis-url, entries are also written to that Redis and its
+MEMORY USAGE per entry is reported.
+
+    python -m benchmarks.bench_cache_format --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from typing import Any, Callable
+
+import redis
+
+from app.services.cache_format import decode_value, encode_value, hash_parts
+
+COMPRESS_MIN_BYTES = 1024
+
+SUMMARY = {
+    "summary": "The season was the club's first under a new head coach. " * 12,
+    "style": "paragraph",
+    "model": "claude-sonnet-4-6",
+    "prompt_length": 4800,
+    "summary_length": 132,
+}
+DOCUMENT = [
+    f"Page {page}. " + "The committee reviewed the quarterly results in detail. " * 60
+    for page in range(50)
+]
+KEY_TEXT = "Long document text that only needs to be hashed. " * 20_000
+
+
+def legacy_key(text: str, style: str, max_length: int) -> str:
+    return hashlib.sha256(f"{text}:{style}:{max_length}".encode()).hexdigest()
+
+
+def per_call_us(fn: Callable[[], Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def redis_memory_per_entry(
+    client: redis.Redis, label: str, payload: bytes | str, entries: int
+) -> float:
+    keys = [f"bench-cache-format:{label}:{i}" for i in range(entries)]
+    try:
+        for key in keys:
+            client.set(key, payload)
+        return sum(client.memory_usage(key) for key in keys) / entries
+    finally:
+        client.delete(*keys)
+
+
+def main(repeat: int, redis_url: str | None, entries: int) -> None:
+    client = redis.Redis.from_url(redis_url) if redis_url else None
+    header = (
+        f"{'value':<10} {'format':<8} {'encode us':>10} {'decode us':>10} {'bytes':>8}"
+    )
+    print(header + (f" {'redis bytes':>12}" if client else ""))
+
+    for label, value in (("summary", SUMMARY), ("document", DOCUMENT)):
+        formats = (
+            ("json", lambda: json.dumps(value), json.loads),
+            (
+                "binary",
+                lambda: encode_value(value, COMPRESS_MIN_BYTES),
+                decode_value,
+            ),
+        )
+        for name, encode, decode in formats:
+            payload = encode()
+            line = (
+                f"{label:<10} {name:<8} {per_call_us(encode, repeat):>10.1f} "
+                f"{per_call_us(lambda: decode(payload), repeat):>10.1f} "
+                f"{len(payload):>8}"
+            )
+            if client:
+                memory = redis_memory_per_entry(
+                    client, f"{label}:{name}", payload, entries
+                )
+                line += f" {memory:>12.0f}"
+            print(line)
+
+    print(f"\nCache key for a {len(KEY_TEXT) / 1024 / 1024:.1f} MB text:")
+    legacy_us = per_call_us(lambda: legacy_key(KEY_TEXT, "bullet", 200), repeat)
+    keyed_us = per_call_us(lambda: hash_parts((KEY_TEXT, "bullet", 200)), repeat)
+    print(f"  sha256 of joined string: {legacy_us:>8.0f} us")
+    print(f"  streamed HMAC-SHA256:    {keyed_us:>8.0f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--redis-url", help="also measure Redis MEMORY USAGE")
+    parser.add_argument("--entries", type=int, default=100)
+    args = parser.parse_args()
+    main(args.repeat, args.redis_url, args.entries)
@@ -0,0 +1,82 @@
+"""
+Compare per-request LLM client construction with the app-lifetime pooled client.
+
+Runs both strategies against a local stub server and reports p50/p99 latency
+and how many TCP connections were opened per 1k requests.
+
+    python -m benchmarks.bench_clients --requests 2000 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.stub_server import StubServer
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+async def run(make_client, requests: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            client = make_client()
+            await client.complete(
+                system_prompt="You are a benchmark.",
+                user_prompt="Summarize nothing.",
+                max_tokens=16,
+            )
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+async def main(requests: int, concurrency: int, latency: float) -> None:
+    async with StubServer(latency=latency) as server:
+        os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+        os.environ.setdefault("ANTHROPIC_API_KEY", "stub")
+
+        from app.clients.llm import AnthropicClient, get_llm_client
+        from app.core.config import get_settings
+
+        get_settings.cache_clear()
+        get_llm_client.cache_clear()
+
+        strategies = {
+            "per-request": AnthropicClient,
+            "pooled": get_llm_client,
+        }
+
+        print(f"{'strategy':<12} {'p50 ms':>8} {'p99 ms':>8} {'conns/1k':>9}")
+        for name, make_client in strategies.items():
+            server.reset_counters()
+            latencies = await run(make_client, requests, concurrency)
+            connections = server.connections_opened * 1000 / requests
+            print(
+                f"{name:<12} {percentile(latencies, 50) * 1000:>8.2f} "
+                f"{percentile(latencies, 99) * 1000:>8.2f} {connections:>9.1f}"
+            )
+            print(f"{'':<12} mean {statistics.mean(latencies) * 1000:.2f} ms")
+
+        await get_llm_client().aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="stub server latency in seconds"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency))
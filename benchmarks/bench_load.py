@@ -0,0 +1,336 @@
+"""
+Replay a JSONL workload against the real app at a target request rate.
+
+The app runs under uvicorn with its LLM pointed at the local stub server,
+which models time to first token, token rate and errors, so results measure
+the app itself. Requests are sent open-loop: each starts on schedule whether
+or not earlier ones have finished, as independent clients would. The JSON
+report has latency percentiles per endpoint, time to first token of streams,
+throughput, the app's memory and CPU use and its event loop lag. Pass the
+report of another commit as --baseline to fail on regressions.
+
+    python -m benchmarks.bench_load --rps 20 --duration 30 --output report.json
+    python -m benchmarks.bench_load --baseline main.json --max-regression 0.2
+
+Each workload line is a summarize request ({"text": ..., "style": ...}),
+optionally with "endpoint" ("/summarize/" or "/summarize/stream"); lines
+without one go to the stream endpoint with probability --stream-fraction.
+Lines without "text" use their "body" string as the text, so the change
+request backlog in requests.jsonl can serve as a corpus. Lines are replayed
+in order, starting over when the workload runs out. Each text gets the
+request's number appended, so repeats aren't coalesced or served from the
+cache, unless --replay-exact is given.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.app_process import running_app
+from benchmarks.bench_clients import percentile
+from benchmarks.stub_server import StubServer
+
+DEFAULT_WORKLOAD = Path(__file__).with_name("workload.jsonl")
+ENDPOINTS = ("/summarize/", "/summarize/stream")
+LAG_METRIC = "summarizer_event_loop_lag_seconds"
+
+# Report paths compared against a baseline, and which way is worse
+LOWER_IS_BETTER = ("latency_ms.", "ttft_ms.", "event_loop_lag_ms.", "rss_mb.peak")
+HIGHER_IS_BETTER = ("throughput_rps",)
+UNTRACKED = (".max", ".samples")  # too noisy, or not a measure of speed
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: str  # HTTP status code, "stream_error" or "transport_error"
+    latency: float
+    ttft: Optional[float] = None  # streams only
+    start_delay: float = 0.0  # how far behind schedule the request was sent
+
+
+def load_workload(
+    path: Path, stream_fraction: float, seed: int
+) -> list[tuple[str, dict]]:
+    """Read (endpoint, request body) pairs from a JSONL file."""
+    rng = random.Random(seed)
+    workload = []
+    for line in path.read_text().splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        text = item.get("text", item.get("body"))
+        if not isinstance(text, str):
+            continue
+        endpoint = item.get("endpoint") or (
+            ENDPOINTS[1] if rng.random() < stream_fraction else ENDPOINTS[0]
+        )
+        request = {"text": text}
+        for field in ("style", "styles", "max_length"):
+            if field in item:
+                request[field] = item[field]
+        workload.append((endpoint, request))
+    if not workload:
+        raise ValueError(f"{path} has no requests with a text.")
+    return workload
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, request: dict) -> Sample:
+    start = time.perf_counter()
+    try:
+        if endpoint != ENDPOINTS[1]:
+            response = await client.post(endpoint, json=request)
+            return Sample(
+                endpoint, str(response.status_code), time.perf_counter() - start
+            )
+
+        ttft = None
+        status = "200"
+        async with client.stream("POST", endpoint, json=request) as response:
+            if response.status_code != 200:
+                await response.aread()
+                status = str(response.status_code)
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line.removeprefix("data:"))
+                    if event["type"] == "delta" and ttft is None:
+                        ttft = time.perf_counter() - start
+                    elif event["type"] == "error":
+                        status = "stream_error"
+        return Sample(endpoint, status, time.perf_counter() - start, ttft)
+    except httpx.HTTPError:
+        return Sample(endpoint, "transport_error", time.perf_counter() - start)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    workload: list[tuple[str, dict]],
+    rps: float,
+    duration: float,
+    replay_exact: bool = False,
+) -> tuple[list[Sample], float]:
+    """Send requests at `rps` for `duration` seconds; return samples and elapsed time."""
+
+    async def scheduled(index: int, due: float) -> Sample:
+        endpoint, request = workload[index % len(workload)]
+        if not replay_exact:
+            request = {**request, "text": f"{request['text']} ({index})"}
+        sample = await send(client, endpoint, request)
+        sample.start_delay = max(0.0, sent_at[index] - due)
+        return sample
+
+    tasks: list[asyncio.Task] = []
+    sent_at: dict[int, float] = {}
+    start = time.perf_counter()
+    for index in range(max(1, int(rps * duration))):
+        due = start + index / rps
+        if (delay := due - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        sent_at[index] = time.perf_counter()
+        tasks.append(asyncio.create_task(scheduled(index, due)))
+    samples = await asyncio.gather(*tasks)
+    return samples, time.perf_counter() - start
+
+
+async def scrape_lag(client: httpx.AsyncClient) -> tuple[dict[float, float], float]:
+    """The app's event loop lag histogram: cumulative counts by bucket bound, and the sum."""
+    response = await client.get("/metrics")
+    buckets: dict[float, float] = {}
+    total = 0.0
+    for family in text_string_to_metric_families(response.text):
+        if family.name != LAG_METRIC:
+            continue
+        for sample in family.samples:
+            if sample.name == f"{LAG_METRIC}_bucket":
+                buckets[float(sample.labels["le"])] = sample.value
+            elif sample.name == f"{LAG_METRIC}_sum":
+                total = sample.value
+    return buckets, total
+
+
+def lag_report(
+    before: tuple[dict[float, float], float], after: tuple[dict[float, float], float]
+) -> dict:
+    """Mean lag during the run, and the bucket bound its p99 falls under."""
+    buckets = {le: count - before[0].get(le, 0.0) for le, count in after[0].items()}
+    count = buckets.get(float("inf"), 0.0)
+    if not count:
+        return {}
+    p99 = next(le for le in sorted(buckets) if buckets[le] >= 0.99 * count)
+    return {
+        "mean": round((after[1] - before[1]) / count * 1000, 2),
+        "p99_bucket": p99 * 1000 if p99 != float("inf") else None,
+        "samples": int(count),
+    }
+
+
+def distribution(values: list[float]) -> dict:
+    if not values:
+        return {}
+    return {
+        f"p{pct}": round(percentile(values, pct) * 1000, 1) for pct in (50, 95, 99)
+    } | {"max": round(max(values) * 1000, 1)}
+
+
+def build_report(samples: list[Sample], elapsed: float) -> dict:
+    statuses: dict[str, int] = {}
+    for sample in samples:
+        statuses[sample.status] = statuses.get(sample.status, 0) + 1
+    ok = [sample for sample in samples if sample.status == "200"]
+    return {
+        "requests": len(samples),
+        "statuses": statuses,
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "latency_ms": {
+            endpoint: distribution(
+                [sample.latency for sample in ok if sample.endpoint == endpoint]
+            )
+            for endpoint in ENDPOINTS
+        },
+        "ttft_ms": distribution(
+            [sample.ttft for sample in ok if sample.ttft is not None]
+        ),
+        "start_delay_ms": distribution([sample.start_delay for sample in samples]),
+    }
+
+
+def flatten(report: dict, prefix: str = "") -> dict[str, float]:
+    values = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def compare(report: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Print how each tracked metric changed; return the ones that regressed."""
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    print(f"{'metric':<36} {'baseline':>10} {'current':>10} {'change':>8}")
+    for path in sorted(current.keys() & previous.keys()):
+        if path.endswith(UNTRACKED):
+            continue
+        if path.startswith(LOWER_IS_BETTER):
+            worse = 1
+        elif path.startswith(HIGHER_IS_BETTER):
+            worse = -1
+        else:
+            continue
+        old, new = previous[path], current[path]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change * worse > max_regression:
+            regressions.append(path)
+            flag = "  REGRESSED"
+        print(f"{path:<36} {old:>10.1f} {new:>10.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+async def main(args: argparse.Namespace) -> int:
+    workload = load_workload(args.workload, args.stream_fraction, args.seed)
+    stub = StubServer(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    async with stub:
+        env = {
+            "LLM_PROVIDER": args.provider,
+            "ANTHROPIC_BASE_URL": stub.base_url,
+            "OPENAI_LLM_BASE_URL": f"{stub.base_url}/v1",
+            **dict(item.split("=", 1) for item in args.env),
+        }
+        async with running_app(env) as app:
+            async with httpx.AsyncClient(
+                base_url=app.base_url,
+                timeout=args.timeout,
+                limits=httpx.Limits(max_connections=None),
+            ) as client:
+                rss_start = app.rss()
+                cpu_start = app.cpu_seconds()
+                lag_before = await scrape_lag(client)
+                samples, elapsed = await run_load(
+                    client, workload, args.rps, args.duration, args.replay_exact
+                )
+                lag_after = await scrape_lag(client)
+                report = {
+                    "config": {
+                        key: str(value) if isinstance(value, Path) else value
+                        for key, value in vars(args).items()
+                        if key not in ("output", "baseline", "max_regression")
+                    },
+                    **build_report(samples, elapsed),
+                    "rss_mb": {
+                        "start": round(rss_start / 2**20, 1),
+                        "end": round(app.rss() / 2**20, 1),
+                        "peak": round(app.peak_rss() / 2**20, 1),
+                    },
+                    "cpu_seconds": round(app.cpu_seconds() - cpu_start, 2),
+                    "event_loop_lag_ms": lag_report(lag_before, lag_after),
+                    "stub": {
+                        "requests_served": stub.requests_served,
+                        "errors_injected": stub.errors_injected,
+                    },
+                }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        args.output.write_text(text + "\n")
+    print(text)
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressed by more than {args.max_regression:.0%}: {regressions}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workload", type=Path, default=DEFAULT_WORKLOAD)
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--stream-fraction", type=float, default=0.5)
+    parser.add_argument(
+        "--provider", choices=("anthropic", "openai"), default="anthropic"
+    )
+    parser.add_argument(
+        "--ttft", type=float, default=0.3, help="stub time to first token"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--output-tokens", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--replay-exact",
+        action="store_true",
+        help="send texts unchanged, so repeats may hit the cache",
+    )
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="extra app setting, e.g. --env REDIS_ENABLED=true",
+    )
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
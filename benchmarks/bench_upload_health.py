@@ -0,0 +1,89 @@
+"""
+Measure /health latency while large PDFs are uploaded concurrently.
+
+Runs the app twice, parsing inline on the event loop (PARSER_WORKERS=0) and in
+the worker pool, and reports /health latency percentiles for each.
+
+    python -m benchmarks.bench_upload_health --pages 400 --duration 10
+"""
+
+import argparse
+import asyncio
+import time
+
+import fitz
+import httpx
+
+from benchmarks.app_process import running_app
+from benchmarks.bench_clients import percentile
+from benchmarks.stub_server import StubServer
+
+
+def build_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        text = f"Page {number}. " + "The quick brown fox jumps over the lazy dog. " * 40
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text)
+    return doc.tobytes()
+
+
+async def run(base_url: str, pdf: bytes, uploaders: int, duration: float) -> dict:
+    health_latencies: list[float] = []
+    uploads = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+
+        async def upload_loop() -> None:
+            nonlocal uploads
+            while time.perf_counter() < deadline:
+                response = await client.post(
+                    "/upload/", files={"file": ("doc.pdf", pdf, "application/pdf")}
+                )
+                uploads += response.status_code == 200
+
+        async def health_loop() -> None:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(health_loop(), *(upload_loop() for _ in range(uploaders)))
+
+    return {
+        "uploads": uploads,
+        "p50": percentile(health_latencies, 50),
+        "p99": percentile(health_latencies, 99),
+        "max": max(health_latencies),
+    }
+
+
+async def main(pages: int, uploaders: int, duration: float, workers: int) -> None:
+    pdf = build_pdf(pages)
+    print(f"PDF: {pages} pages, {len(pdf) / 1024 / 1024:.1f} MB")
+    print(f"{'parsing':<10} {'uploads':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+
+    async with StubServer() as stub:
+        for label, parser_workers in (("inline", 0), ("pool", workers)):
+            env = {
+                "ANTHROPIC_BASE_URL": stub.base_url,
+                "PARSER_WORKERS": str(parser_workers),
+            }
+            async with running_app(env) as app:
+                result = await run(app.base_url, pdf, uploaders, duration)
+            print(
+                f"{label:<10} {result['uploads']:>8} {result['p50'] * 1000:>8.1f} "
+                f"{result['p99'] * 1000:>8.1f} {result['max'] * 1000:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--uploaders", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=2, help="pool size to compare")
+    args = parser.parse_args()
+    asyncio.run(main(args.pages, args.uploaders, args.duration, args.workers))
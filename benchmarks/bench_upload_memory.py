@@ -0,0 +1,67 @@
+"""
+Measure the app's peak RSS while large audio files are uploaded.
+
+Runs the app twice, once holding every upload in memory (spool threshold above
+the file size) and once spooling to temp files, and reports how far the peak
+RSS of the server process grew per concurrent upload. Linux only, since it
+reads VmHWM from /proc.
+
+    python -m benchmarks.bench_upload_memory --size-mb 20 --concurrency 4
+"""
+
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.app_process import running_app
+from benchmarks.stub_server import StubServer
+
+MB = 1024 * 1024
+
+
+async def upload(client: httpx.AsyncClient, audio: bytes) -> int:
+    response = await client.post(
+        "/transcribe/", files={"file": ("clip.wav", audio, "audio/wav")}
+    )
+    return response.status_code
+
+
+async def main(size_mb: int, concurrency: int) -> None:
+    audio = b"RIFF" + bytes(size_mb * MB - 4)
+    oversized = bytes(30 * MB)
+    print(f"Upload: {size_mb} MB x {concurrency} concurrent")
+    print(f"{'ingestion':<10} {'baseline MB':>12} {'peak MB':>8} {'MB/upload':>10}")
+
+    async with StubServer() as stub:
+        for label, threshold in (("memory", 64 * MB), ("spooled", MB)):
+            env = {
+                "ANTHROPIC_BASE_URL": stub.base_url,
+                "OPENAI_BASE_URL": f"{stub.base_url}/v1",
+                "UPLOAD_SPOOL_THRESHOLD": str(threshold),
+            }
+            async with running_app(env) as app:
+                async with httpx.AsyncClient(
+                    base_url=app.base_url, timeout=120
+                ) as client:
+                    # One small request first so lazily created clients exist
+                    await upload(client, b"RIFF" + bytes(1024))
+                    baseline = app.peak_rss()
+                    statuses = await asyncio.gather(
+                        *(upload(client, audio) for _ in range(concurrency))
+                    )
+                    assert all(status == 200 for status in statuses), statuses
+                    peak = app.peak_rss()
+                    assert await upload(client, oversized) == 413
+            print(
+                f"{label:<10} {baseline / MB:>12.1f} {peak / MB:>8.1f} "
+                f"{(peak - baseline) / concurrency / MB:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb, args.concurrency))
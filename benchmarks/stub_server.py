@@ -0,0 +1,333 @@
+"""
+Minimal local stand-in for the provider APIs the app talks to.
+
+It speaks just enough HTTP/1.1 (with keep-alive) for the Anthropic messages
+API and the OpenAI chat completions and audio APIs, adds configurable latency,
+and counts the TCP connections clients open, which is what the connection
+pooling benchmarks care about.
+Messages requests are kept in `message_requests`, and prompt prefixes marked
+with cache_control are remembered so usage reports cache reads and writes
+the way the real API does (with tokens estimated as 4 characters each).
+
+For load tests, summaries can also model generation: `ttft` seconds before
+the first token, then `output_tokens` tokens at `tokens_per_second`, streamed
+as server-sent events when the request asks for a stream. `error_rate` is
+the fraction of summary requests answered with an overloaded error instead.
+"""
+
+import asyncio
+import json
+import random
+from typing import AsyncIterator, Optional
+
+STUB_TEXT = "This is a stub summary."
+STUB_TRANSCRIPT = (
+    "This is a stub transcript of an audio recording. It is long enough to be "
+    "summarized by the app without tripping the minimum text length check."
+)
+STUB_AUDIO = b"ID3" + bytes(1024)
+
+Payload = bytes | AsyncIterator[bytes]
+
+
+def stub_tokens(count: Optional[int]) -> list[str]:
+    """The summary's tokens: STUB_TEXT word by word, repeated to `count` tokens."""
+    words = STUB_TEXT.split(" ")
+    if count is not None:
+        words = [words[i % len(words)] for i in range(count)]
+    return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+
+def sse(data: dict, event: Optional[str] = None) -> bytes:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n".encode()
+
+
+class StubServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        ttft: float = 0.0,
+        tokens_per_second: float = 0.0,
+        output_tokens: Optional[int] = None,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second  # 0: no delay between tokens
+        self.tokens = stub_tokens(output_tokens)
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.connections_opened = 0
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.message_requests: list[dict] = []
+        self._cached_prefixes: set[str] = set()
+        self._server: asyncio.AbstractServer | None = None
+        self._handlers: set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for task in self._handlers:
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> "StubServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    def reset_counters(self) -> None:
+        self.connections_opened = 0
+        self.requests_served = 0
+        self.errors_injected = 0
+        self.message_requests.clear()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.connections_opened += 1
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, content_type, payload = await self.respond(method, path, body)
+                self.requests_served += 1
+                head = f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                if isinstance(payload, bytes):
+                    writer.write(
+                        f"{head}Content-Length: {len(payload)}\r\n"
+                        "Connection: keep-alive\r\n\r\n".encode("latin-1") + payload
+                    )
+                else:
+                    writer.write(
+                        f"{head}Transfer-Encoding: chunked\r\n"
+                        "Connection: keep-alive\r\n\r\n".encode("latin-1")
+                    )
+                    async for chunk in payload:
+                        writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                        await writer.drain()
+                    writer.write(b"0\r\n\r\n")
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def respond(
+        self, method: str, path: str, body: bytes
+    ) -> tuple[str, str, Payload]:
+        """Return (status line, content type, body or body chunks) for a request."""
+        if method == "HEAD":
+            return "200 OK", "text/plain", b""
+
+        await asyncio.sleep(self.latency)
+        if method == "POST" and path.endswith("/v1/messages"):
+            request = json.loads(body or b"{}")
+            self.message_requests.append(request)
+            if self._inject_error():
+                error = {
+                    "type": "error",
+                    "error": {"type": "overloaded_error", "message": "Overloaded"},
+                }
+                return "529 Overloaded", "application/json", json.dumps(error).encode()
+            usage = self._input_usage(request)
+            if request.get("stream"):
+                return (
+                    "200 OK",
+                    "text/event-stream",
+                    self._message_events(request, usage),
+                )
+            await self._generate()
+            message = {
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "model": request.get("model", "stub"),
+                "content": [{"type": "text", "text": "".join(self.tokens)}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": {**usage, "output_tokens": len(self.tokens) + 1},
+            }
+            return "200 OK", "application/json", json.dumps(message).encode()
+
+        if method == "POST" and path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            if self._inject_error():
+                error = {"error": {"type": "server_error", "message": "Overloaded"}}
+                return (
+                    "503 Service Unavailable",
+                    "application/json",
+                    json.dumps(error).encode(),
+                )
+            usage = {
+                "prompt_tokens": len(body) // 4,
+                "completion_tokens": len(self.tokens) + 1,
+                "total_tokens": len(body) // 4 + len(self.tokens) + 1,
+            }
+            if request.get("stream"):
+                return "200 OK", "text/event-stream", self._chunk_events(request, usage)
+            await self._generate()
+            completion = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": request.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": "".join(self.tokens),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+            return "200 OK", "application/json", json.dumps(completion).encode()
+
+        if method == "POST" and path.endswith("/audio/transcriptions"):
+            return (
+                "200 OK",
+                "application/json",
+                json.dumps({"text": STUB_TRANSCRIPT}).encode(),
+            )
+
+        if method == "POST" and path.endswith("/audio/speech"):
+            return "200 OK", "audio/mpeg", STUB_AUDIO
+
+        return "404 Not Found", "application/json", b'{"error": "not found"}'
+
+    def _inject_error(self) -> bool:
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors_injected += 1
+            return True
+        return False
+
+    async def _generate(self) -> None:
+        """Wait as long as generating the whole summary takes."""
+        delay = self.ttft
+        if self.tokens_per_second:
+            delay += (len(self.tokens) - 1) / self.tokens_per_second
+        await asyncio.sleep(delay)
+
+    async def _timed_tokens(self) -> AsyncIterator[str]:
+        await asyncio.sleep(self.ttft)
+        for i, token in enumerate(self.tokens):
+            if i and self.tokens_per_second:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield token
+
+    async def _message_events(self, request: dict, usage: dict) -> AsyncIterator[bytes]:
+        """An Anthropic messages stream."""
+        message = {
+            "id": "msg_stub",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "stub"),
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {**usage, "output_tokens": 1},
+        }
+        yield sse({"type": "message_start", "message": message}, "message_start")
+        yield sse(
+            {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            },
+            "content_block_start",
+        )
+        async for token in self._timed_tokens():
+            yield sse(
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": token},
+                },
+                "content_block_delta",
+            )
+        yield sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+        yield sse(
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": len(self.tokens) + 1},
+            },
+            "message_delta",
+        )
+        yield sse({"type": "message_stop"}, "message_stop")
+
+    async def _chunk_events(self, request: dict, usage: dict) -> AsyncIterator[bytes]:
+        """An OpenAI chat completions stream, ending with a usage chunk."""
+        chunk = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": request.get("model", "stub"),
+        }
+        async for token in self._timed_tokens():
+            delta = {"index": 0, "delta": {"content": token}, "finish_reason": None}
+            yield sse({**chunk, "choices": [delta]})
+        yield sse(
+            {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        )
+        yield sse({**chunk, "choices": [], "usage": usage})
+        yield b"data: [DONE]\n\n"
+
+    def _input_usage(self, request: dict) -> dict:
+        """Split a request's input tokens into uncached, cache read and cache write."""
+        blocks = [request.get("system", "")]
+        for message in request.get("messages", []):
+            content = message["content"]
+            blocks.extend([content] if isinstance(content, str) else content)
+        total_tokens = len(json.dumps(blocks)) // 4
+        marked = [
+            i
+            for i, block in enumerate(blocks)
+            if isinstance(block, dict) and "cache_control" in block
+        ]
+        if not marked:
+            return {"input_tokens": total_tokens}
+
+        prefix = json.dumps([request.get("model"), blocks[: marked[-1] + 1]])
+        prefix_tokens = min(len(prefix) // 4, total_tokens)
+        usage = {"input_tokens": total_tokens - prefix_tokens}
+        if prefix in self._cached_prefixes:
+            usage["cache_read_input_tokens"] = prefix_tokens
+        else:
+            self._cached_prefixes.add(prefix)
+            usage["cache_creation_input_tokens"] = prefix_tokens
+        return usage
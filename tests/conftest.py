@@ -0,0 +1,11 @@
+import pytest
+
+from app.core.config import get_settings
+
+
+@pytest.fixture(autouse=True)
+def jobs_in_tmp_path(tmp_path, monkeypatch):
+    """Keep the job store and inputs of any job runner a test builds out of the repo."""
+    settings = get_settings()
+    monkeypatch.setattr(settings, "jobs_sqlite_path", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(settings, "jobs_dir", str(tmp_path / "jobs"))
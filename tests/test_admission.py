@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.clients.llm import AdmittedLLMClient, get_llm_client
+from app.core.admission import (AdmissionController, AdmissionRejectedError,
+                                AIMDLimit, Priority, llm_priority)
+from app.core.rate_limit import TokenBucket
+from app.main import app
+from tests.test_router import FakeProvider, FakeStatusError
+
+
+def make_controller(
+    limit: int = 1,
+    bucket: TokenBucket | None = None,
+    max_queued: int = 10,
+    max_queue_wait: float = 5.0,
+) -> AdmissionController:
+    return AdmissionController(
+        limit=AIMDLimit(initial=limit, minimum=1, maximum=8, latency_target=1.0),
+        bucket=bucket,
+        max_queued=max_queued,
+        max_queue_wait=max_queue_wait,
+    )
+
+
+async def hold(controller: AdmissionController, release: asyncio.Event) -> None:
+    async with controller.admit(1):
+        await release.wait()
+
+
+async def queued(
+    controller: AdmissionController, priority: Priority, order: list[str], name: str
+) -> None:
+    llm_priority.set(priority)
+    async with controller.admit(1):
+        order.append(name)
+
+
+def test_aimd_limit_grows_on_fast_calls_and_shrinks_on_slow_or_429():
+    limit = AIMDLimit(initial=4, minimum=2, maximum=6, latency_target=1.0)
+    for _ in range(8):
+        limit.on_success(0.1)
+    assert limit.current == 5
+    before = limit.limit
+    limit.on_success(5.0)
+    assert limit.limit == pytest.approx(before * 0.9)
+    limit.on_rate_limited()
+    assert limit.current == 2
+    limit.on_rate_limited()
+    assert limit.current == 2  # never below the minimum
+
+
+async def test_interactive_calls_are_admitted_before_batch_calls():
+    controller = make_controller(limit=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    order: list[str] = []
+    waiters = [
+        asyncio.create_task(queued(controller, Priority.BATCH, order, "batch-1")),
+        asyncio.create_task(queued(controller, Priority.BATCH, order, "batch-2")),
+        asyncio.create_task(queued(controller, Priority.INTERACTIVE, order, "user")),
+    ]
+    await asyncio.sleep(0)
+    assert controller.stats()["queued"] == 3
+
+    release.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["user", "batch-1", "batch-2"]
+    assert controller.in_flight == 0
+
+
+async def test_full_queue_rejects_and_displaces_lower_priority_work():
+    controller = make_controller(limit=1, max_queued=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    order: list[str] = []
+    batch = asyncio.create_task(queued(controller, Priority.BATCH, order, "batch"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await queued(controller, Priority.BATCH, order, "batch-2")
+    assert rejected.value.retry_after >= 1
+
+    user = asyncio.create_task(queued(controller, Priority.INTERACTIVE, order, "user"))
+    with pytest.raises(AdmissionRejectedError, match="Displaced"):
+        await batch
+    release.set()
+    await asyncio.gather(holder, user)
+    assert order == ["user"]
+    assert controller.stats()["rejected"] == 2
+    assert controller.in_flight == 0
+
+
+async def test_waiting_too_long_is_rejected():
+    controller = make_controller(limit=1, max_queue_wait=0.05)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejectedError, match="Timed out"):
+        async with controller.admit(1):
+            pass
+    release.set()
+    await holder
+    assert controller.in_flight == 0 and controller.stats()["queued"] == 0
+
+
+async def test_call_admitted_as_its_wait_times_out_frees_its_slot(monkeypatch):
+    controller = make_controller(limit=1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    async def admitted_as_it_times_out(future, timeout):
+        release.set()
+        await holder  # frees the slot, which is handed to the waiter
+        assert future.done()
+        raise TimeoutError
+
+    monkeypatch.setattr(asyncio, "wait_for", admitted_as_it_times_out)
+    with pytest.raises(AdmissionRejectedError):
+        async with controller.admit(1):
+            pass
+    monkeypatch.undo()
+    assert controller.in_flight == 0
+    async with controller.admit(1):
+        assert controller.in_flight == 1
+
+
+async def test_calls_wait_for_tokens_in_the_bucket():
+    controller = make_controller(limit=8, bucket=TokenBucket(rate=1000, capacity=100))
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(2):
+        async with controller.admit(100):
+            pass
+    # The second call waited for the bucket to refill 100 tokens
+    assert loop.time() - start >= 0.08
+
+
+async def test_rate_limited_calls_shrink_the_limit():
+    controller = make_controller(limit=4)
+    llm = AdmittedLLMClient(FakeProvider("slow", failures=[429]), controller)
+    with pytest.raises(FakeStatusError):
+        await llm.complete("System.", "Summarize.", 64)
+    assert controller.limit.current == 2
+    assert await llm.complete("System.", "Summarize.", 64) == "Summary from slow."
+    assert controller.in_flight == 0
+
+
+async def test_stream_holds_its_slot_until_it_ends():
+    controller = make_controller(limit=1)
+    llm = AdmittedLLMClient(FakeProvider("fast"), controller)
+    chunks = llm.stream("System.", "Summarize.", 64)
+    await anext(chunks)
+    assert controller.in_flight == 1
+    await chunks.aclose()
+    assert controller.in_flight == 0
+
+
+def test_overloaded_stream_route_answers_503_with_retry_after():
+    controller = make_controller(limit=1, max_queued=0)
+    controller.in_flight = 1  # the only slot is taken and nothing may queue
+    previous = app.dependency_overrides.get(get_llm_client)
+    app.dependency_overrides[get_llm_client] = lambda: AdmittedLLMClient(
+        FakeProvider("fast"), controller
+    )
+    try:
+        response = TestClient(app).post(
+            "/summarize/stream",
+            json={"text": "A long enough text to summarize. " * 3},
+        )
+    finally:
+        if previous is None:
+            app.dependency_overrides.pop(get_llm_client)
+        else:
+            app.dependency_overrides[get_llm_client] = previous
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from io import BytesIO
+
+import httpx
+import pytest
+
+from app.clients.llm import get_llm_client
+from app.core.config import get_settings
+from app.dependencies import get_audio_service
+from app.main import app
+from app.services.audio import AudioService
+from app.services.cache import CacheService
+from benchmarks.stub_server import STUB_AUDIO, STUB_TRANSCRIPT, StubServer
+from tests.test_cache import FakeRedis
+from tests.test_summarizer import MockLLMClient
+
+LATENCY = 0.2
+
+
+@pytest.fixture
+async def stub_openai(monkeypatch):
+    """A local fake OpenAI server that the AudioService is pointed at."""
+    async with StubServer(latency=LATENCY) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", f"{server.base_url}/v1")
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        get_settings.cache_clear()
+        yield server
+    get_settings.cache_clear()
+
+
+async def test_transcribe_and_tts_against_fake_server(stub_openai):
+    service = AudioService()
+    try:
+        assert await service.transcribe(b"RIFF", "clip.wav") == STUB_TRANSCRIPT
+        assert await service.text_to_speech("Hello there.") == STUB_AUDIO
+    finally:
+        await service.aclose()
+
+
+async def test_transcripts_are_cached_by_audio_content(stub_openai):
+    service = AudioService(cache=CacheService(redis_client=FakeRedis()))
+    try:
+        for filename in ("clip.wav", "retry.wav"):
+            assert await service.transcribe(b"RIFF-one", filename) == STUB_TRANSCRIPT
+        assert stub_openai.requests_served == 1
+
+        await service.transcribe(BytesIO(b"RIFF-two"), "other.wav")
+        assert stub_openai.requests_served == 2
+        service.whisper_model = "whisper-2"
+        await service.transcribe(b"RIFF-one", "clip.wav")
+        assert stub_openai.requests_served == 3
+    finally:
+        await service.aclose()
+
+
+async def test_concurrent_transcriptions_overlap(stub_openai):
+    service = AudioService()
+    start = time.perf_counter()
+    await asyncio.gather(*(service.transcribe(b"RIFF", "clip.wav") for _ in range(4)))
+    elapsed = time.perf_counter() - start
+    await service.aclose()
+    assert elapsed < 2 * LATENCY
+
+
+async def test_audio_concurrency_limit(stub_openai, monkeypatch):
+    monkeypatch.setenv("AUDIO_CONCURRENCY", "1")
+    get_settings.cache_clear()
+    service = AudioService()
+    start = time.perf_counter()
+    await asyncio.gather(*(service.transcribe(b"RIFF", "clip.wav") for _ in range(3)))
+    elapsed = time.perf_counter() - start
+    await service.aclose()
+    assert elapsed >= 3 * LATENCY
+
+
+async def test_transcribe_route_requests_overlap(stub_openai):
+    service = AudioService()
+    app.dependency_overrides[get_audio_service] = lambda: service
+    app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://app"
+        ) as client:
+            start = time.perf_counter()
+            responses = await asyncio.gather(
+                *(
+                    client.post(
+                        "/transcribe/",
+                        files={"file": (f"clip{i}.wav", b"RIFF", "audio/wav")},
+                    )
+                    for i in range(4)
+                )
+            )
+            elapsed = time.perf_counter() - start
+    finally:
+        del app.dependency_overrides[get_audio_service]
+        await service.aclose()
+
+    assert all(response.status_code == 200 for response in responses)
+    assert elapsed < 2 * LATENCY
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+from app.clients.llm import get_llm_client
+from app.core.rate_limit import TokenBucket
+from app.main import app
+from app.services.batch import BatchRunner, iter_json_array
+from app.services.summarizer import SummarizerService
+from tests.test_summarizer import (PROMPT, MockCacheService, MockLLMClient,
+                                   SlowCountingLLMClient)
+
+client = TestClient(app)
+app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
+
+
+class ConcurrencyTrackingLLMClient(SlowCountingLLMClient):
+    """Mock client that records the peak number of concurrent calls."""
+
+    def __init__(self, delay: float = 0.01):
+        super().__init__(delay)
+        self.active = 0
+        self.peak = 0
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await super().complete(
+                system_prompt, user_prompt, max_tokens, cache_prefix
+            )
+        finally:
+            self.active -= 1
+
+
+def test_batch_jsonl_streams_ndjson_results():
+    """Test that JSONL input yields one NDJSON result per item, including errors."""
+    lines = [
+        json.dumps({"id": "a", "text": PROMPT, "style": "paragraph"}),
+        json.dumps({"id": "b", "text": "too short"}),
+        "not json",
+    ]
+    response = client.post(
+        "/summarize/batch",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = {r["index"]: r for r in map(json.loads, response.text.splitlines())}
+    assert results[0]["id"] == "a" and results[0]["result"]["summary"]
+    assert results[1]["id"] == "b" and "error" in results[1]
+    assert "error" in results[2]
+
+
+def test_batch_accepts_json_array():
+    """Test that a JSON array body is accepted."""
+    response = client.post(
+        "/summarize/batch", json=[{"text": PROMPT}, {"text": PROMPT, "style": "tldr"}]
+    )
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 2
+
+
+def test_batch_rejects_non_array_json():
+    """Test that a JSON body that is not an array returns 400."""
+    response = client.post("/summarize/batch", json={"text": PROMPT})
+    assert response.status_code == 400
+
+
+async def test_batch_runner_bounds_concurrency():
+    """Test that no more than `concurrency` items are in flight at once."""
+    llm = ConcurrencyTrackingLLMClient()
+    service = SummarizerService(llm=llm, cache=MockCacheService())
+    runner = BatchRunner(
+        summarizer=service,
+        concurrency=3,
+        rate_limiter=TokenBucket(rate=1000, capacity=1000),
+    )
+    items = [{"text": f"{PROMPT} Item {i}."} for i in range(20)]
+    results = [result async for result in runner.run(iter_json_array(items))]
+
+    assert sorted(result.index for result in results) == list(range(20))
+    assert llm.calls == 20 and llm.peak == 3
+
+
+async def test_token_bucket_limits_rate():
+    """Test that acquiring past the burst waits for tokens to refill."""
+    bucket = TokenBucket(rate=100, capacity=5)
+    start = time.perf_counter()
+    await asyncio.gather(*(bucket.acquire() for _ in range(10)))
+    assert time.perf_counter() - start >= 0.04
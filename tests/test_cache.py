@@ -0,0 +1,231 @@
+import asyncio
+import gc
+import json
+import time
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import get_settings
+from app.models.requests import SummarizeRequest
+from app.prompts.loader import prompt_version
+from app.services.cache import CacheService, LocalCache
+from app.services.cache_format import FLAG_ZLIB, encode_value
+from app.services.summarizer import SummarizerService
+from tests.test_summarizer import MAX_LENGTH, PROMPT, SlowCountingLLMClient
+
+
+class FakeRedis:
+    """In-memory async Redis stand-in that adds latency to every call."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.store: dict[str, str] = {}
+        self.published: list[tuple[str, str]] = []
+        self.calls = 0
+
+    async def get(self, name: str):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self.store.get(name)
+
+    async def set(
+        self,
+        name: str,
+        value: str,
+        ex: int | None = None,
+        px: int | None = None,
+        nx: bool = False,
+    ):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if nx and name in self.store:
+            return None
+        self.store[name] = value
+        return True
+
+    async def exists(self, name: str):
+        return int(name in self.store)
+
+    async def eval(self, script: str, numkeys: int, key: str, token: str):
+        if self.store.get(key) == token:
+            del self.store[key]
+
+    async def publish(self, channel: str, message: str):
+        self.published.append((channel, message))
+
+
+async def test_cache_round_trip():
+    """Test that a stored summary is returned by a later get."""
+    cache = CacheService(redis_client=FakeRedis())
+    await cache.set(PROMPT, "paragraph", MAX_LENGTH, {"summary": "cached"})
+    assert await cache.get(PROMPT, "paragraph", MAX_LENGTH) == {"summary": "cached"}
+    assert await cache.get(PROMPT, "bullet", MAX_LENGTH) is None
+
+
+async def test_set_publishes_invalidation():
+    """Test that writes announce the key so other workers drop their L1 copy."""
+    fake = FakeRedis()
+    cache = CacheService(redis_client=fake)
+    await cache.set(PROMPT, "paragraph", MAX_LENGTH, {"summary": "cached"})
+    key = cache.generate_cache_key(PROMPT, "paragraph", MAX_LENGTH)
+    assert fake.published == [
+        (cache.invalidation_channel, f"{cache.instance_id}:{key}")
+    ]
+
+
+async def test_slow_redis_does_not_block_event_loop():
+    """Test that concurrent lookups against a slow Redis overlap and keep the loop responsive."""
+    cache = CacheService(redis_client=FakeRedis(latency=0.1))
+    cache.timeout = 1.0
+    max_lag = 0.0
+
+    async def ticker():
+        nonlocal max_lag
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - start - 0.01)
+
+    # A full collection of the test process heap can itself stall the loop.
+    gc.disable()
+    try:
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(cache.get(f"{PROMPT} {i}", "paragraph", MAX_LENGTH) for i in range(50))
+        )
+        elapsed = time.perf_counter() - start
+        tick.cancel()
+    finally:
+        gc.enable()
+
+    assert elapsed < 1.0
+    assert max_lag < 0.05
+
+
+async def test_timeout_opens_circuit_breaker():
+    """Test that timed-out calls count as misses and trip the breaker."""
+    fake = FakeRedis(latency=0.5)
+    cache = CacheService(redis_client=fake)
+    cache.timeout = 0.01
+    cache.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+    for _ in range(2):
+        assert await cache.get(PROMPT, "paragraph", MAX_LENGTH) is None
+    assert cache.breaker.state == CircuitBreaker.OPEN
+
+    await cache.get(PROMPT, "paragraph", MAX_LENGTH)
+    assert fake.calls == 2
+
+
+def test_circuit_breaker_half_open_probe():
+    """Test that an open breaker lets one probe through after the reset timeout."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_cancelled_half_open_probe_reopens_breaker():
+    """Test that a probe cancelled mid-lookup re-opens the breaker instead of wedging it."""
+    fake = FakeRedis(latency=0.5)
+    cache = CacheService(redis_client=fake)
+    cache.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    cache.breaker.record_failure()
+
+    probe = asyncio.create_task(cache.get(PROMPT, "paragraph", MAX_LENGTH))
+    await asyncio.sleep(0.01)
+    assert cache.breaker.state == CircuitBreaker.HALF_OPEN
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+
+    assert cache.breaker.state == CircuitBreaker.OPEN
+    assert cache.breaker.allow()
+
+
+async def test_local_tier_serves_repeat_hits():
+    """Test that repeat lookups are answered by L1 without touching Redis."""
+    fake = FakeRedis()
+    cache = CacheService(redis_client=fake)
+    fake.store[cache.generate_cache_key(PROMPT, "tldr", MAX_LENGTH)] = encode_value(
+        {"summary": "hot"}, compress_min_bytes=1024
+    )
+
+    for _ in range(3):
+        assert await cache.get(PROMPT, "tldr", MAX_LENGTH) == {"summary": "hot"}
+
+    stats = cache.stats()
+    assert fake.calls == 1
+    assert stats["l2"]["hits"] == 1 and stats["l1"]["hits"] == 2
+
+
+def test_local_cache_evicts_by_entries_and_bytes():
+    """Test LRU eviction against both the entry and byte budgets."""
+    local = LocalCache(max_entries=2, max_bytes=100, ttl=60)
+    local.set("a", {"v": 1}, size=10)
+    local.set("b", {"v": 2}, size=10)
+    local.get("a")
+    local.set("c", {"v": 3}, size=10)
+    assert local.get("b") is None and local.get("a") is not None
+
+    local.set("big", {"v": 4}, size=95)
+    assert len(local) == 1 and local.bytes == 95
+    assert local.stats.evictions == 3
+
+
+def test_local_cache_expires_entries():
+    """Test that entries past their TTL count as misses."""
+    local = LocalCache(max_entries=10, max_bytes=100, ttl=0)
+    local.set("a", {"v": 1}, size=10)
+    assert local.get("a") is None and local.bytes == 0
+
+
+async def test_distributed_single_flight_across_workers():
+    """Test that a second worker waits on the first worker's cached result."""
+    fake = FakeRedis()
+    llm = SlowCountingLLMClient(delay=0.1)
+    workers = [
+        SummarizerService(llm=llm, cache=CacheService(redis_client=fake))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.distributed = True
+        worker.poll_interval = 0.01
+
+    request = SummarizeRequest(text=PROMPT, max_length=MAX_LENGTH, style="bullet")
+    summaries = await asyncio.gather(*(worker.summarize(request) for worker in workers))
+
+    assert llm.calls == 1
+    assert summaries[0].summary == summaries[1].summary
+    assert not any(key.startswith("lock:") for key in fake.store)
+
+
+async def test_extraction_round_trip_is_compressed():
+    """Test that large extracted documents are stored compressed and read back."""
+    fake = FakeRedis()
+    cache = CacheService(redis_client=fake)
+    sections = [f"Page {i}. " + "The same boilerplate text. " * 50 for i in range(20)]
+
+    await cache.set_extraction("v1:abc", sections)
+    payload = fake.store[f"{cache.namespace}:extract:v1:abc"]
+    assert payload[1] & FLAG_ZLIB
+    assert len(payload) < len(json.dumps(sections)) // 4
+    assert await cache.get_extraction("v1:abc") == sections
+    assert await cache.get_extraction("v2:abc") is None
+
+
+async def test_entries_in_an_old_format_are_misses():
+    """Test that JSON values written by earlier versions are ignored."""
+    fake = FakeRedis()
+    cache = CacheService(redis_client=fake)
+    key = cache.generate_cache_key(PROMPT, "paragraph", MAX_LENGTH)
+    fake.store[key] = b'{"summary": "old"}'
+    assert await cache.get(PROMPT, "paragraph", MAX_LENGTH) is None
+    assert cache.stats_l2.misses == 1
+
+
+def test_cache_key_carries_namespace_model_and_prompt_version():
+    cache = CacheService(redis_client=FakeRedis())
+    key = cache.generate_cache_key(PROMPT, "paragraph", MAX_LENGTH)
+    prefix = f"{cache.namespace}:summary:{get_settings().model}"
+    assert key.startswith(f"{prefix}:{prompt_version('paragraph')}:")
@@ -0,0 +1,39 @@
+import pytest
+
+from app.services.cache_format import (FLAG_ZLIB, FORMAT_VERSION,
+                                       CacheFormatError, decode_value,
+                                       encode_value, hash_parts)
+
+SUMMARY = {"summary": "A short summary.", "style": "bullet", "summary_length": 3}
+
+
+def test_round_trip_small_value_is_uncompressed():
+    data = encode_value(SUMMARY, compress_min_bytes=1024)
+    assert data[0] == FORMAT_VERSION and not data[1] & FLAG_ZLIB
+    assert decode_value(data) == SUMMARY
+
+
+def test_large_value_is_compressed():
+    value = {"summary": "Repeated words. " * 500}
+    data = encode_value(value, compress_min_bytes=1024)
+    assert data[1] & FLAG_ZLIB and len(data) < 1024
+    assert decode_value(data) == value
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(CacheFormatError):
+        decode_value(b'{"summary": "stored as JSON"}')
+    with pytest.raises(CacheFormatError):
+        decode_value(bytes((FORMAT_VERSION, FLAG_ZLIB)) + b"not zlib")
+
+
+def test_hash_parts_is_unambiguous():
+    assert hash_parts(["a:b", "c"]) != hash_parts(["a", "b:c"])
+    assert hash_parts(["text", 200]) != hash_parts(["text", "200"])
+    assert hash_parts(["text", 200]) == hash_parts(["text", 200])
+
+
+def test_hash_parts_streams_long_text_and_depends_on_secret():
+    text = "é" * 200_000
+    assert hash_parts([text]) != hash_parts([text[:-1] + "e"])
+    assert hash_parts([text], secret=b"one") != hash_parts([text], secret=b"two")
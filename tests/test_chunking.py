@@ -0,0 +1,37 @@
+from app.services.chunking import CHARS_PER_TOKEN, split_text
+
+PARAGRAPHS = [
+    f"Paragraph {i} talks about topic {i % 7} with some detail. " * 6
+    for i in range(200)
+]
+DOCUMENT = "\n\n".join(PARAGRAPHS)
+
+
+def test_chunks_respect_budget_and_rejoin():
+    """Test that chunks fit the budget and concatenate back to the original."""
+    chunks = split_text(DOCUMENT, max_tokens=500)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 * CHARS_PER_TOKEN for chunk in chunks)
+    assert "".join(chunks) == DOCUMENT
+
+
+def test_short_text_is_a_single_chunk():
+    """Test that text under the budget is not split."""
+    assert split_text("A short text.", max_tokens=500) == ["A short text."]
+
+
+def test_oversized_paragraph_is_split_on_finer_boundaries():
+    """Test that a paragraph over the budget is split on sentences."""
+    paragraph = "One sentence here. " * 500
+    chunks = split_text(paragraph, max_tokens=100)
+    assert all(len(chunk) <= 100 * CHARS_PER_TOKEN for chunk in chunks)
+    assert all(chunk.endswith(". ") for chunk in chunks[:-1])
+
+
+def test_edit_only_changes_nearby_chunks():
+    """Test that editing one paragraph leaves most chunks unchanged."""
+    edited = PARAGRAPHS.copy()
+    edited[100] = "This paragraph was rewritten. " * 3
+    before = split_text(DOCUMENT, max_tokens=500)
+    after = split_text("\n\n".join(edited), max_tokens=500)
+    assert len(set(after) - set(before)) <= 2
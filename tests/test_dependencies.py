@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+from app.clients.llm import get_llm_client
+from app.dependencies import (POOLED_CLIENTS, get_audio_service,
+                              get_cache_service, get_job_runner)
+from app.main import app
+from tests.test_summarizer import MockLLMClient
+
+app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
+
+
+def test_pooled_clients_are_reused():
+    """Test that pooled clients are built once rather than per request."""
+    assert get_cache_service() is get_cache_service()
+    assert get_audio_service() is get_audio_service()
+
+
+def test_lifespan_closes_pooled_clients():
+    """Test that shutdown closes and forgets every pooled client."""
+    with TestClient(app) as client:
+        cache = get_cache_service()
+        assert client.get("/health").status_code == 200
+        assert get_cache_service() is cache
+        # Jobs are set up by the first job request, not at startup
+        assert get_job_runner.cache_info().currsize == 0
+
+    assert all(provider.cache_info().currsize == 0 for provider in POOLED_CLIENTS)
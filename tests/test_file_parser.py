@@ -1,3 +1,4 @@
+import fitz
 import pytest
 
 from app.services.file_parser import FileParser
@@ -33,3 +34,36 @@ def test_parse_case_insensitive_extension():
     parser = FileParser()
     result = parser.parse_file(SAMPLE_TXT, "test.TXT")
     assert isinstance(result, str)
+
+
+def test_parse_pdf_from_path(tmp_path):
+    """Test that spooled files are parsed from their path."""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Hello from a spooled PDF.")
+    path = tmp_path / "upload.pdf"
+    doc.save(path)
+
+    result = FileParser().parse_file(path, "report.pdf")
+    assert "Hello from a spooled PDF." in result
+
+
+def test_parse_empty_path(tmp_path):
+    """Test that empty spooled files raise ValueError."""
+    path = tmp_path / "upload"
+    path.write_bytes(b"")
+    with pytest.raises(ValueError, match="empty"):
+        FileParser().parse_file(path, "empty.txt")
+
+
+def test_iter_pdf_yields_pages_from_start():
+    """Test that PDFs are extracted page by page and can be resumed."""
+    doc = fitz.open()
+    for number in range(3):
+        doc.new_page().insert_text((72, 72), f"Page number {number}.")
+    content = doc.tobytes()
+
+    parser = FileParser()
+    pages = list(parser.iter_file(content, "report.pdf"))
+    assert len(pages) == 3 and "Page number 0." in pages[0]
+    assert list(parser.iter_file(content, "report.pdf", start=2)) == pages[2:]
+    assert parser.parse_file(content, "report.pdf") == "\n".join(pages)
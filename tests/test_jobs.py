@@ -0,0 +1,324 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import suppress
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_job_runner
+from app.main import app
+from app.models.jobs import Job
+from app.models.responses import SummaryResponse
+from app.services.job_store import RedisJobStore, SQLiteJobStore
+from app.services.jobs import JobRunner
+from app.services.parse_pool import ParserOverloadedError
+from app.services.spool import UploadSpool
+from tests.test_summarizer import PROMPT
+
+
+class FakeJobRedis:
+    """In-memory async Redis stand-in with the commands the job store uses."""
+
+    def __init__(self):
+        self.store: dict[str, tuple[object, float]] = {}  # value, expiry (0: none)
+
+    def _live(self, name: str):
+        value, expires = self.store.get(name, (None, 0))
+        if expires and expires < time.monotonic():
+            del self.store[name]
+            return None
+        return value
+
+    async def get(self, name: str):
+        return self._live(name)
+
+    async def set(self, name, value, ex=None, px=None, nx=False):
+        if nx and self._live(name) is not None:
+            return None
+        ttl = ex if ex is not None else (px / 1000 if px is not None else 0)
+        self.store[name] = (value, time.monotonic() + ttl if ttl else 0)
+        return True
+
+    async def delete(self, name):
+        self.store.pop(name, None)
+
+    async def pexpire(self, name, ms):
+        if self._live(name) is not None:
+            self.store[name] = (self.store[name][0], time.monotonic() + ms / 1000)
+
+    async def sadd(self, name, member):
+        self.store.setdefault(name, (set(), 0))[0].add(member)
+
+    async def srem(self, name, member):
+        self.store.get(name, (set(), 0))[0].discard(member)
+
+    async def smembers(self, name):
+        return set(self.store.get(name, (set(), 0))[0])
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobStore(tmp_path / "jobs.sqlite3", ttl=3600)
+    return RedisJobStore(FakeJobRedis(), namespace="test", ttl=3600)
+
+
+def make_job(job_id: str = "job-1") -> Job:
+    return Job(id=job_id, kind="upload", filename="notes.txt", input_sha256="abc")
+
+
+def make_spool(content: bytes) -> UploadSpool:
+    spool = UploadSpool(threshold=1024)
+    spool._chunks = [content]
+    spool._hash.update(content)
+    spool.size = len(content)
+    return spool
+
+
+class FakePipeline:
+    """Stands in for the upload pipeline; `block` holds jobs until set."""
+
+    def __init__(self, failures: list[Exception] = ()):
+        self.failures = list(failures)
+        self.calls = 0
+        self.block = asyncio.Event()
+        self.block.set()
+        self.started = asyncio.Event()
+
+    async def __call__(self, job, spool, progress) -> SummaryResponse:
+        self.calls += 1
+        self.started.set()
+        await progress.stage("parsing")
+        await progress.section_parsed()
+        await self.block.wait()
+        if self.failures:
+            raise self.failures.pop(0)
+        with spool.open() as f:
+            text = f.read().decode()
+        return SummaryResponse(
+            summary=f"Summary of {text}",
+            style=job.style,
+            model="test-model",
+            prompt_length=len(text.split()),
+            summary_length=3,
+        )
+
+
+def make_runner(store, tmp_path, pipeline, lease: float = 5.0) -> JobRunner:
+    return JobRunner(
+        store=store,
+        pipelines={"upload": pipeline, "transcribe": pipeline},
+        input_dir=tmp_path / "inputs",
+        workers=2,
+        lease=lease,
+        max_attempts=3,
+        poll_interval=0.02,
+    )
+
+
+async def finished(runner: JobRunner, job_id: str) -> Job:
+    jobs = [job async for job in runner.watch(job_id)]
+    return jobs[-1]
+
+
+async def test_store_creates_once_and_leases_to_one_worker(store):
+    assert await store.create(make_job())
+    assert not await store.create(make_job())
+    assert await store.active_ids() == ["job-1"]
+
+    job = await store.claim("job-1", lease=5)
+    assert job.status == "running" and job.attempts == 1
+    assert await store.claim("job-1", lease=5) is None
+
+    await store.release("job-1")
+    assert (await store.claim("job-1", lease=0.05)).attempts == 2
+    await asyncio.sleep(0.1)  # the lease expired without being renewed
+    job = await store.claim("job-1", lease=5)
+    assert job.attempts == 3
+
+    job.status = "succeeded"
+    await store.save(job)
+    await store.release("job-1")
+    assert await store.claim("job-1", lease=5) is None
+    assert await store.active_ids() == []
+    await store.aclose()
+
+
+async def test_job_runs_and_reports_progress(store, tmp_path):
+    pipeline = FakePipeline()
+    pipeline.block.clear()
+    runner = make_runner(store, tmp_path, pipeline)
+    job = await runner.submit(
+        "upload", make_spool(b"the text"), "a.txt", "tldr", 200, False
+    )
+    assert job.status == "queued"
+
+    jobs = []
+    async for job in runner.watch(job.id):
+        jobs.append(job)
+        if job.stage == "parsing":
+            pipeline.block.set()
+    assert jobs[-1].status == "succeeded" and jobs[-1].stage is None
+    assert jobs[-1].result.summary == "Summary of the text"
+    assert jobs[-1].sections_parsed == 1
+    assert not (tmp_path / "inputs" / job.id).exists()
+    await runner.aclose()
+
+
+async def test_resubmitting_the_same_input_finds_the_job(store, tmp_path):
+    pipeline = FakePipeline()
+    runner = make_runner(store, tmp_path, pipeline)
+    first = await runner.submit(
+        "upload", make_spool(b"same"), "a.txt", "tldr", 200, False
+    )
+    second = await runner.submit(
+        "upload", make_spool(b"same"), "b.txt", "tldr", 200, False
+    )
+    other = await runner.submit(
+        "upload", make_spool(b"same"), "a.txt", "bullet", 200, False
+    )
+    other_type = await runner.submit(
+        "upload", make_spool(b"same"), "a.pdf", "tldr", 200, False
+    )
+    assert first.id == second.id != other.id
+    assert other_type.id not in (first.id, other.id)
+
+    for job in (first, other, other_type):
+        await finished(runner, job.id)
+    again = await runner.submit(
+        "upload", make_spool(b"same"), "a.txt", "tldr", 200, False
+    )
+    assert again.status == "succeeded"
+    assert pipeline.calls == 3
+    await runner.aclose()
+
+
+async def test_concurrent_identical_submissions_share_one_job(
+    store, tmp_path, monkeypatch
+):
+    pipeline = FakePipeline()
+    pipeline.block.clear()
+    runner = make_runner(store, tmp_path, pipeline)
+    # Both submissions have written the input before either moves it in place
+    both_written = threading.Barrier(2, timeout=1)
+    replace = os.replace
+
+    def replace_when_both_written(source, target):
+        with suppress(threading.BrokenBarrierError):
+            both_written.wait()
+        replace(source, target)
+
+    monkeypatch.setattr(os, "replace", replace_when_both_written)
+    submitted = await asyncio.gather(
+        *(
+            runner.submit("upload", make_spool(b"same"), "a.txt", "tldr", 200, False)
+            for _ in range(2)
+        )
+    )
+    monkeypatch.undo()
+    assert submitted[0].id == submitted[1].id
+    assert [path.name for path in (tmp_path / "inputs").iterdir()] == [submitted[0].id]
+
+    pipeline.block.set()
+    job = await finished(runner, submitted[0].id)
+    assert job.status == "succeeded" and pipeline.calls == 1
+    await runner.aclose()
+
+
+async def test_failed_job_reports_error_and_reruns_on_resubmit(store, tmp_path):
+    pipeline = FakePipeline(
+        failures=[ValueError("a.txt is empty - nothing to summarize.")]
+    )
+    runner = make_runner(store, tmp_path, pipeline)
+    job = await runner.submit("upload", make_spool(b"x"), "a.txt", "tldr", 200, False)
+    job = await finished(runner, job.id)
+    assert job.status == "failed" and "empty" in job.error
+
+    job = await runner.submit("upload", make_spool(b"x"), "a.txt", "tldr", 200, False)
+    assert (await finished(runner, job.id)).status == "succeeded"
+    await runner.aclose()
+
+
+async def test_transient_failures_are_retried(store, tmp_path):
+    pipeline = FakePipeline(failures=[ParserOverloadedError("busy")])
+    runner = make_runner(store, tmp_path, pipeline, lease=0.05)
+    job = await runner.submit("upload", make_spool(b"x"), "a.txt", "tldr", 200, False)
+    job = await finished(runner, job.id)
+    assert job.status == "succeeded" and job.attempts == 2
+    await runner.aclose()
+
+
+async def test_jobs_survive_a_restart(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    pipeline = FakePipeline()
+    pipeline.block.clear()
+    runner = make_runner(SQLiteJobStore(path, ttl=3600), tmp_path, pipeline)
+    job = await runner.submit(
+        "upload", make_spool(b"text"), "a.txt", "tldr", 200, False
+    )
+    await pipeline.started.wait()
+    await runner.aclose()  # shut down mid-job
+
+    pipeline.block.set()
+    restarted = make_runner(SQLiteJobStore(path, ttl=3600), tmp_path, pipeline)
+    restarted.start()
+    job = await finished(restarted, job.id)
+    assert job.status == "succeeded" and job.attempts == 1
+    assert pipeline.calls == 2
+    await restarted.aclose()
+
+
+async def test_job_of_a_dead_worker_is_taken_over(tmp_path):
+    store = SQLiteJobStore(tmp_path / "jobs.sqlite3", ttl=3600)
+    job = make_job()
+    assert await store.create(job)
+    assert await store.claim(job.id, lease=0.05)  # a worker that then died
+    (tmp_path / "inputs").mkdir()
+    (tmp_path / "inputs" / job.id).write_bytes(b"orphan")
+
+    runner = make_runner(store, tmp_path, FakePipeline(), lease=0.05)
+    runner.start()
+    job = await finished(runner, job.id)
+    assert job.status == "succeeded" and job.attempts == 2
+    await runner.aclose()
+
+
+def test_job_routes(tmp_path):
+    runner = make_runner(
+        SQLiteJobStore(tmp_path / "jobs.sqlite3", ttl=3600), tmp_path, FakePipeline()
+    )
+    app.dependency_overrides[get_job_runner] = lambda: runner
+    try:
+        with TestClient(app) as client:
+            response = client.post(
+                "/jobs/upload",
+                files={"file": ("notes.txt", PROMPT.encode(), "text/plain")},
+                data={"style": "bullet"},
+            )
+            assert response.status_code == 202
+            job_id = response.json()["id"]
+            assert response.headers["Location"] == f"/jobs/{job_id}"
+
+            with client.stream("GET", f"/jobs/{job_id}/events") as events:
+                lines = [
+                    line for line in events.iter_lines() if line.startswith("data:")
+                ]
+            last_job = json.loads(lines[-2].removeprefix("data: "))["job"]
+            assert last_job["status"] == "succeeded"
+            assert json.loads(lines[-1].removeprefix("data: ")) == {"type": "done"}
+
+            job = client.get(f"/jobs/{job_id}").json()
+            assert job["result"]["style"] == "bullet"
+            assert client.get("/jobs/missing").status_code == 404
+            assert (
+                client.post(
+                    "/jobs/transcribe",
+                    files={"file": ("notes.txt", b"not audio", "text/plain")},
+                ).status_code
+                == 400
+            )
+    finally:
+        app.dependency_overrides.pop(get_job_runner)
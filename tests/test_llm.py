@@ -0,0 +1,98 @@
+import time
+
+import anthropic
+import openai
+import pytest
+
+from app.clients.llm import AnthropicClient, build_backend
+from app.core.config import get_settings
+from app.models.requests import SummarizeRequest
+from app.services.summarizer import SummarizerService
+from benchmarks.stub_server import STUB_TEXT, StubServer
+from tests.test_summarizer import PROMPT, MockCacheService
+
+LONG_TEXT = " ".join([PROMPT] * 20)
+
+
+@pytest.fixture
+async def stub_anthropic(monkeypatch):
+    """A local fake Anthropic server that the AnthropicClient is pointed at."""
+    async with StubServer() as server:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "stub")
+        get_settings.cache_clear()
+        client = AnthropicClient()
+        yield server, client
+        await client.aclose()
+    get_settings.cache_clear()
+
+
+async def test_styles_of_one_text_share_a_cached_prefix(stub_anthropic):
+    server, client = stub_anthropic
+    service = SummarizerService(llm=client, cache=MockCacheService())
+    for style in ("paragraph", "bullet", "tldr"):
+        request = SummarizeRequest(text=LONG_TEXT, style=style)
+        assert (await service.summarize(request)).summary == STUB_TEXT
+
+    first_blocks = [r["messages"][0]["content"][0] for r in server.message_requests]
+    assert first_blocks[0]["cache_control"] == {"type": "ephemeral"}
+    assert LONG_TEXT in first_blocks[0]["text"]
+    assert first_blocks.count(first_blocks[0]) == 3
+
+    usage = client.stats()
+    assert usage["calls"] == 3
+    prefix_tokens = usage["cache_creation_input_tokens"]
+    assert prefix_tokens > len(LONG_TEXT) // 4
+    assert usage["cache_read_input_tokens"] == 2 * prefix_tokens
+    assert usage["input_tokens"] < prefix_tokens
+
+
+async def test_short_prefix_is_sent_unmarked(stub_anthropic):
+    server, client = stub_anthropic
+    await client.complete(
+        system_prompt="System.",
+        user_prompt="Summarize it.",
+        max_tokens=16,
+        cache_prefix="Short text.\n\n",
+    )
+    messages = server.message_requests[0]["messages"]
+    assert messages == [{"role": "user", "content": "Short text.\n\nSummarize it."}]
+    assert client.stats()["cache_creation_input_tokens"] == 0
+
+
+async def test_prompt_caching_can_be_disabled(stub_anthropic, monkeypatch):
+    server, _ = stub_anthropic
+    monkeypatch.setenv("PROMPT_CACHING", "false")
+    get_settings.cache_clear()
+    client = AnthropicClient()
+    try:
+        await client.complete("System.", "Summarize it.", 16, cache_prefix=LONG_TEXT)
+    finally:
+        await client.aclose()
+    assert isinstance(server.message_requests[0]["messages"][0]["content"], str)
+
+
+@pytest.mark.parametrize("provider", ["anthropic", "openai"])
+async def test_stub_server_streams_at_the_configured_rate(provider, monkeypatch):
+    async with StubServer(ttft=0.1, tokens_per_second=100, output_tokens=10) as server:
+        monkeypatch.setenv("ANTHROPIC_BASE_URL", server.base_url)
+        monkeypatch.setenv("OPENAI_LLM_BASE_URL", f"{server.base_url}/v1")
+        get_settings.cache_clear()
+        client = build_backend(provider, max_retries=0)
+        start = time.perf_counter()
+        tokens = []
+        async for token in client.stream("You are a test.", "Summarize.", 64):
+            if not tokens:
+                first_token = time.perf_counter() - start
+            tokens.append(token)
+        elapsed = time.perf_counter() - start
+        assert len(tokens) == 10 and "".join(tokens).startswith(STUB_TEXT)
+        assert first_token >= 0.1 and elapsed >= 0.1 + 9 / 100
+        assert client.stats()["output_tokens"] == 11
+
+        server.error_rate = 1.0
+        with pytest.raises((anthropic.APIStatusError, openai.APIStatusError)):
+            await client.complete("You are a test.", "Summarize.", 64)
+        assert server.errors_injected == 1
+        await client.aclose()
+    get_settings.cache_clear()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from contextlib import suppress
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.clients.llm import AdmittedLLMClient, TokenUsage
+from app.core.metrics import monitor_event_loop
+from app.core.sse import event_stream
+from app.main import app
+from app.models.requests import SummarizeRequest
+from app.services.cache import CacheService
+from app.services.summarizer import SummarizerService
+from tests.test_admission import make_controller
+from tests.test_cache import FakeRedis
+from tests.test_multi_style import MultiStyleLLMClient
+from tests.test_summarizer import MAX_LENGTH, PROMPT, MockLLMClient
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def stage_count(stage: str) -> float:
+    return sample("summarizer_stage_seconds_count", stage=stage)
+
+
+async def test_summarize_records_stage_latencies_and_cache_lookups():
+    service = SummarizerService(
+        llm=MockLLMClient(), cache=CacheService(redis_client=FakeRedis())
+    )
+    request = SummarizeRequest(text=PROMPT, style="tldr", max_length=MAX_LENGTH)
+    stages = ["cache_get", "cache_set", "prompt_build", "llm_total"]
+    before = {stage: stage_count(stage) for stage in stages}
+    misses = sample("summarizer_cache_lookups_total", tier="l2", result="miss")
+    hits = sample("summarizer_cache_lookups_total", tier="l1", result="hit")
+
+    await service.summarize(request)
+    await service.summarize(request)
+
+    assert {stage: stage_count(stage) - before[stage] for stage in stages} == {
+        "cache_get": 2,  # a miss, then a hit
+        "cache_set": 1,
+        "prompt_build": 1,
+        "llm_total": 1,
+    }
+    assert (
+        sample("summarizer_cache_lookups_total", tier="l2", result="miss") == misses + 1
+    )
+    assert sample("summarizer_cache_lookups_total", tier="l1", result="hit") == hits + 1
+
+
+async def test_stream_records_time_to_first_token():
+    service = SummarizerService(llm=MockLLMClient(), cache=CacheService())
+    request = SummarizeRequest(text=PROMPT, style="bullet", max_length=MAX_LENGTH)
+    first_tokens = stage_count("llm_first_token")
+    assert [chunk async for chunk in service.summarize_stream(request)]
+    assert stage_count("llm_first_token") == first_tokens + 1
+
+
+async def test_llm_stages_leave_out_the_wait_for_admission():
+    controller = make_controller(limit=1)
+    service = SummarizerService(
+        llm=AdmittedLLMClient(MockLLMClient(), controller), cache=CacheService()
+    )
+    request = SummarizeRequest(text=PROMPT, style="tldr", max_length=MAX_LENGTH)
+    queued = sample("summarizer_stage_seconds_sum", stage="llm_queue")
+    total = sample("summarizer_stage_seconds_sum", stage="llm_total")
+
+    async with controller.admit(1):
+        summarizing = asyncio.create_task(service.summarize(request))
+        await asyncio.sleep(0.2)
+    await summarizing
+
+    assert sample("summarizer_stage_seconds_sum", stage="llm_queue") - queued >= 0.2
+    assert sample("summarizer_stage_seconds_sum", stage="llm_total") - total < 0.1
+
+
+async def test_llm_stages_leave_out_the_wait_for_admission_over_sse():
+    controller = make_controller(limit=1)
+    service = SummarizerService(
+        llm=AdmittedLLMClient(MultiStyleLLMClient(), controller), cache=CacheService()
+    )
+    request = SummarizeRequest(
+        text=PROMPT, styles=["paragraph", "bullet"], max_length=MAX_LENGTH
+    )
+    total = sample("summarizer_stage_seconds_sum", stage="llm_total")
+
+    async def consume() -> list[str]:
+        events = service.summarize_styles_stream(request)
+        return [message async for message in event_stream(events, 1, 0.01, 10.0)]
+
+    async with controller.admit(1):
+        streaming = asyncio.create_task(consume())
+        await asyncio.sleep(0.2)
+    assert await streaming
+
+    assert sample("summarizer_stage_seconds_sum", stage="llm_total") - total < 0.1
+
+
+def test_token_usage_counts_tokens_per_model():
+    usage = TokenUsage(model="test-model")
+    usage.add(input_tokens=10, output_tokens=5, cache_read_input_tokens=90)
+    assert sample("summarizer_llm_tokens_total", model="test-model", kind="input") >= 10
+    assert (
+        sample("summarizer_llm_tokens_total", model="test-model", kind="cache_read")
+        >= 90
+    )
+    assert usage.output_tokens == 5
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    # The scrape itself is in flight while the gauge is read
+    assert "summarizer_requests_in_flight 1.0" in response.text
+    assert sample("summarizer_requests_in_flight") == 0
+
+
+async def test_event_loop_lag_is_sampled():
+    count = sample("summarizer_event_loop_lag_seconds_count")
+    total = sample("summarizer_event_loop_lag_seconds_sum")
+    monitor = asyncio.create_task(monitor_event_loop(0.01))
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)  # blocks the loop
+    await asyncio.sleep(0.02)
+    monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await monitor
+    assert sample("summarizer_event_loop_lag_seconds_count") >= count + 2
+    assert sample("summarizer_event_loop_lag_seconds_sum") - total >= 0.08
@@ -0,0 +1,154 @@
+import json
+from typing import AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.clients.llm import get_llm_client
+from app.dependencies import get_cache_service
+from app.main import app
+from app.models.requests import SummarizeRequest
+from app.models.stream import StreamDelta
+from app.services.multi_style import (MultiStyleFormatError,
+                                      MultiStyleStreamParser, bullet_items,
+                                      parse_styles)
+from app.services.summarizer import SummarizerService
+from tests.test_summarizer import PROMPT, MockLLMClient, RecordingCacheService
+
+REPLY = json.dumps(
+    {
+        "paragraph": "A short paragraph.",
+        "bullet": ["First point.", "Second point."],
+        "tldr": "Too long; didn't read.",
+    }
+)
+
+
+class MultiStyleLLMClient(MockLLMClient):
+    """Mock client that replies with a multi-style JSON object, in small pieces."""
+
+    def __init__(self, reply: str = REPLY):
+        self.reply = reply
+        self.calls = 0
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        self.calls += 1
+        return self.reply
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        self.calls += 1
+        for start in range(0, len(self.reply), 7):
+            yield self.reply[start : start + 7]
+
+
+def merge(deltas: list[StreamDelta]) -> dict[str, str]:
+    merged: dict[str, str] = {}
+    for delta in deltas:
+        merged[delta.path] = merged.get(delta.path, "") + delta.value
+    return merged
+
+
+def test_parse_styles_joins_bullets_and_skips_code_fence():
+    summaries = parse_styles(f"```json\n{REPLY}\n```", ["bullet", "tldr"])
+    assert summaries == {
+        "bullet": "- First point.\n- Second point.",
+        "tldr": "Too long; didn't read.",
+    }
+    assert bullet_items(summaries["bullet"]) == ["First point.", "Second point."]
+
+
+def test_parse_styles_rejects_missing_style():
+    with pytest.raises(MultiStyleFormatError, match="tldr"):
+        parse_styles('{"paragraph": "Only this."}', ["paragraph", "tldr"])
+    with pytest.raises(MultiStyleFormatError):
+        parse_styles("Sorry, I can't do that.", ["paragraph"])
+
+
+def test_stream_parser_emits_deltas_per_path():
+    parser = MultiStyleStreamParser(["paragraph", "bullet", "tldr"])
+    deltas = [delta for char in REPLY for delta in parser.feed(char)]
+    assert merge(deltas) == {
+        "paragraph": "A short paragraph.",
+        "bullet[0]": "First point.",
+        "bullet[1]": "Second point.",
+        "tldr": "Too long; didn't read.",
+    }
+    assert parser.finish()["paragraph"] == "A short paragraph."
+
+
+async def test_one_call_fills_every_style_slot():
+    llm = MultiStyleLLMClient()
+    cache = RecordingCacheService()
+    service = SummarizerService(llm=llm, cache=cache)
+    request = SummarizeRequest(text=PROMPT, styles=["paragraph", "bullet", "tldr"])
+
+    responses = await service.summarize_styles(request)
+    assert [r.style for r in responses] == ["paragraph", "bullet", "tldr"]
+    assert llm.calls == 1 and len(cache.store) == 3
+
+    single = await service.summarize(SummarizeRequest(text=PROMPT, style="bullet"))
+    assert single.summary == "- First point.\n- Second point."
+    assert llm.calls == 1
+
+
+async def test_streamed_styles_replay_cached_ones_and_cache_the_rest():
+    llm = MultiStyleLLMClient()
+    cache = RecordingCacheService()
+    service = SummarizerService(llm=llm, cache=cache)
+    await service.summarize_styles(
+        SummarizeRequest(text=PROMPT, styles=["tldr", "paragraph"])
+    )
+
+    request = SummarizeRequest(text=PROMPT, styles=["paragraph", "bullet", "tldr"])
+    deltas = [delta async for delta in service.summarize_styles_stream(request)]
+    assert [delta.path for delta in deltas[:2]] == ["paragraph", "tldr"]  # cached
+    assert {delta.path for delta in deltas[2:]} == {"bullet[0]", "bullet[1]"}
+    assert merge(deltas)["bullet[1]"] == "Second point."
+    assert llm.calls == 2 and len(cache.store) == 3
+
+    deltas = [delta async for delta in service.summarize_styles_stream(request)]
+    assert llm.calls == 2 and len(deltas) == 4
+
+
+def test_multi_style_routes():
+    llm = MultiStyleLLMClient()
+    cache = RecordingCacheService()
+    app.dependency_overrides[get_llm_client] = lambda: llm
+    app.dependency_overrides[get_cache_service] = lambda: cache
+    try:
+        client = TestClient(app)
+        body = {"text": PROMPT, "styles": ["paragraph", "bullet"]}
+        response = client.post("/summarize/", json=body)
+        assert response.status_code == 200
+        summaries = response.json()["summaries"]
+        assert [s["style"] for s in summaries] == ["paragraph", "bullet"]
+
+        response = client.post("/summarize/stream", json={**body, "styles": ["tldr"]})
+        events = [
+            json.loads(line.removeprefix("data: "))
+            for line in response.text.splitlines()
+            if line.startswith("data: ")
+        ]
+        assert events[-1] == {"type": "done"}
+        assert merge([StreamDelta(**e) for e in events[:-1]]) == {
+            "tldr": "Too long; didn't read."
+        }
+
+        llm.reply = "Not JSON."
+        response = client.post("/summarize/", json={**body, "max_length": 300})
+        assert response.status_code == 502
+    finally:
+        app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
+        app.dependency_overrides.pop(get_cache_service, None)
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import fitz
+import pytest
+from docx import Document
+
+from app.services import parse_pool
+from app.services.parse_pool import ParserOverloadedError, ParserPool
+from tests.test_file_parser import SAMPLE_TXT
+
+
+def slow_parse(file_content: bytes, filename: str) -> str:
+    time.sleep(0.2)
+    return file_content.decode()
+
+
+async def test_process_pool_parses_file():
+    """Test that files are parsed in a worker process."""
+    pool = ParserPool(workers=1, max_queued=1, timeout=30)
+    try:
+        assert "sample text" in await pool.parse(SAMPLE_TXT, "test.txt")
+        with pytest.raises(ValueError, match="Unsupported file type"):
+            await pool.parse(b"content", "test.mp3")
+    finally:
+        await pool.aclose()
+
+
+async def test_overload_is_rejected(monkeypatch):
+    """Test that jobs beyond workers + max_queued are rejected."""
+    monkeypatch.setattr(parse_pool, "_parse_in_worker", slow_parse)
+    pool = ParserPool(workers=1, max_queued=1, timeout=5, use_processes=False)
+    results = await asyncio.gather(
+        *(pool.parse(SAMPLE_TXT, "test.txt") for _ in range(3)),
+        return_exceptions=True,
+    )
+    assert sum(isinstance(r, ParserOverloadedError) for r in results) == 1
+    await pool.aclose()
+
+
+async def test_slow_job_times_out_without_blocking_loop(monkeypatch):
+    """Test that callers stop waiting after the timeout and the loop stays free."""
+    monkeypatch.setattr(parse_pool, "_parse_in_worker", slow_parse)
+    pool = ParserPool(workers=1, max_queued=0, timeout=0.05, use_processes=False)
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        await pool.parse(SAMPLE_TXT, "test.txt")
+    assert time.perf_counter() - start < 0.15
+    assert pool.pending == 1
+
+    await asyncio.sleep(0.3)
+    assert pool.pending == 0
+    await pool.aclose()
+
+
+async def test_iter_parse_yields_sections_across_jobs(tmp_path):
+    """Test that a file is extracted in batches of sections by the workers."""
+    doc = fitz.open()
+    for number in range(5):
+        doc.new_page().insert_text((72, 72), f"Page number {number}.")
+    path = tmp_path / "upload.pdf"
+    doc.save(path)
+
+    pool = ParserPool(workers=1, max_queued=1, timeout=30)
+    try:
+        pages = [page async for page in pool.iter_parse(path, "doc.pdf", 2)]
+    finally:
+        await pool.aclose()
+    assert [f"Page number {n}." in page for n, page in enumerate(pages)] == [True] * 5
+
+
+async def test_iter_parse_extracts_docx_in_one_job(tmp_path, monkeypatch):
+    """Test that a DOCX, which can't be resumed cheaply, is parsed only once."""
+    document = Document()
+    for number in range(200):
+        document.add_paragraph(f"Paragraph number {number}. " * 5)
+    path = tmp_path / "upload.docx"
+    document.save(path)
+
+    jobs = []
+
+    def counting_parse(file_content, filename, start, count):
+        jobs.append((start, count))
+        return parse_sections(file_content, filename, start, count)
+
+    parse_sections = parse_pool._parse_sections_in_worker
+    monkeypatch.setattr(parse_pool, "_parse_sections_in_worker", counting_parse)
+    pool = ParserPool(workers=0, max_queued=0, timeout=30)
+    sections = [section async for section in pool.iter_parse(path, "doc.docx", 2)]
+    assert len(sections) > 2
+    assert jobs == [(0, None)]
@@ -0,0 +1,73 @@
+import os
+import shutil
+
+import pytest
+
+from app.prompts import loader
+from app.prompts.loader import (build_style_prompt, build_text_prefix,
+                                prompt_version)
+from app.prompts.registry import PROMPTS_DIR, PromptRegistry, PromptTemplate
+from app.services.cache import CacheService
+from tests.test_cache import FakeRedis
+from tests.test_summarizer import MAX_LENGTH, PROMPT
+
+
+@pytest.fixture
+def prompts_dir(tmp_path, monkeypatch):
+    """A copy of the prompt templates that the loader functions read from."""
+    for path in PROMPTS_DIR.glob("*.txt"):
+        shutil.copy(path, tmp_path)
+    registry = PromptRegistry(tmp_path)
+    monkeypatch.setattr(loader, "get_prompt_registry", lambda: registry)
+    return tmp_path
+
+
+def edit(path, text):
+    path.write_text(text)
+    # Make sure the edit is seen even on filesystems with coarse timestamps
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_template_renders_fields():
+    template = PromptTemplate.compile("t", "About {max_length} words, {{literally}}.")
+    assert template.render(max_length=50) == "About 50 words, {literally}."
+
+
+def test_template_rejects_unsupported_fields():
+    with pytest.raises(ValueError, match="unsupported field"):
+        PromptTemplate.compile("t", "Positional {} field")
+    with pytest.raises(ValueError, match="unsupported field"):
+        PromptTemplate.compile("t", "Attribute {settings.model} field")
+
+
+def test_user_prompt_puts_text_before_style_instruction():
+    assert build_text_prefix("Some text.") == "Text to summarize:\nSome text.\n\n"
+    assert "approximately 120 words" in build_style_prompt("paragraph", 120)
+
+
+def test_reload_picks_up_edits_and_changes_cache_keys(prompts_dir):
+    cache = CacheService(redis_client=FakeRedis())
+    key = cache.generate_cache_key(PROMPT, "bullet", MAX_LENGTH)
+    tldr_version = prompt_version("tldr")
+
+    edit(prompts_dir / "bullet.txt", "List at most {max_length} words of bullets.")
+    assert loader.get_prompt_registry().reload()
+
+    assert build_style_prompt("bullet", 200) == "List at most 200 words of bullets."
+    assert cache.generate_cache_key(PROMPT, "bullet", MAX_LENGTH) != key
+    assert prompt_version("tldr") == tldr_version
+
+
+def test_broken_edit_keeps_previous_templates(prompts_dir):
+    registry = loader.get_prompt_registry()
+    before = registry.get("paragraph")
+
+    edit(prompts_dir / "paragraph.txt", "Broken {max_length!r} template")
+    with pytest.raises(ValueError):
+        registry.reload()
+    assert registry.get("paragraph") == before
+
+    edit(prompts_dir / "paragraph.txt", "Fixed {max_length} template")
+    assert registry.reload()
+    assert registry.get("paragraph").render(max_length=10) == "Fixed 10 template"
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from typing import AsyncIterator
+
+import pytest
+
+from app.clients.llm import (AdmittedLLMClient, OpenAIClient, StubLLMClient,
+                             get_llm_client)
+from app.clients.router import (NoBackendAvailableError, RouterLLMClient,
+                                is_retryable)
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import get_settings
+from benchmarks.stub_server import STUB_TEXT, StubServer
+from tests.test_summarizer import MockLLMClient
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider(MockLLMClient):
+    """In-process provider with injected latency and scripted failures."""
+
+    def __init__(self, name: str, latency: float = 0.0, failures: list[int] = ()):
+        self.name = name
+        self.latency = latency
+        self.failures = list(failures)  # status codes to fail the next calls with
+        self.calls = 0
+        self.cancelled = 0
+        self.closed_streams = 0
+
+    async def _respond(self) -> None:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.failures:
+            raise FakeStatusError(self.failures.pop(0))
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        await self._respond()
+        return f"Summary from {self.name}."
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        try:
+            await self._respond()
+            for word in ("Summary ", "from ", f"{self.name}."):
+                yield word
+        finally:
+            self.closed_streams += 1
+
+
+def make_router(*providers: FakeProvider, **options) -> RouterLLMClient:
+    options = {"hedge_min_delay": 0.05, "retry_base_delay": 0.01, **options}
+    return RouterLLMClient({p.name: p for p in providers}, **options)
+
+
+async def complete(router: RouterLLMClient) -> str:
+    return await router.complete("System.", "Summarize.", 64)
+
+
+async def test_slow_call_is_hedged_and_loser_cancelled():
+    slow, fast = FakeProvider("slow", latency=1.0), FakeProvider("fast", latency=0.01)
+    router = make_router(slow, fast)
+    start = time.perf_counter()
+    assert await complete(router) == "Summary from fast."
+    assert time.perf_counter() - start < 0.5
+    await asyncio.sleep(0)
+    assert slow.cancelled == 1
+    assert router.stats()["slow"]["hedges"] == 1
+
+
+async def test_faster_backend_is_preferred():
+    slow, fast = FakeProvider("slow", latency=0.03), FakeProvider("fast")
+    router = make_router(slow, fast, hedge_min_delay=1.0)
+    await complete(router)  # only the slow one has a latency so far
+    await complete(router)
+    assert await complete(router) == "Summary from fast."
+    assert fast.calls == 2 and slow.calls == 1
+
+
+async def test_rate_limited_call_fails_over_and_retries():
+    first = FakeProvider("first", failures=[429, 503])
+    second = FakeProvider("second", failures=[500])
+    router = make_router(first, second)
+    assert await complete(router) == "Summary from second."
+    assert (first.calls, second.calls) == (2, 2)
+
+
+async def test_client_errors_are_not_retried():
+    first, second = FakeProvider("first", failures=[400]), FakeProvider("second")
+    router = make_router(first, second)
+    with pytest.raises(FakeStatusError):
+        await complete(router)
+    assert second.calls == 0
+
+
+async def test_breaker_skips_failing_backend():
+    broken = FakeProvider("broken", failures=[502] * 10)
+    healthy = FakeProvider("healthy", latency=0.01)
+    router = make_router(broken, healthy, breaker_failures=2, max_attempts=1)
+    for _ in range(4):
+        assert await complete(router) == "Summary from healthy."
+    assert broken.calls == 2
+    assert router.stats()["broken"]["state"] == CircuitBreaker.OPEN
+
+
+async def test_no_backend_available_when_every_breaker_is_open():
+    broken = FakeProvider("broken", failures=[500] * 5)
+    router = make_router(broken, breaker_failures=1, max_attempts=1)
+    with pytest.raises(FakeStatusError):
+        await complete(router)
+    with pytest.raises(NoBackendAvailableError):
+        await complete(router)
+
+
+async def test_stream_is_hedged_until_its_first_chunk():
+    slow, fast = FakeProvider("slow", latency=1.0), FakeProvider("fast", latency=0.01)
+    router = make_router(slow, fast)
+    chunks = [chunk async for chunk in router.stream("System.", "Summarize.", 64)]
+    assert "".join(chunks) == "Summary from fast."
+    assert slow.cancelled == 1 and slow.closed_streams == 1
+    assert fast.closed_streams == 1
+
+
+def test_retryable_errors():
+    assert is_retryable(FakeStatusError(429)) and is_retryable(FakeStatusError(503))
+    assert not is_retryable(FakeStatusError(401)) and not is_retryable(ValueError())
+    assert is_retryable(TimeoutError())
+
+
+async def test_router_from_settings_with_openai_compatible_backend(monkeypatch):
+    async with StubServer() as server:
+        monkeypatch.setenv("LLM_PROVIDER", "router")
+        monkeypatch.setenv("LLM_BACKENDS", "openai, stub")
+        monkeypatch.setenv("OPENAI_LLM_BASE_URL", f"{server.base_url}/v1")
+        monkeypatch.setenv("OPENAI_API_KEY", "stub")
+        get_settings.cache_clear()
+        get_llm_client.cache_clear()
+        try:
+            client = get_llm_client()
+            assert isinstance(client, AdmittedLLMClient)
+            router = client.client
+            assert isinstance(router, RouterLLMClient)
+            openai_backend, stub_backend = (b.client for b in router.backends)
+            assert isinstance(openai_backend, OpenAIClient)
+            assert isinstance(stub_backend, StubLLMClient)
+            assert await complete(router) == STUB_TEXT
+            assert router.stats()["openai"]["output_tokens"] == 6
+            await router.aclose()
+        finally:
+            get_settings.cache_clear()
+            get_llm_client.cache_clear()
@@ -0,0 +1,123 @@
+import asyncio
+import wave
+from array import array
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.audio import AudioService, AudioTooLargeError
+from app.services.segmentation import plan_segments, stitch_transcripts
+
+RATE = 8000
+WORD = int(0.15 * RATE)
+GAP = int(0.1 * RATE)
+PAUSE = int(0.6 * RATE)  # after every eighth word
+
+
+def speech_wav(words: int) -> bytes:
+    """Synthetic speech: word n is a burst of square wave of amplitude 1000 + 100n."""
+    samples = array("h")
+    for n in range(words):
+        amplitude = 1000 + 100 * n
+        samples.extend([amplitude, -amplitude] * (WORD // 2))
+        samples.extend([0] * (PAUSE if n % 8 == 7 else GAP))
+    out = BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return out.getvalue()
+
+
+def hear_words(data: bytes) -> str:
+    """'Transcribe' synthetic speech, including words clipped at either end."""
+    with wave.open(BytesIO(data)) as wav:
+        samples = array("h", wav.readframes(wav.getnframes()))
+    words, loudest = [], 0
+    for sample in [*samples, 0]:
+        if sample:
+            loudest = max(loudest, abs(sample))
+        elif loudest:
+            words.append(f"w{(loudest - 1000) // 100}")
+            loudest = 0
+    return " ".join(words)
+
+
+class FakeTranscriptions:
+    def __init__(self):
+        self.filenames: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, file, model):
+        filename, audio = file
+        data = audio if isinstance(audio, bytes) else audio.read()
+        self.filenames.append(filename)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return SimpleNamespace(text=hear_words(data))
+
+
+@pytest.fixture
+def service() -> AudioService:
+    service = AudioService()
+    service.client = SimpleNamespace(
+        audio=SimpleNamespace(transcriptions=FakeTranscriptions())
+    )
+    service.segment_seconds = 6.0
+    service.segment_overlap = 1.0
+    service.pause_search = 3.0
+    service.segment_concurrency = 2
+    return service
+
+
+def test_cuts_fall_in_pauses():
+    with wave.open(BytesIO(speech_wav(60))) as wav:
+        segments = plan_segments(
+            wav, max_frames=6 * RATE, overlap_frames=RATE, search_frames=3 * RATE
+        )
+        assert len(segments) > 2
+        for segment, following in zip(segments, segments[1:]):
+            assert segment.end - segment.start <= 6 * RATE
+            assert following.start == segment.end - RATE
+            # A pause window (0.25 s) around the cut is silent
+            wav.setpos(segment.end - RATE // 8)
+            assert not any(array("h", wav.readframes(RATE // 4)))
+
+
+def test_stitching_drops_repeated_words():
+    assert (
+        stitch_transcripts(
+            ["Hello there, how are you today", "are you today? I am fine"]
+        )
+        == "Hello there, how are you today I am fine"
+    )
+    # A garbled clipped word before the repeated ones
+    assert (
+        stitch_transcripts(["one two three four five", "ree four five six", "seven"])
+        == "one two three four five six seven"
+    )
+
+
+async def test_long_wav_is_transcribed_in_parallel_segments(service):
+    transcriptions = service.client.audio.transcriptions
+    text = await service.transcribe(speech_wav(60), "meeting.wav")
+    assert text == " ".join(f"w{n}" for n in range(60))
+    assert len(transcriptions.filenames) > 2
+    assert transcriptions.filenames[0] == "meeting-0.wav"
+    assert transcriptions.max_in_flight == 2
+
+
+async def test_short_audio_is_sent_whole(service, monkeypatch):
+    transcriptions = service.client.audio.transcriptions
+    assert await service.transcribe(speech_wav(4), "memo.wav") == "w0 w1 w2 w3"
+    assert transcriptions.filenames == ["memo.wav"]
+
+    monkeypatch.setattr("app.services.audio.WHISPER_MAX_BYTES", 1024)
+    monkeypatch.setattr("app.services.audio.decoder_available", lambda: False)
+    with pytest.raises(AudioTooLargeError):
+        await service.transcribe(b"ID3" + bytes(2048), "memo.mp3")
@@ -0,0 +1,105 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_speech_service
+from app.main import app
+from app.services.cache import CacheService, LocalCache
+from app.services.single_flight import StreamFanout
+from app.services.speech import SpeechService
+from tests.test_cache import FakeRedis
+from tests.test_summarizer import PROMPT
+
+AUDIO_CHUNKS = [b"ID3", b"\x00" * 100, b"\xff" * 100]
+
+
+class FakeAudioService:
+    """Streams fixed audio in chunks; `release` holds the stream until set."""
+
+    tts_model = "tts-test"
+    tts_voice = "alloy"
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def stream_speech(self, text: str):
+        self.calls += 1
+        yield AUDIO_CHUNKS[0]
+        await self.release.wait()
+        for chunk in AUDIO_CHUNKS[1:]:
+            yield chunk
+
+
+def make_speech(audio_service=None, cache=None) -> SpeechService:
+    return SpeechService(
+        audio_service=audio_service or FakeAudioService(),
+        cache=cache or CacheService(),
+        stream_fanout=StreamFanout(),
+        local=LocalCache(max_entries=16, max_bytes=1024 * 1024, ttl=60),
+    )
+
+
+async def read(speech: SpeechService, speech_id: str) -> bytes:
+    return b"".join([chunk async for chunk in await speech.open(speech_id)])
+
+
+async def test_audio_is_synthesized_once_then_served_from_the_cache():
+    speech = make_speech()
+    speech_id = await speech.register("A short summary.")
+    assert speech_id == await speech.register("A short summary.")
+    assert speech_id != speech.speech_id("Another summary.")
+
+    assert await read(speech, speech_id) == b"".join(AUDIO_CHUNKS)
+    assert await read(speech, speech_id) == b"".join(AUDIO_CHUNKS)
+    assert speech.audio_service.calls == 1
+    assert await speech.open(speech.speech_id("Never registered.")) is None
+
+
+async def test_concurrent_fetches_share_one_synthesis():
+    speech = make_speech()
+    speech.audio_service.release.clear()
+    speech_id = await speech.register("A short summary.")
+    first = await speech.open(speech_id)
+    second = await speech.open(speech_id)
+    # Audio is passed on before synthesis finishes
+    assert await anext(first) == AUDIO_CHUNKS[0]
+
+    speech.audio_service.release.set()
+    rest = [chunk async for chunk in first]
+    assert b"".join([chunk async for chunk in second]) == b"".join(AUDIO_CHUNKS)
+    assert rest == AUDIO_CHUNKS[1:]
+    assert speech.audio_service.calls == 1
+
+
+async def test_workers_share_texts_and_audio_through_redis():
+    redis_client = FakeRedis()
+    first = make_speech(cache=CacheService(redis_client=redis_client))
+    second = make_speech(cache=CacheService(redis_client=redis_client))
+
+    speech_id = await first.synthesize("A short summary.")
+    assert await read(second, speech_id) == b"".join(AUDIO_CHUNKS)
+    assert first.audio_service.calls == 1
+    assert second.audio_service.calls == 0
+
+
+def test_summary_carries_an_audio_url_that_streams_mp3():
+    speech = make_speech()
+    app.dependency_overrides[get_speech_service] = lambda: speech
+    try:
+        client = TestClient(app)
+        response = client.post(
+            "/summarize/?tts=true", json={"text": PROMPT, "style": "tldr"}
+        )
+        assert response.status_code == 200
+        audio_url = response.json()["audio_url"]
+        assert "audio_base64" not in response.json()
+
+        audio = client.get(audio_url)
+        assert audio.status_code == 200
+        assert audio.headers["content-type"] == "audio/mpeg"
+        assert audio.content == b"".join(AUDIO_CHUNKS)
+        assert client.get("/audio/unknown").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_speech_service)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+from app.clients.llm import get_llm_client
+from app.core.sse import HEARTBEAT, event_stream
+from app.main import app
+from app.models.stream import StreamDelta, StreamProgress
+from tests.test_summarizer import PROMPT, MockLLMClient, SlowStreamingLLMClient
+
+
+async def deltas(values, delay=0.0, path="summary", fail=False):
+    for value in values:
+        await asyncio.sleep(delay)
+        yield StreamDelta(path=path, value=value)
+    if fail:
+        raise RuntimeError("upstream went away")
+
+
+async def collect(events, flush_chars=64, flush_interval=0.05, heartbeat=10.0):
+    return [
+        message
+        async for message in event_stream(
+            events, flush_chars, flush_interval, heartbeat
+        )
+    ]
+
+
+def decode(messages):
+    return [
+        json.loads(message.removeprefix("data: "))
+        for message in messages
+        if message.startswith("data: ")
+    ]
+
+
+async def test_small_deltas_are_coalesced():
+    events = decode(await collect(deltas(["ab"] * 50), flush_chars=32))
+    assert [e["type"] for e in events] == ["delta"] * 4 + ["done"]
+    assert [len(e["value"]) for e in events[:-1]] == [32, 32, 32, 4]
+
+
+async def test_slow_deltas_are_flushed_after_the_interval():
+    events = decode(
+        await collect(deltas(["a", "b", "c"], delay=0.03), flush_interval=0.01)
+    )
+    assert [e.get("value") for e in events] == ["a", "b", "c", None]
+
+
+async def test_other_events_and_paths_flush_the_buffer():
+    async def mixed():
+        yield StreamDelta(path="paragraph", value="One")
+        yield StreamDelta(path="tldr", value="Two")
+        yield StreamProgress(sections_parsed=1)
+        yield StreamDelta(path="tldr", value="Three")
+
+    events = decode(await collect(mixed()))
+    assert [(e["type"], e.get("value")) for e in events] == [
+        ("delta", "One"),
+        ("delta", "Two"),
+        ("progress", None),
+        ("delta", "Three"),
+        ("done", None),
+    ]
+
+
+async def test_idle_stream_sends_heartbeats():
+    messages = await collect(deltas(["late"], delay=0.12), heartbeat=0.05)
+    assert messages[:2] == [HEARTBEAT, HEARTBEAT]
+    assert decode(messages)[-1] == {"type": "done"}
+
+
+async def test_failure_sends_buffered_text_then_error():
+    events = decode(await collect(deltas(["partial"], fail=True)))
+    assert events == [
+        {"type": "delta", "path": "summary", "value": "partial"},
+        {"type": "error", "message": "Summarization failed."},
+    ]
+
+
+async def test_closing_the_stream_closes_the_source():
+    closed = asyncio.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield StreamDelta(path="summary", value="token ")
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    messages = event_stream(endless(), 4, 0.05, 10.0)
+    assert (await anext(messages)).startswith("data: ")
+    await messages.aclose()
+    assert closed.is_set()
+
+
+async def test_client_disconnect_cancels_upstream_stream():
+    llm = SlowStreamingLLMClient(delay=0.05)
+    app.dependency_overrides[get_llm_client] = lambda: llm
+    body = json.dumps({"text": PROMPT, "style": "tldr", "max_length": 77}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/summarize/stream",
+        "raw_path": b"/summarize/stream",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    first_delta = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await first_delta.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if b'"delta"' in message.get("body", b""):
+            first_delta.set()
+
+    try:
+        await asyncio.wait_for(app(scope, receive, send), timeout=2)
+        await asyncio.sleep(0.2)
+    finally:
+        app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
+    assert first_delta.is_set()
+    assert llm.streams == 1 and llm.finished == 0
@@ -1,31 +1,125 @@
+import asyncio
 from typing import AsyncIterator
 
 from app.clients.llm import LLMClient
 from app.models.requests import SummarizeRequest
-from app.services.summarizer import SummarizerService
+from app.services.summarizer import SourceDocument, SummarizerService
 
 
 class MockLLMClient(LLMClient):
     async def complete(
-        self, system_prompt: str, user_prompt: str, max_tokens: int
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
     ) -> str:
         return "This is a test summary."
 
     async def stream(
-        self, system_prompt: str, user_prompt: str, max_tokens: int
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
     ) -> AsyncIterator[str]:
         yield "This is a test summary."
 
 
+class SlowCountingLLMClient(MockLLMClient):
+    """Mock client that takes a while to answer and counts its calls."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return "This is a test summary."
+
+
+class SlowStreamingLLMClient(MockLLMClient):
+    """Mock client that streams a few words slowly and counts its streams."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.streams = 0
+        self.finished = 0
+
+    async def stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> AsyncIterator[str]:
+        self.streams += 1
+        for word in ("This ", "is ", "a ", "test ", "summary."):
+            await asyncio.sleep(self.delay)
+            yield word
+        self.finished += 1
+
+
 class MockCacheService:
     """Mock cache that always returns None (cache miss)."""
 
-    def get(self, text: str, style: str, max_length: int):
+    def generate_cache_key(self, text: str, style: str, max_length: int) -> str:
+        return f"{text}:{style}:{max_length}"
+
+    async def get(self, text: str, style: str, max_length: int):
         return None  # Always cache miss for testing
 
-    def set(self, text: str, style: str, max_length: int, summary_data: dict):
+    async def set(self, text: str, style: str, max_length: int, summary_data: dict):
         pass  # Do nothing
 
+    def generate_document_key(
+        self, document_key: str, style: str, max_length: int
+    ) -> str:
+        return f"document:{document_key}:{style}:{max_length}"
+
+    async def get_document_summary(
+        self, document_key: str, style: str, max_length: int
+    ):
+        return None
+
+    async def set_document_summary(
+        self, document_key: str, style: str, max_length: int, summary_data: dict
+    ):
+        pass
+
+
+class RecordingCacheService(MockCacheService):
+    """Mock cache that keeps what is stored in a dict."""
+
+    def __init__(self):
+        self.store: dict[str, dict] = {}
+
+    async def get(self, text: str, style: str, max_length: int):
+        return self.store.get(self.generate_cache_key(text, style, max_length))
+
+    async def set(self, text: str, style: str, max_length: int, summary_data: dict):
+        self.store[self.generate_cache_key(text, style, max_length)] = summary_data
+
+    async def get_document_summary(
+        self, document_key: str, style: str, max_length: int
+    ):
+        return self.store.get(
+            self.generate_document_key(document_key, style, max_length)
+        )
+
+    async def set_document_summary(
+        self, document_key: str, style: str, max_length: int, summary_data: dict
+    ):
+        key = self.generate_document_key(document_key, style, max_length)
+        self.store[key] = summary_data
+
 
 PROMPT: str = (
     "The 2024-2025 season was Liverpool Football Club's 133rd season in their history and their 63rd "
@@ -74,3 +168,139 @@ async def test_summarize_word_counts():
     service = SummarizerService(llm=mock_client, cache=mock_cache)
     summary = await service.summarize(request)
     assert summary.prompt_length > 0 and summary.summary_length > 0
+
+
+async def test_identical_concurrent_requests_share_one_llm_call():
+    request = SummarizeRequest(text=PROMPT, max_length=MAX_LENGTH, style=mock_style)
+    llm = SlowCountingLLMClient()
+    service = SummarizerService(llm=llm, cache=MockCacheService())
+    summaries = await asyncio.gather(*(service.summarize(request) for _ in range(20)))
+    assert llm.calls == 1
+    assert {summary.summary for summary in summaries} == {"This is a test summary."}
+
+
+async def test_different_requests_are_not_coalesced():
+    llm = SlowCountingLLMClient()
+    service = SummarizerService(llm=llm, cache=MockCacheService())
+    await asyncio.gather(
+        *(
+            service.summarize(SummarizeRequest(text=PROMPT, style=style))
+            for style in ("paragraph", "bullet", "tldr")
+        )
+    )
+    assert llm.calls == 3
+
+
+async def collect(stream: AsyncIterator[str]) -> str:
+    return "".join([chunk async for chunk in stream])
+
+
+async def test_stream_caches_completed_summary_and_replays_it():
+    request = SummarizeRequest(text=PROMPT, max_length=MAX_LENGTH, style=mock_style)
+    llm = SlowStreamingLLMClient(delay=0)
+    cache = RecordingCacheService()
+    service = SummarizerService(llm=llm, cache=cache)
+
+    first = await collect(service.summarize_stream(request))
+    second = await collect(service.summarize_stream(request))
+    assert first == second == "This is a test summary."
+    assert llm.streams == 1 and len(cache.store) == 1
+
+
+async def test_concurrent_streams_share_one_upstream():
+    request = SummarizeRequest(text=PROMPT, max_length=MAX_LENGTH, style=mock_style)
+    llm = SlowStreamingLLMClient()
+    service = SummarizerService(llm=llm, cache=RecordingCacheService())
+
+    summaries = await asyncio.gather(
+        *(collect(service.summarize_stream(request)) for _ in range(10))
+    )
+    assert llm.streams == 1
+    assert set(summaries) == {"This is a test summary."}
+
+
+async def test_abandoned_stream_is_not_cached():
+    request = SummarizeRequest(text=PROMPT, max_length=MAX_LENGTH, style=mock_style)
+    llm = SlowStreamingLLMClient()
+    cache = RecordingCacheService()
+    service = SummarizerService(llm=llm, cache=cache)
+
+    stream = service.summarize_stream(request)
+    assert await anext(stream) == "This "
+    await stream.aclose()
+    await asyncio.sleep(0.1)
+
+    assert llm.finished == 0 and cache.store == {}
+
+
+async def test_long_text_is_map_reduced_and_chunks_are_cached():
+    paragraphs = [
+        f"Section {i} covers result {i} of the season in detail. " * 8
+        for i in range(120)
+    ]
+    llm = SlowCountingLLMClient(delay=0)
+    cache = RecordingCacheService()
+    service = SummarizerService(llm=llm, cache=cache)
+    service.max_chars = 5_000
+    service.chunk_tokens = 500
+
+    await service.summarize(SummarizeRequest(text="\n\n".join(paragraphs)))
+    first_run_calls = llm.calls
+    assert first_run_calls > 2
+
+    paragraphs[60] = "This section was edited after the first upload. " * 3
+    await service.summarize(SummarizeRequest(text="\n\n".join(paragraphs)))
+    assert llm.calls - first_run_calls <= 3
+
+
+async def test_sections_are_summarized_while_still_arriving():
+    pages = [f"Page {i} reports on match {i} of the season. " * 40 for i in range(12)]
+    llm = SlowCountingLLMClient(delay=0)
+    service = SummarizerService(llm=llm, cache=RecordingCacheService())
+    service.max_chars = 5_000
+    service.chunk_tokens = 500
+    calls_before_last_page = None
+
+    async def sections():
+        nonlocal calls_before_last_page
+        for page in pages[:-1]:
+            yield page
+            await asyncio.sleep(0.01)
+        calls_before_last_page = llm.calls
+        yield pages[-1]
+
+    text, condensed = await service.condense_sections(sections())
+
+    assert text == "\n".join(pages)
+    assert calls_before_last_page > 0
+    assert len(condensed) < len(text)
+    document = SourceDocument(key="report", condensed=condensed)
+    summary = await service.summarize(SummarizeRequest(text=text), document)
+    assert summary.prompt_length == len(text.split())
+
+
+async def test_short_sections_are_not_condensed():
+    async def sections():
+        yield PROMPT[:150]
+        yield PROMPT[150:]
+
+    service = SummarizerService(llm=SlowCountingLLMClient(), cache=MockCacheService())
+    text, condensed = await service.condense_sections(sections())
+    assert text == condensed == PROMPT[:150] + "\n" + PROMPT[150:]
+    assert service.llm.calls == 0
+
+
+async def test_sections_of_exactly_max_chars_are_not_condensed():
+    async def sections():
+        yield "a" * 2_500
+        yield "b" * 2_499
+
+    llm = SlowCountingLLMClient(delay=0)
+    service = SummarizerService(llm=llm, cache=MockCacheService())
+    service.max_chars = 5_000
+    service.chunk_tokens = 100
+    text, condensed = await service.condense_sections(sections())
+    await asyncio.sleep(0.05)
+    assert len(text) == 5_000
+    assert text == condensed
+    assert llm.calls == 0
@@ -1,8 +1,28 @@
+import hashlib
+import json
+from io import BytesIO
+from pathlib import Path
+
+import fitz
+import httpx
+import pytest
+from fastapi import UploadFile
 from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
 
 from app.clients.llm import get_llm_client
+from app.core.config import get_settings
+from app.dependencies import get_cache_service, get_parser_pool
 from app.main import app
-from tests.test_summarizer import MockLLMClient
+from app.routes import upload
+from app.services import parse_pool
+from app.services.cache import CacheService
+from app.services.documents import DocumentExtractor
+from app.services.file_parser import PARSER_VERSION, FileParser
+from app.services.parse_pool import ParserPool
+from app.services.summarizer import SummarizerService
+from tests.test_cache import FakeRedis
+from tests.test_summarizer import MockLLMClient, SlowCountingLLMClient
 
 client = TestClient(app)
 app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
@@ -44,3 +64,205 @@ def test_upload_empty_file():
     """Test that empty files return 400."""
     response = client.post("/upload/", files={"file": ("empty.txt", b"", "text/plain")})
     assert response.status_code == 400
+
+
+async def test_upload_streamed_body_rejected_before_fully_read():
+    """Test that a chunked body is cut off with 413 once it crosses the limit."""
+    sent = 0
+
+    async def body():
+        nonlocal sent
+        yield (
+            b"--boundary\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="large.txt"\r\n'
+            b"Content-Type: text/plain\r\n\r\n"
+        )
+        for _ in range(64):
+            sent += 1
+            yield b"x" * (1024 * 1024)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+        response = await http.post(
+            "/upload/",
+            content=body(),
+            headers={"Content-Type": "multipart/form-data; boundary=boundary"},
+        )
+    assert response.status_code == 413
+    assert sent < 64
+
+
+async def test_upload_with_malformed_content_length_is_rejected():
+    """Test that a Content-Length that is not a number returns 400, not 500."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+        response = await http.post(
+            "/upload/",
+            content=SAMPLE_TEXT,
+            headers={"Content-Type": "text/plain", "Content-Length": "ten"},
+        )
+    assert response.status_code == 400
+
+
+def test_upload_large_file_is_spooled_to_disk(monkeypatch):
+    """Test that files over the spool threshold are parsed from a temp file."""
+    parsed = []
+
+    def recording_parse(file_content, filename, start, count):
+        parsed.append(file_content)
+        return list(FileParser().iter_file(file_content, filename, start))[:count]
+
+    monkeypatch.setenv("UPLOAD_SPOOL_THRESHOLD", "16")
+    monkeypatch.setattr(parse_pool, "_parse_sections_in_worker", recording_parse)
+    get_settings.cache_clear()
+    app.dependency_overrides[get_parser_pool] = lambda: ParserPool(0, 0, 30)
+    try:
+        response = client.post(
+            "/upload/", files={"file": ("text.txt", SAMPLE_TEXT, "text/plain")}
+        )
+    finally:
+        del app.dependency_overrides[get_parser_pool]
+        get_settings.cache_clear()
+
+    assert response.status_code == 200
+    assert isinstance(parsed[0], Path)
+    assert not parsed[0].exists()
+
+
+def test_upload_stream_reports_progress_then_summary():
+    """Test that the streaming upload reports parsed sections before the summary."""
+    doc = fitz.open()
+    for number in range(3):
+        doc.new_page().insert_text((72, 72), SAMPLE_TEXT.decode()[:80])
+    response = client.post(
+        "/upload/stream",
+        files={"file": ("report.pdf", doc.tobytes(), "application/pdf")},
+    )
+    assert response.status_code == 200
+    events = [
+        json.loads(line.removeprefix("data: "))
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    progress = [e["sections_parsed"] for e in events if e["type"] == "progress"]
+    assert progress == [1, 2, 3]
+    deltas = [e for e in events if e["type"] == "delta"]
+    assert "".join(e["value"] for e in deltas) == "This is a test summary."
+    assert {e["path"] for e in deltas} == {"summary"}
+    assert events[-1] == {"type": "done"}
+
+
+def test_upload_stream_reports_parse_errors():
+    """Test that extraction errors are sent as an error event."""
+    response = client.post(
+        "/upload/stream", files={"file": ("test.mp3", b"content", "audio/mpeg")}
+    )
+    assert response.status_code == 200
+    event = json.loads(response.text.strip().removeprefix("data: "))
+    assert event["type"] == "error" and "Unsupported file type" in event["message"]
+
+
+async def test_upload_stream_closes_spool_if_client_leaves_first(monkeypatch):
+    """Test that the spooled upload is closed even if the stream is never entered."""
+    spools = []
+
+    async def recording_spool_upload(*args):
+        spools.append(await spool_upload(*args))
+        return spools[-1]
+
+    spool_upload = upload.spool_upload
+    monkeypatch.setattr(upload, "spool_upload", recording_spool_upload)
+    monkeypatch.setattr(get_settings(), "upload_spool_threshold", 0)
+    extractor = DocumentExtractor(
+        parser=ParserPool(workers=1, max_queued=1, timeout=5, use_processes=False),
+        cache=CacheService(),
+        batch_size=1,
+    )
+    service = SummarizerService(llm=MockLLMClient(), cache=CacheService())
+    response = await upload.upload_and_summarize_stream(
+        UploadFile(BytesIO(SAMPLE_TEXT), filename="text.txt"),
+        "paragraph",
+        200,
+        extractor=extractor,
+        service=service,
+    )
+    path = spools[0].path
+    assert path.exists()
+
+    async def disconnected(message):
+        raise OSError("client went away")
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    with pytest.raises(ClientDisconnect):
+        await response(scope, None, disconnected)
+    assert spools[0].path is None
+    assert not path.exists()
+
+
+def test_repeat_upload_skips_extraction(monkeypatch):
+    """Test that re-uploads are served by document hash without parsing again."""
+    parses = 0
+
+    def counting_parse(file_content, filename, start, count):
+        nonlocal parses
+        parses += 1
+        return list(FileParser().iter_file(file_content, filename, start))[:count]
+
+    llm = SlowCountingLLMClient(delay=0)
+    cache = CacheService(redis_client=FakeRedis())
+    monkeypatch.setattr(parse_pool, "_parse_sections_in_worker", counting_parse)
+    app.dependency_overrides[get_parser_pool] = lambda: ParserPool(0, 0, 30)
+    app.dependency_overrides[get_cache_service] = lambda: cache
+    app.dependency_overrides[get_llm_client] = lambda: llm
+    try:
+        for filename, style in (
+            ("text.txt", "paragraph"),
+            ("renamed.txt", "paragraph"),
+            ("text.txt", "bullet"),
+        ):
+            response = client.post(
+                "/upload/",
+                files={"file": (filename, SAMPLE_TEXT, "text/plain")},
+                data={"style": style},
+            )
+            assert response.status_code == 200
+    finally:
+        del app.dependency_overrides[get_parser_pool]
+        del app.dependency_overrides[get_cache_service]
+        app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()
+
+    # Only the first upload is parsed; the new style reuses the extraction
+    assert parses == 1
+    assert llm.calls == 2
+
+
+def test_document_summaries_are_cached_by_file_type():
+    """Test that a document's summary is not shared with other types or with text."""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), SAMPLE_TEXT.decode())
+    pdf = doc.tobytes()
+    llm = SlowCountingLLMClient(delay=0)
+    cache = CacheService(redis_client=FakeRedis())
+    app.dependency_overrides[get_cache_service] = lambda: cache
+    app.dependency_overrides[get_llm_client] = lambda: llm
+    try:
+        # A text request that spells out the old document cache text
+        key = f"v{PARSER_VERSION}:txt:{hashlib.sha256(pdf).hexdigest()}"
+        planted = client.post("/summarize/", json={"text": f"document:{key}"})
+        assert planted.status_code == 200
+
+        for filename in ("report.txt", "report.pdf"):
+            response = client.post(
+                "/upload/", files={"file": (filename, pdf, "application/pdf")}
+            )
+            assert response.status_code == 200
+        # Neither upload was served the planted summary or the other's
+        assert llm.calls == 3
+
+        response = client.post(
+            "/upload/", files={"file": ("report.exe", pdf, "application/pdf")}
+        )
+        assert response.status_code == 400
+    finally:
+        del app.dependency_overrides[get_cache_service]
+        app.dependency_overrides[get_llm_client] = lambda: MockLLMClient()